@@ -1,7 +1,6 @@
 # api/routes.py
 from flask import Blueprint, request, jsonify
-from rostral.runner import PipelineRunner 
-from rostral.models import load_yaml_config
+from rostral.jobs import get_job_manager
 import os
 
 bp = Blueprint('api', __name__)
@@ -11,9 +10,18 @@ def monitor():
     try:
         # Путь к шаблону относительно корня проекта
         template_path = os.path.join("templates", request.json['template'])
-        config = load_yaml_config(template_path)
-        runner = PipelineRunner(config)
-        result = runner.run()
-        return jsonify({"status": "success", "data": result})
+        if not os.path.isfile(template_path):
+            return jsonify({"status": "error", "message": f"Template not found: {request.json['template']}"}), 404
+        # Конвейер выполняется в фоне, статус — GET /jobs/<id>
+        job = get_job_manager().submit(template_path)
+        return jsonify({"status": "accepted", "job": job.to_dict()}), 202
     except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
\ No newline at end of file
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify(job.to_dict())
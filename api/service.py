@@ -1,8 +1,8 @@
 from rostral.runner import PipelineRunner
-from rostral.models import load_yaml_config
+from rostral.registry import get_registry
 
 def run_pipeline(template_name: str):
     """Адаптер для PipelineRunner"""
-    config = load_yaml_config(f"templates/{template_name}.yaml")
-    return PipelineRunner(config).run()
+    compiled = get_registry().get(f"templates/{template_name}.yaml")
+    return PipelineRunner(compiled).run()
 
@@ -1,76 +1,182 @@
-import sys
+import hashlib
 import logging
+import os
+import threading
 from pathlib import Path
-from flask import Flask, jsonify, render_template, request, redirect
-from rostral.runner import PipelineRunner 
-from rostral.models import load_yaml_config
+from flask import Flask, Response, jsonify, make_response, render_template, request, redirect, stream_with_context, url_for
+from sqlalchemy.orm import selectinload, undefer
 from rostral.db import Session, Event
+from rostral.events import get_broker, sse_stream
+from rostral.jobs import get_job_manager
+from rostral.log import setup_logging
+from rostral.registry import TemplateError, get_registry
 
+logger = logging.getLogger(__name__)
 
-# Настройка логгера
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("rostral.log", encoding="utf-8"),
-        logging.StreamHandler(sys.stdout),
-    ]
-)
+app = Flask(__name__, template_folder="frontend/web_templates", static_folder='frontend/static')
 
-# Перенаправляем стандартный вывод в лог
-class Tee:
-    def __init__(self, *streams):
-        self.streams = streams
+# ROSTRAL_APP_LOGGING=0 — не трогать логирование (тесты, встраивание app в чужой процесс)
+APP_LOGGING = os.getenv("ROSTRAL_APP_LOGGING", "1").lower() not in ("0", "false", "no", "off")
+_logging_ready = False
+_logging_lock = threading.Lock()
 
-    def write(self, data):
-        for s in self.streams:
-            s.write(data)
-            s.flush()
 
-    def flush(self):
-        for s in self.streams:
-            s.flush()
+def configure_logging() -> None:
+    """Настраивает логирование процесса один раз (повторные вызовы ничего не делают)"""
+    global _logging_ready
+    if _logging_ready or not APP_LOGGING:
+        return
+    with _logging_lock:
+        if not _logging_ready:
+            setup_logging()
+            _logging_ready = True
 
-sys.stdout = Tee(sys.stdout, open("rostral.log", "w", encoding="utf-8"))
-sys.stderr = Tee(sys.stderr, open("rostral.log", "w", encoding="utf-8"))
 
+@app.before_request
+def _configure_logging_on_first_request():
+    # Под `flask run` и WSGI-серверами __main__ не выполняется: логирование
+    # включается при первом запросе. Импорт app (тесты, скрипты) rostral.log не пишет
+    configure_logging()
 
-app = Flask(__name__, template_folder="frontend/web_templates", static_folder='frontend/static')
+
+def _job_response(job):
+    """202 Accepted с задачей и ссылкой для опроса статуса"""
+    response = jsonify(job.to_dict())
+    response.status_code = 202
+    response.headers["Location"] = url_for("job_status", job_id=job.id)
+    return response
 
 
 @app.route('/monitor', methods=['POST'])
 def monitor():
-    config = load_yaml_config("templates/news.yaml")
-    runner = PipelineRunner(config)
-    result = runner.run()
-    return jsonify(result)
+    payload = request.get_json(silent=True) or {}
+    template = payload.get("template", "news.yaml")
+    config_path = Path("templates") / template
+    if not config_path.is_file():
+        return jsonify({"error": f"Template not found: {template}"}), 404
+    try:
+        get_registry().get(config_path)  # сломанный шаблон отклоняется до постановки в очередь
+    except TemplateError as e:
+        return jsonify({"error": f"Invalid template: {template}", "problems": e.problems}), 422
+    return _job_response(get_job_manager().submit(str(config_path)))
+
+
+@app.route('/jobs')
+def jobs_list():
+    return jsonify([job.to_dict() for job in get_job_manager().list()])
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+def _not_modified(etag: str, last_modified) -> bool:
+    """Условный GET: If-None-Match важнее If-Modified-Since (RFC 9110)"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return bool(since and last_modified and last_modified.replace(microsecond=0) <= since)
 
 
 @app.route('/')
 def feed():
-    session = Session()
-    events = session.query(Event).order_by(Event.timestamp.desc()).all()
-    session.close()
+    job_id = request.args.get("job")
 
     # Загружаем список шаблонов
-    templates = sorted(Path("templates").rglob("*.yaml")) + sorted(Path("templates").rglob("*.yml"))
-    template_list = [str(t.relative_to("templates")) for t in templates]
+    # Список кэшируется реестром и обходится заново только при изменении папок
+    registry = get_registry()
+    template_list = [str(t.relative_to(registry.folder)) for t in registry.paths()]
+
+    # Версия ленты по новейшему событию: пока ничего не изменилось, отвечаем 304 без запроса всей ленты
+    newest_id, count, newest_at = get_broker().feed_version()
+    etag = hashlib.md5(f"{newest_id}:{count}:{'|'.join(template_list)}".encode()).hexdigest()
+    if not job_id and _not_modified(etag, newest_at):
+        response = make_response("", 304)
+    else:
+        session = Session()
+        # Лента показывает тексты: подгружаем их одним запросом, а не по событию
+        events = (
+            session.query(Event)
+            .options(selectinload(Event.texts), undefer(Event.legacy_text))
+            .order_by(Event.timestamp.desc())
+            .all()
+        )
+        session.close()
+        response = make_response(render_template(
+            "feed.html", events=events, templates=template_list, job_id=job_id, last_event_id=newest_id
+        ))
+
+    if not job_id:  # страница со статусом запуска не кэшируется
+        response.set_etag(etag)
+        response.last_modified = newest_at
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route('/events/stream')
+def events_stream():
+    """SSE: новые события по мере сохранения; после обрыва докачка по Last-Event-ID"""
+    last = request.headers.get("Last-Event-ID") or request.args.get("last_id")
+    last_id = int(last) if last and last.isdigit() else None
+    return Response(
+        sse_stream(get_broker(), last_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route('/api/export')
+def export():
+    """
+    Потоковая выгрузка событий: ?format=ndjson|csv&template=..&status=..&since=..&until=..&with_text=1
+    (template и status можно повторять или перечислять через запятую)
+    """
+    from rostral.export import MEDIA_TYPES, export_events
+
+    def values(name):
+        return [v for item in request.args.getlist(name) for v in item.split(",") if v]
+
+    fmt = request.args.get("format", "ndjson")
+    try:
+        chunks = export_events(
+            fmt,
+            template=values("template"),
+            status=values("status"),
+            since=request.args.get("since"),
+            until=request.args.get("until"),
+            with_text=request.args.get("with_text", "").lower() in ("1", "true", "yes"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename=events.{fmt}", "X-Accel-Buffering": "no"},
+    )
 
-    return render_template("feed.html", events=events, templates=template_list)
 
 @app.route('/run', methods=['POST'])
 def run_template():
     selected = request.form.get("template")
-    config_path = str(Path("templates") / selected)
-
+    config_path = Path("templates") / selected
+    if not config_path.is_file():
+        logger.error(f"❌ Template not found: {selected}")
+        return redirect("/")
     try:
-        config = load_yaml_config(config_path)
-        PipelineRunner(config).run()
-    except Exception as e:
-        print(f"❌ Start-up error: {e}")
+        get_registry().get(config_path)
+    except TemplateError:
+        return redirect("/")  # ошибки шаблона уже в логе
 
-    return redirect("/")
+    # Конвейер выполняется в фоне: страница опрашивает /jobs/<id>
+    job = get_job_manager().submit(str(config_path))
+    return redirect(url_for("feed", job=job.id))
 
 
 if __name__ == '__main__':
-    app.run()
\ No newline at end of file
+    configure_logging()
+    app.run(threaded=True)
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""
+Offline fixtures for the pipeline benchmarks.
+
+Builds a deterministic copy of the sites the shipped templates monitor —
+a KGIOP-style listing of expertise PDFs, a Federal Register-style JSON API
+and a WHO-style RSS feed with article pages — and serves it from a local
+HTTP server. PDFs come in two kinds: with a text layer and scanned
+(page images only, the OCR path of ProcessingStage).
+"""
+
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+from xml.sax.saxutils import escape
+
+SEED = 2024
+
+RU_WORDS = ("объект культурного наследия здание дом улица проект реставрации приспособления "
+            "фасад кровля охранная зона территория заключение экспертизы заказчик собственник "
+            "работы сохранение выявленный региональный значение Санкт-Петербург").split()
+EN_WORDS = ("executive order agency policy federal section administration secretary "
+            "implementation health outbreak region cases response measures report "
+            "department national security public program").split()
+
+
+def _paragraphs(rng: random.Random, words, count: int, length: int = 60) -> list:
+    return [" ".join(rng.choice(words) for _ in range(length)).capitalize() + "." for _ in range(count)]
+
+
+def expertise_text(i: int) -> list:
+    """Абзацы акта экспертизы: шапка с полями, которые ищут regex-шаблоны kgiop"""
+    rng = random.Random(SEED + i)
+    head = [
+        f"Акт государственной историко-культурной экспертизы № {i}",
+        f"Объект культурного наследия: здание {rng.choice(RU_WORDS)} {i}",
+        f"Адрес: Санкт-Петербург, улица {rng.choice(RU_WORDS).capitalize()}, дом {rng.randrange(1, 200)}",
+        f"Заказчик: ООО «{rng.choice(RU_WORDS).capitalize()} {i}»",
+        "Проектом предусматривается реставрация и приспособление для современного использования.",
+    ]
+    return head + _paragraphs(rng, RU_WORDS, 12) + ["Заключение: проектная документация соответствует требованиям."]
+
+
+def order_text(i: int) -> list:
+    rng = random.Random(SEED * 2 + i)
+    return [f"Executive Order {14000 + i}", *_paragraphs(rng, EN_WORDS, 14)]
+
+
+def make_pdf(paragraphs: list, pages: int = 2, scanned: bool = False) -> bytes:
+    """PDF с текстовым слоем или «скан»: страницы-картинки без текста"""
+    import fitz
+
+    doc = fitz.open()
+    per_page = max(1, len(paragraphs) // pages)
+    for start in range(0, len(paragraphs), per_page):
+        page = doc.new_page()
+        html = "".join(f"<p>{escape(p)}</p>" for p in paragraphs[start:start + per_page])
+        page.insert_htmlbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50), html)
+    if scanned:
+        scan = fitz.open()
+        for page in doc:
+            pix = page.get_pixmap(dpi=100)
+            target = scan.new_page(width=page.rect.width, height=page.rect.height)
+            target.insert_image(target.rect, stream=pix.tobytes("png"))
+        doc = scan
+    return doc.tobytes(deflate=True)
+
+
+@lru_cache(maxsize=None)
+def build_site(docs: int = 20) -> Dict[str, Tuple[str, bytes]]:
+    """
+    Все ресурсы стенда: {path: (content_type, body)}.
+    У КГИОП два листинга: PDF с текстовым слоем и сканы (путь OCR).
+    """
+    site = {}
+
+    for listing_path, kind, scanned in (("/kgiop/gike-2024/", "gike", False), ("/kgiop/scans/", "scan", True)):
+        links = []
+        for i in range(docs):
+            path = f"/media/uploads/userfiles/2024/{kind}_{i}.pdf"
+            site[path] = ("application/pdf", make_pdf(expertise_text(i), scanned=scanned))
+            links.append(f'<li><a href="{path}">Акт ГИКЭ № {i}</a></li>')
+        listing = (
+            "<html><head><meta charset='utf-8'><title>ГИКЭ 2024</title></head><body>"
+            "<nav><a href='/'>Главная</a><a href='/deyatelnost/'>Деятельность</a></nav>"
+            f"<ul class='docs'>{''.join(links)}</ul></body></html>"
+        )
+        site[listing_path] = ("text/html; charset=utf-8", listing.encode("utf-8"))
+
+    results = []
+    for i in range(docs):
+        path = f"/federal/documents/{14000 + i}.pdf"
+        site[path] = ("application/pdf", make_pdf(order_text(i)))
+        results.append({
+            "document_number": f"2024-{i:05d}",
+            "title": f"Executive Order {14000 + i}",
+            "executive_order_number": 14000 + i,
+            "publication_date": "2024-01-01",
+            "signing_date": "2023-12-28",
+            "citation": f"89 FR {1000 + i}",
+            "pdf_url": "{base}" + path,
+            "disposition_notes": None,
+        })
+    site["/federal/documents.json"] = ("application/json", _json({"count": docs, "results": results}))
+
+    items = []
+    for i in range(docs):
+        rng = random.Random(SEED * 3 + i)
+        path = f"/who/news/item/{i}"
+        body = "".join(f"<p>{p}</p>" for p in _paragraphs(rng, EN_WORDS, 6))
+        article = (
+            f"<html><body><header>WHO</header><article class='sf-detail-body-wrapper'>"
+            f"<h1>Disease Outbreak News {i} (WHO)</h1>{body}</article><footer>…</footer></body></html>"
+        )
+        site[path] = ("text/html; charset=utf-8", article.encode("utf-8"))
+        items.append(
+            f"<item><title>Disease Outbreak News {i}</title><link>{{base}}{path}</link>"
+            f"<description>Outbreak bulletin {i}</description>"
+            f"<pubDate>Mon, 01 Jan 2024 00:{i % 60:02d}:00 GMT</pubDate></item>"
+        )
+    feed = f"<?xml version='1.0' encoding='utf-8'?><rss version='2.0'><channel><title>WHO</title>{''.join(items)}</channel></rss>"
+    site["/who/rss.xml"] = ("application/rss+xml", feed.encode("utf-8"))
+    return site
+
+
+def _json(payload) -> bytes:
+    import json
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+class LocalSite:
+    """
+    Локальный HTTP-стенд для fixtures. Абсолютные ссылки ({base}) подставляются
+    при отдаче; latency_ms имитирует сетевую задержку ответа.
+    """
+
+    def __init__(self, site: Dict[str, Tuple[str, bytes]], latency_ms: float = 0):
+        self.site = site
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def _handler(self):
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with owner._lock:
+                    owner.requests += 1
+                if owner.latency:
+                    time.sleep(owner.latency)
+                entry = owner.site.get(self.path)
+                if entry is None:
+                    self.send_error(404)
+                    return
+                content_type, body = entry
+                if not content_type.startswith("application/pdf"):
+                    body = body.replace(b"{base}", owner.base.encode())
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def url(self, path: str) -> str:
+        return self.base + path
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
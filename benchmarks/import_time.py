@@ -0,0 +1,110 @@
+"""
+Import-time benchmark for the CLI entry point.
+
+Runs `python -X importtime -c "import cli"` in a clean interpreter,
+reports the cumulative import time and the slowest top-level modules,
+and fails if the total exceeds the regression threshold or if any
+heavy optional dependency is imported eagerly.
+
+Usage:
+    python benchmarks/import_time.py [--module cli] [--threshold-ms 600] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_THRESHOLD_MS = float(os.getenv("ROSTRAL_IMPORT_THRESHOLD_MS", 600))
+
+# Модули, которые не должны загружаться при старте CLI
+HEAVY_MODULES = ["fitz", "pytesseract", "PIL", "gpt4all", "openai", "bs4", "jmespath", "tqdm"]
+
+
+def measure(module: str) -> dict:
+    """Импортирует модуль в отдельном процессе и разбирает вывод -X importtime"""
+    code = (
+        "import sys, json; "
+        f"sys.path.insert(0, {str(PROJECT_ROOT)!r}); "
+        f"import {module}; "
+        "print(json.dumps(sorted(sys.modules)))"
+    )
+    # Запускаем в пустом каталоге: импорт не должен создавать базу данных
+    with tempfile.TemporaryDirectory() as workdir:
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True, text=True, cwd=workdir, check=True,
+        )
+        created_files = sorted(os.listdir(workdir))
+
+    top_level, nested = [], []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            cumulative_us = int(cumulative.strip())
+        except ValueError:
+            continue  # строка заголовка
+        # Вложенность обозначается отступом: 1 пробел + 2 на каждый уровень
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 0:
+            top_level.append((name.strip(), cumulative_us))
+        elif depth == 1:
+            nested.append((name.strip(), cumulative_us))
+
+    loaded = set(json.loads(proc.stdout.strip().splitlines()[-1]))
+    total_us = sum(us for _, us in top_level)
+    return {
+        "module": module,
+        "total_ms": round(total_us / 1000, 1),
+        "slowest": [
+            {"module": name, "ms": round(us / 1000, 1)}
+            for name, us in sorted(nested, key=lambda x: x[1], reverse=True)[:10]
+        ],
+        "heavy_loaded": [m for m in HEAVY_MODULES if m in loaded],
+        "created_databases": [f for f in created_files if f.endswith(".db")],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rostral import-time benchmark")
+    parser.add_argument("--module", default="cli", help="Module to import (default: cli)")
+    parser.add_argument("--threshold-ms", type=float, default=DEFAULT_THRESHOLD_MS,
+                        help="Fail if cumulative import time exceeds this value")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    result = measure(args.module)
+    result["threshold_ms"] = args.threshold_ms
+
+    print(f"⏱ import {result['module']}: {result['total_ms']} ms (threshold {args.threshold_ms} ms)")
+    for entry in result["slowest"]:
+        print(f"   {entry['ms']:>8} ms  {entry['module']}")
+
+    failures = []
+    if result["total_ms"] > args.threshold_ms:
+        failures.append(f"import time {result['total_ms']} ms exceeds {args.threshold_ms} ms")
+    if result["heavy_loaded"]:
+        failures.append(f"heavy modules imported eagerly: {', '.join(result['heavy_loaded'])}")
+    if result["created_databases"]:
+        failures.append(f"import created databases: {', '.join(result['created_databases'])}")
+    result["failures"] = failures
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Import time within threshold")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
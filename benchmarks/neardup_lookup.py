@@ -0,0 +1,116 @@
+"""
+Near-duplicate lookup benchmark.
+
+Fills a temporary SQLite database with N random MinHash signatures
+(the same tables ProcessingStage writes), then measures the average
+NearDuplicateIndex.find() latency for unseen documents and for
+near-copies of stored ones. Fails if the average exceeds the threshold.
+
+Usage:
+    python benchmarks/neardup_lookup.py [--events 200000] [--lookups 500] [--threshold-ms 1.0] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+DEFAULT_THRESHOLD_MS = float(os.getenv("ROSTRAL_NEARDUP_THRESHOLD_MS", 1.0))
+
+
+def populate(db, neardup, count: int, rng: random.Random) -> list:
+    """Вставляет count случайных подписей пачками; возвращает часть из них для поиска копий"""
+    from rostral.models import EventFingerprint, EventFingerprintBand
+
+    samples = []
+    session = db.Session()
+    try:
+        batch = []
+        for i in range(count):
+            signature = [rng.getrandbits(32) for _ in range(neardup.NUM_PERM)]
+            event_id = f"event-{i}"
+            batch.append({"event_id": event_id, "signature": neardup.pack(signature)})
+            if i % max(1, count // 200) == 0:
+                samples.append(signature)
+            if len(batch) == 5000 or i == count - 1:
+                session.bulk_insert_mappings(EventFingerprint, batch)
+                session.bulk_insert_mappings(EventFingerprintBand, [
+                    {"band_key": key, "event_id": row["event_id"]}
+                    for row in batch for key in set(neardup.band_keys(neardup.unpack(row["signature"])))
+                ])
+                session.commit()
+                batch = []
+    finally:
+        session.close()
+    return samples
+
+
+def measure(index, signatures: list) -> float:
+    start = time.perf_counter()
+    for signature in signatures:
+        index.find(signature)
+    return (time.perf_counter() - start) / len(signatures) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--threshold-ms", type=float, default=DEFAULT_THRESHOLD_MS)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["ROSTRAL_DB_URL"] = f"sqlite:///{Path(workdir) / 'bench.db'}"
+        from rostral import db, neardup
+
+        rng = random.Random(42)
+        started = time.perf_counter()
+        samples = populate(db, neardup, args.events, rng)
+        populate_s = time.perf_counter() - started
+
+        index = neardup.NearDuplicateIndex()
+        unseen = [[rng.getrandbits(32) for _ in range(neardup.NUM_PERM)] for _ in range(args.lookups)]
+        # Почти-копии: ~10% значений подписи изменено
+        copies = []
+        for i in range(args.lookups):
+            signature = list(samples[i % len(samples)])
+            for pos in rng.sample(range(neardup.NUM_PERM), neardup.NUM_PERM // 10):
+                signature[pos] = rng.getrandbits(32)
+            copies.append(signature)
+
+        index.find(unseen[0])  # прогрев соединения
+        result = {
+            "events": args.events,
+            "populate_s": round(populate_s, 2),
+            "unseen_ms": round(measure(index, unseen), 3),
+            "near_copy_ms": round(measure(index, copies), 3),
+            "near_copy_recall": sum(index.find(s) is not None for s in copies) / len(copies),
+            "threshold_ms": args.threshold_ms,
+        }
+        db.get_engine().dispose()
+
+    print(f"Near-duplicate lookup over {result['events']} events (populated in {result['populate_s']} s)")
+    print(f"  unseen document: {result['unseen_ms']:.3f} ms")
+    print(f"  near copy:       {result['near_copy_ms']:.3f} ms (recall {result['near_copy_recall']:.2%})")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+    worst = max(result["unseen_ms"], result["near_copy_ms"])
+    if worst > args.threshold_ms:
+        print(f"FAIL: average lookup {worst:.3f} ms exceeds {args.threshold_ms} ms")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
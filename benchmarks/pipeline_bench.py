@@ -0,0 +1,237 @@
+"""
+Offline pipeline benchmark.
+
+Serves recorded-style fixtures (benchmarks/fixtures.py) from a local HTTP
+server and runs the shipped templates against it end to end: KGIOP
+(HTML listing → PDF → regex excerpts → normalize → alert), its scanned
+variant (OCR path), Federal Register (JSON API → PDF → GPT → alert) and
+WHO (RSS → HTML pages → GPT → alert). The GPT backend is stubbed and the
+database is a fresh temporary SQLite file per run, so nothing leaves the
+machine.
+
+For every stage the wall time, per-document latency and throughput are
+reported (median over --repeat runs), plus the end-to-end time and the
+process RSS after the stage (maximum over runs). Results
+are compared with benchmarks/pipeline_thresholds.json (max milliseconds,
+keys "<scenario>.<Stage>" and "<scenario>.total", calibrated for the
+default --docs 20); the exit code is 1 on any regression.
+
+Usage:
+    python benchmarks/pipeline_bench.py [--docs 20] [--repeat 3] [--scenario kgiop ...]
+                                        [--latency-ms 0] [--gpt-latency-ms 0]
+                                        [--thresholds path] [--json out.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+DEFAULT_THRESHOLDS = Path(__file__).resolve().parent / "pipeline_thresholds.json"
+
+# Сценарий: шаблон из templates/ и путь на локальном стенде
+SCENARIOS = {
+    "kgiop": ("templates/urban-samples/deep-dive.kgiop_gike_monitor.yaml", "/kgiop/gike-2024/"),
+    "kgiop_scanned": ("templates/urban-samples/deep-dive.kgiop_gike_monitor.yaml", "/kgiop/scans/"),
+    "federal": ("templates/deep-dive/usa_gov.yaml", "/federal/documents.json"),
+    "who": ("templates/deep-dive/who_health_alerts.yaml", "/who/rss.xml"),
+}
+
+
+class StubModel:
+    """Заглушка GPT4All: отдаёт фиксированный ответ кусками, с настраиваемой задержкой"""
+
+    answer = "Объект: здание\nАдрес: Санкт-Петербург\nВыводы: соответствует требованиям"
+
+    def __init__(self, latency_ms: float = 0):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    def generate(self, prompt, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        for line in self.answer.splitlines(keepends=True):
+            yield line
+
+
+def load_scenario(name: str, site, docs: int):
+    from rostral.models import load_yaml_config
+
+    template, path = SCENARIOS[name]
+    config = load_yaml_config(str(PROJECT_ROOT / template))
+    config.source.url = site.url(path)
+    for block in config.extract.values():
+        block.limit = docs
+        block.stop_after_known = None
+    if config.download:
+        # Стенд локальный: вежливые паузы измеряли бы sleep, а не код
+        config.download.min_interval = 0
+        config.download.max_per_host = config.download.workers
+        config.download.respect_robots = False
+    return config
+
+
+def use_fresh_db(workdir: Path, run: int) -> None:
+    from rostral import db
+    from rostral.cache import reset_cache
+
+    if db._engine is not None:
+        db._engine.dispose()
+    db.DB_URL = f"sqlite:///{workdir / f'run_{run}.db'}"
+    db._engine = None
+    db._session_factory = None
+    reset_cache()
+
+
+def count_items(value) -> int:
+    if isinstance(value, dict):
+        return sum(len(v) for v in value.values() if isinstance(v, list))
+    return 0
+
+
+def run_once(config) -> dict:
+    """Один прогон PipelineRunner; время каждой стадии снимается обёрткой над stage.run"""
+    from rostral.runner import PipelineRunner
+
+    timings = {}
+    started = time.perf_counter()
+    runner = PipelineRunner(config)
+    for stage in runner.stages:
+        def timed(data, _run=stage.run, _name=stage.__class__.__name__):
+            t0 = time.perf_counter()
+            result = _run(data)
+            items = max(count_items(data), count_items(result))
+            timings[_name] = {"ms": (time.perf_counter() - t0) * 1000, "items": items}
+            return result
+        stage.run = timed
+    context = runner.run()
+    total_ms = (time.perf_counter() - started) * 1000
+    for stats in runner.stage_stats:
+        if stats["stage"] in timings and stats["rss"] is not None:
+            timings[stats["stage"]]["rss_mb"] = stats["rss"] / (1024 * 1024)
+    return {"total_ms": total_ms, "stages": timings, "events": len(context.get("events") or [])}
+
+
+def summarize(runs: list) -> dict:
+    stages = {}
+    for name in runs[0]["stages"]:
+        ms = statistics.median(r["stages"][name]["ms"] for r in runs if name in r["stages"])
+        items = runs[0]["stages"][name]["items"]
+        stages[name] = {
+            "ms": round(ms, 2),
+            "items": items,
+            "ms_per_item": round(ms / items, 3) if items else None,
+            "items_per_s": round(items / ms * 1000, 1) if items and ms else None,
+            "rss_mb": round(max((r["stages"][name].get("rss_mb") or 0) for r in runs if name in r["stages"]), 1),
+        }
+    return {
+        "total_ms": round(statistics.median(r["total_ms"] for r in runs), 2),
+        "events": runs[0]["events"],
+        "stages": stages,
+    }
+
+
+def check_thresholds(results: dict, thresholds: dict) -> list:
+    failures = []
+    for key, limit in thresholds.items():
+        scenario, _, metric = key.partition(".")
+        if scenario not in results:
+            continue
+        summary = results[scenario]
+        value = summary["total_ms"] if metric == "total" else summary["stages"].get(metric, {}).get("ms")
+        if value is not None and value > limit:
+            failures.append(f"{key}: {value} ms exceeds {limit} ms")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rostral offline pipeline benchmark")
+    parser.add_argument("--docs", type=int, default=20, help="Documents per listing/API/feed")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario (median is reported)")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Run only these scenarios")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated server latency per response")
+    parser.add_argument("--gpt-latency-ms", type=float, default=0, help="Simulated GPT latency per call")
+    parser.add_argument("--thresholds", type=Path, default=DEFAULT_THRESHOLDS, help="JSON with max ms per metric")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("rostral").setLevel(logging.ERROR)
+
+    from fixtures import LocalSite, build_site
+    import rostral.stages.alert as alert
+    import rostral.stages.dedup as dedup
+    import rostral.stages.gpt as gpt
+
+    # Лимит событий на шаблон не должен обрезать замер
+    dedup.MAX_EVENTS_PER_TEMPLATE = alert.MAX_EVENTS_PER_TEMPLATE = args.docs
+    model = StubModel(args.gpt_latency_ms)
+    gpt._backends = (model, None)
+    gpt.gpt4all_model_path = "stub-model"
+
+    print(f"🧪 Building fixtures for {args.docs} documents...")
+    site_data = build_site(args.docs)
+    ocr_available = shutil.which("tesseract") is not None
+
+    results = {}
+    with LocalSite(site_data, latency_ms=args.latency_ms) as site, tempfile.TemporaryDirectory() as workdir:
+        run_id = 0
+        for name in args.scenario or list(SCENARIOS):
+            runs = []
+            for _ in range(args.repeat):
+                run_id += 1
+                use_fresh_db(Path(workdir), run_id)
+                runs.append(run_once(load_scenario(name, site, args.docs)))
+            results[name] = summarize(runs)
+        from rostral import db
+        if db._engine is not None:
+            db._engine.dispose()
+        http_requests = site.requests
+
+    for name, summary in results.items():
+        print(f"⏱ {name}: {summary['total_ms']} ms end-to-end, {summary['events']} events")
+        for stage, s in summary["stages"].items():
+            rate = f"{s['items_per_s']:>8} docs/s  {s['ms_per_item']:>8} ms/doc" if s["items"] else ""
+            print(f"   {s['ms']:>9} ms  {stage:<18} RSS {s['rss_mb']:>6} MB  {rate}")
+    if not ocr_available:
+        print("ℹ️ tesseract is not installed: kgiop_scanned measures the OCR fallback only")
+
+    thresholds = json.loads(args.thresholds.read_text(encoding="utf-8")) if args.thresholds.exists() else {}
+    failures = check_thresholds(results, thresholds)
+    report = {
+        "docs": args.docs,
+        "repeat": args.repeat,
+        "latency_ms": args.latency_ms,
+        "gpt_latency_ms": args.gpt_latency_ms,
+        "ocr_available": ocr_available,
+        "http_requests": http_requests,
+        "gpt_calls": model.calls,
+        "scenarios": results,
+        "thresholds": thresholds,
+        "failures": failures,
+    }
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Pipeline benchmark within thresholds")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Event text storage benchmark.
+
+Builds a temporary SQLite database in the old layout (full text and
+excerpt uncompressed in `events`, excerpt duplicating short texts), then
+runs the migration to the compressed `event_texts` table and reports:
+database size before/after, migration time, the time of a list query
+(`SELECT * FROM events`, what the feed and list APIs pay) and the time
+to read full texts back through Event.text.
+
+Usage:
+    python benchmarks/text_storage.py [--events 5000] [--text-kb 30] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+WORDS = ("объект культурного наследия здание проект реставрации фасад кровля заключение "
+         "экспертизы заказчик работы executive order agency policy federal section").split()
+
+
+def document(rng: random.Random, size: int) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rostral event text storage benchmark")
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--text-kb", type=float, default=30, help="Average full text size")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = Path(workdir) / "bench.db"
+        os.environ["ROSTRAL_DB_URL"] = f"sqlite:///{db_path}"
+        from sqlalchemy import text
+        from sqlalchemy.orm import selectinload
+        from rostral import db
+        from rostral.models import Event
+
+        engine = db.get_engine()
+        rng = random.Random(7)
+        rows = []
+        for i in range(args.events):
+            short = i % 4 == 0  # каждый четвёртый — короткий документ, выдержка = текст
+            body = document(rng, 800 if short else int(args.text_kb * 1024 * rng.uniform(0.5, 1.5)))
+            rows.append({
+                "event_id": f"e{i}", "url": f"https://example.org/{i}.pdf", "title": f"Document {i}",
+                "text": body, "excerpt": body if short else body[:2000], "status": "pending", "template_name": "bench",
+            })
+        with engine.begin() as conn:
+            conn.execute(Event.__table__.insert(), rows)
+        del rows
+
+        def list_query():
+            with engine.connect() as conn:
+                conn.execute(text("SELECT * FROM events ORDER BY id DESC")).all()
+
+        def read_texts():
+            session = db.Session()
+            try:
+                events = session.query(Event).options(selectinload(Event.texts)).limit(500).all()
+                sum(len(e.text or "") for e in events)
+            finally:
+                session.close()
+
+        before = {"db_bytes": os.path.getsize(db_path), "list_ms": timed(list_query)}
+        report = db.migrate_event_texts()
+        after = {"db_bytes": os.path.getsize(db_path), "list_ms": timed(list_query), "read_500_texts_ms": timed(read_texts)}
+        engine.dispose()
+
+    result = {
+        "events": args.events,
+        "text_kb": args.text_kb,
+        "before": before,
+        "after": after,
+        "migration": report,
+    }
+    print(f"📦 {args.events} events, ~{args.text_kb} KB text each")
+    print(f"   database: {before['db_bytes'] / 2**20:.1f} MB → {after['db_bytes'] / 2**20:.1f} MB")
+    print(f"   list query (SELECT * FROM events): {before['list_ms']} ms → {after['list_ms']} ms")
+    print(f"   migration: {report['seconds']} s, texts x{report.get('compression_ratio')}")
+    print(f"   reading 500 full texts: {after['read_500_texts_ms']} ms")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(result, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
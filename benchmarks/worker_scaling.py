@@ -0,0 +1,102 @@
+"""
+Run queue scaling benchmark.
+
+Enqueues N runs into a temporary database and drains the queue with
+1, 2, 4, ... worker processes (each a separate `Worker`, as on separate
+machines). Every run simulates an I/O-bound pipeline by sleeping, so the
+numbers show queue overhead and claim contention, not pipeline speed.
+Reports throughput per worker count and the scaling efficiency
+(throughput / (workers × single-worker throughput)); fails if the
+efficiency at the largest worker count drops below the threshold.
+
+Usage:
+    python benchmarks/worker_scaling.py [--runs 200] [--run-ms 50] [--workers 1,2,4,8]
+                                        [--db-url postgresql://...] [--min-efficiency 0.6] [--json out.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def _drain(db_url: str, run_ms: float, start_at: float) -> tuple:
+    os.environ["ROSTRAL_DB_URL"] = db_url
+    from rostral.runqueue import Worker
+
+    worker = Worker(execute=lambda path: time.sleep(run_ms / 1000) or {"events": 0})
+    time.sleep(max(0.0, start_at - time.time()))  # все процессы стартуют одновременно
+    started = time.time()
+    return worker.run_forever(poll_interval=0.05, burst=True), started, time.time()
+
+
+def measure(db_url: str, runs: int, run_ms: float, workers: int) -> dict:
+    from rostral import db
+    from rostral.models import QueuedRun
+    from rostral.runqueue import enqueue
+
+    with db.get_engine().begin() as conn:
+        conn.execute(QueuedRun.__table__.delete())
+    for i in range(runs):
+        enqueue(f"templates/bench_{i}.yaml", f"bench_{i}")
+
+    start_at = time.time() + 3.0  # запас на запуск процессов и импорт
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        pending = [pool.apply_async(_drain, (db_url, run_ms, start_at)) for _ in range(workers)]
+        reports = [p.get() for p in pending]
+    processed = [r[0] for r in reports]
+    late = max(r[1] for r in reports) - start_at
+    if late > 0.1:
+        print(f"⚠️ Workers started {late:.2f} s late: increase the start delay")
+    elapsed = max(r[2] for r in reports) - min(r[1] for r in reports)
+    assert sum(processed) == runs, f"{sum(processed)} of {runs} runs processed"
+    return {"workers": workers, "seconds": round(elapsed, 2), "runs_per_s": round(runs / elapsed, 1),
+            "per_worker": processed}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--run-ms", type=float, default=50, help="Simulated duration of one run")
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--db-url", help="Database to use (default: temporary SQLite file)")
+    parser.add_argument("--min-efficiency", type=float, default=0.6)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+    counts = [int(n) for n in args.workers.split(",")]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_url = args.db_url or f"sqlite:///{Path(workdir) / 'bench.db'}"
+        os.environ["ROSTRAL_DB_URL"] = db_url
+        from rostral import db
+
+        results = [measure(db.DB_URL, args.runs, args.run_ms, n) for n in counts]
+        db.get_engine().dispose()
+
+    base = results[0]["runs_per_s"] / results[0]["workers"]
+    print(f"⏱ {args.runs} runs of {args.run_ms:.0f} ms on {db_url.split(':')[0]}, {os.cpu_count()} CPU")
+    for r in results:
+        r["efficiency"] = round(r["runs_per_s"] / (base * r["workers"]), 2)
+        print(f"   {r['workers']:>2} workers: {r['runs_per_s']:>7} runs/s  ({r['seconds']} s, efficiency {r['efficiency']:.0%})")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"runs": args.runs, "run_ms": args.run_ms, "results": results},
+                                                   indent=2), encoding="utf-8")
+
+    if results[-1]["efficiency"] < args.min_efficiency:
+        print(f"❌ Efficiency {results[-1]['efficiency']:.0%} at {results[-1]['workers']} workers "
+              f"is below {args.min_efficiency:.0%}")
+        return 1
+    print("✅ Scaling OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
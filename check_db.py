@@ -1,11 +1,8 @@
-import pandas as pd
-from sqlalchemy import create_engine
+from itertools import islice
 
-# 🔗 Путь к SQLite-базе
-engine = create_engine("sqlite:///rostral_cache.db")
+from rostral.export import iter_events
 
-# 📥 Загрузка всей таблицы 'events' в DataFrame
-df = pd.read_sql_table("events", con=engine)
-
-# 🧾 Просмотр первых строк
-print(df.head())
\ No newline at end of file
+# 🧾 Просмотр первых строк таблицы 'events' (без загрузки всей таблицы в память;
+# полная выгрузка — `python -m rostral export`)
+for row in islice(iter_events(), 5):
+    print(row)
@@ -8,57 +8,50 @@ if project_root not in sys.path:
 import typer
 from pathlib import Path
 from typing import Optional
-from rostral.runner import PipelineRunner
-from rostral.models import load_yaml_config
+from rostral.log import setup_logging
 
 
-import sys
-import logging
-
-# Настройка логгера
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("rostral.log", encoding="utf-8"),
-        logging.StreamHandler(sys.stdout),
-    ]
-)
-
-# Перенаправляем стандартный вывод в лог
-class Tee:
-    def __init__(self, *streams):
-        self.streams = streams
-
-    def write(self, data):
-        for s in self.streams:
-            s.write(data)
-            s.flush()
-
-    def flush(self):
-        for s in self.streams:
-            s.flush()
-
-sys.stdout = Tee(sys.stdout, open("rostral.log", "w", encoding="utf-8"))
-sys.stderr = Tee(sys.stderr, open("rostral.log", "w", encoding="utf-8"))
+app = typer.Typer(help="Rostral CLI — run monitoring pipelines from YAML templates.")
 
+def list_templates(folder: Path) -> list[Path]:
+    from rostral.registry import get_registry
+    return get_registry(folder).paths()
 
 
-app = typer.Typer(help="Rostral CLI — run monitoring pipelines from YAML templates.")
+@app.callback(invoke_without_command=True)
+def main(ctx: typer.Context):
+    """
+    Without a command, starts the interactive template picker (same as `monitor`).
+    """
+    if ctx.invoked_subcommand is None:
+        monitor(config=None, dry_run=False, once=False, cron=None, log_level=None, record=None, replay=None)
 
-def list_templates(folder: Path) -> list[Path]:
-    return sorted(folder.rglob("*.yaml")) + sorted(folder.rglob("*.yml"))
 
 @app.command()
 def monitor(
     config: Optional[Path] = typer.Argument(None, help="Path to YAML template"),
     dry_run: bool = typer.Option(False, "--dry-run", help="Run without side effects"),
     once: bool = typer.Option(False, "--once", help="Run once and exit"),
-    cron: Optional[str] = typer.Option(None, "--cron", help="Cron expression (e.g. '0 * * * *')")
+    cron: Optional[str] = typer.Option(None, "--cron", help="Cron expression (e.g. '0 * * * *')"),
+    log_level: Optional[str] = typer.Option(None, "--log-level", help="DEBUG, INFO, WARNING or ERROR (default: ROSTRAL_LOG_LEVEL or INFO)"),
+    record: Optional[Path] = typer.Option(None, "--record", help="Save every HTTP exchange (and GPT answer) to this cassette"),
+    replay: Optional[Path] = typer.Option(None, "--replay", help="Serve HTTP and GPT from this cassette, offline"),
 ):
     """
     Run a monitoring pipeline from a YAML template.
     """
+    # pydantic и SQLAlchemy (через реестр и конвейер) грузятся только для запуска
+    from rostral.registry import TemplateError, get_registry
+    from rostral.runner import PipelineRunner
+
+    setup_logging(level=log_level)
+    if record and replay:
+        raise typer.BadParameter("--record and --replay are mutually exclusive")
+    if (record or replay) and cron:
+        raise typer.BadParameter("cassettes record or replay a single run: drop --cron")
+    if replay and not replay.is_file():
+        raise typer.BadParameter(f"cassette not found: {replay}")
+
     if config is None:
         templates = list_templates(Path("templates"))
         if not templates:
@@ -76,8 +69,11 @@ def monitor(
             typer.echo("❌ Invalid selection.")
             raise typer.Exit()
 
-    cfg = load_yaml_config(str(config))
-    runner = PipelineRunner(cfg)
+    registry = get_registry()
+    try:
+        compiled = registry.get(config)
+    except TemplateError:
+        raise typer.Exit(code=2)  # список ошибок реестр уже вывел в лог
 
     if cron:
         from croniter import croniter
@@ -92,10 +88,198 @@ def monitor(
             delay = (next_run - datetime.now()).total_seconds()
             typer.echo(f"⏳ Next run at {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
             time.sleep(max(0, delay))
-            runner.run(dry_run=dry_run)
+            # Изменённый шаблон подхватывается без перезапуска; сломанный — работает прежняя версия
+            try:
+                compiled = registry.get(config)
+            except (TemplateError, FileNotFoundError) as e:
+                typer.echo(f"⚠️ Keeping the previous version of {config}: {e}", err=True)
+            PipelineRunner(compiled).run(dry_run=dry_run)
+    elif record or replay:
+        from rostral.http_client import RECORD, REPLAY, use_cassette
+
+        with use_cassette(record or replay, RECORD if record else REPLAY):
+            PipelineRunner(compiled).run(dry_run=dry_run)
     else:
         # по умолчанию — выполняем один раз (dry_run учитывается)
-        runner.run(dry_run=dry_run)
+        PipelineRunner(compiled).run(dry_run=dry_run)
+
+@app.command()
+def export(
+    output: Path = typer.Option(Path("-"), "--output", "-o", help="Output file ('-' for stdout)"),
+    fmt: str = typer.Option("ndjson", "--format", "-f", help="ndjson or csv"),
+    template: Optional[list[str]] = typer.Option(None, "--template", "-t", help="Template name (repeatable)"),
+    status: Optional[list[str]] = typer.Option(None, "--status", "-s", help="Event status (repeatable)"),
+    since: Optional[str] = typer.Option(None, "--since", help="From date/time, inclusive (YYYY-MM-DD or ISO)"),
+    until: Optional[str] = typer.Option(None, "--until", help="To date, inclusive (YYYY-MM-DD or ISO)"),
+    with_text: bool = typer.Option(False, "--with-text", help="Include full document text"),
+):
+    """
+    Stream saved events as NDJSON or CSV (constant memory, any table size).
+    """
+    from rostral.export import export_events
+
+    try:
+        chunks = export_events(fmt, template=template, status=status, since=since, until=until, with_text=with_text)
+    except ValueError as e:
+        typer.echo(f"❌ {e}", err=True)
+        raise typer.Exit(code=2)
+
+    if str(output) == "-":
+        for chunk in chunks:
+            sys.stdout.write(chunk)
+        sys.stdout.flush()
+    else:
+        with open(output, "w", encoding="utf-8", newline="") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        typer.echo(f"💾 Exported to {output}", err=True)
+
+
+@app.command("migrate-texts")
+def migrate_texts(
+    batch_size: int = typer.Option(500, "--batch-size", help="Events per transaction"),
+    vacuum: bool = typer.Option(True, "--vacuum/--no-vacuum", help="Reclaim space (SQLite VACUUM)"),
+):
+    """
+    Move uncompressed events.text/excerpt into the compressed event_texts table.
+    """
+    from rostral.db import migrate_event_texts
+
+    report = migrate_event_texts(batch_size=batch_size, vacuum=vacuum)
+    typer.echo(f"📦 Events migrated: {report['events']} in {report['seconds']} s")
+    if report.get("compression_ratio"):
+        typer.echo(f"🗜 Texts: {report['raw_bytes']:,} → {report['stored_bytes']:,} bytes (x{report['compression_ratio']})")
+    if "db_bytes_before" in report:
+        typer.echo(f"💾 Database file: {report['db_bytes_before']:,} → {report['db_bytes_after']:,} bytes")
+
+
+def parse_interval(value: str) -> float:
+    """'90', '30s', '15m', '6h', '1d' → секунды"""
+    from rostral.runqueue import parse_interval as parse
+
+    try:
+        return parse(value)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+
+@app.command()
+def maintain(
+    templates: Path = typer.Option(Path("templates"), "--templates", help="Folder with YAML templates (retention policies)"),
+    archive_dir: Optional[Path] = typer.Option(None, "--archive-dir", help="Cold archive folder (default: ROSTRAL_ARCHIVE_DIR or ./archive)"),
+    interval: Optional[str] = typer.Option(None, "--interval", help="Repeat every interval as a daemon (e.g. 6h, 1d)"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only report what would be archived and evicted"),
+    full_vacuum: bool = typer.Option(False, "--full-vacuum", help="Rebuild the SQLite file with a full VACUUM"),
+    log_level: Optional[str] = typer.Option(None, "--log-level", help="DEBUG, INFO, WARNING or ERROR"),
+):
+    """
+    Archive events past their template's retention, evict stale cache rows, VACUUM/ANALYZE.
+    """
+    import time
+    from rostral.maintenance import run_maintenance
+
+    setup_logging(level=log_level)
+    period = parse_interval(interval) if interval else None
+
+    while True:
+        report = run_maintenance(templates_dir=templates, archive_dir=archive_dir,
+                                 dry_run=dry_run, full_vacuum=full_vacuum)
+        for name, entry in report["templates"].items():
+            target = f" → {entry['file']}" if entry["file"] else ""
+            typer.echo(f"📦 {name}: {entry['expired']} events past retention{target}")
+        evicted = sum(report["cache_evicted"].values())
+        typer.echo(f"🧹 Transform cache rows {'to evict' if dry_run else 'evicted'}: {evicted}")
+        if report["db_bytes_before"] is not None:
+            typer.echo(f"💾 Database file: {report['db_bytes_before']:,} → {report['db_bytes_after']:,} bytes")
+        if period is None:
+            break
+        typer.echo(f"⏳ Next maintenance in {interval}")
+        time.sleep(period)
+
+
+@app.command()
+def schedule(
+    templates: Path = typer.Option(Path("templates"), "--templates", help="Folder with YAML templates"),
+    interval: str = typer.Option("60s", "--interval", help="How often to check for due templates"),
+    once: bool = typer.Option(False, "--once", help="Enqueue due templates once and exit"),
+    log_level: Optional[str] = typer.Option(None, "--log-level", help="DEBUG, INFO, WARNING or ERROR"),
+):
+    """
+    Enqueue templates whose source.frequency is due into the shared run queue.
+    """
+    import time
+    from rostral.runqueue import requeue_expired, schedule_due
+
+    setup_logging(level=log_level)
+    period = parse_interval(interval)
+    while True:
+        requeue_expired()
+        queued = schedule_due(templates)
+        if queued:
+            typer.echo(f"📥 Queued: {', '.join(queued)}")
+        if once:
+            break
+        time.sleep(period)
+
+
+@app.command()
+def worker(
+    concurrency: int = typer.Option(1, "--concurrency", "-c", help="Parallel runs in this process"),
+    poll: str = typer.Option("5s", "--poll", help="Idle wait between queue checks"),
+    burst: bool = typer.Option(False, "--burst", help="Exit when the queue is empty"),
+    log_level: Optional[str] = typer.Option(None, "--log-level", help="DEBUG, INFO, WARNING or ERROR"),
+):
+    """
+    Claim runs from the shared queue and execute them (start one per machine or more).
+    """
+    import threading
+    from rostral.runqueue import Worker
+
+    setup_logging(level=log_level)
+    poll_interval = parse_interval(poll)
+    stop = threading.Event()
+    workers = [Worker() for _ in range(max(1, concurrency))]
+    threads = [
+        threading.Thread(target=w.run_forever, kwargs={"poll_interval": poll_interval, "stop": stop, "burst": burst},
+                         name=f"rostral-worker-{i}")
+        for i, w in enumerate(workers)
+    ]
+    typer.echo(f"👷 {len(workers)} worker(s) polling the run queue")
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            while t.is_alive():
+                t.join(timeout=1)
+    except KeyboardInterrupt:
+        typer.echo("⏹ Stopping after current runs...")
+        stop.set()
+        for t in threads:
+            t.join()
+    typer.echo(f"✅ Runs processed: {sum(w.processed for w in workers)}")
+
+
+@app.command()
+def enqueue(
+    config: Path = typer.Argument(..., help="Path to YAML template"),
+    delay: str = typer.Option("0", "--delay", help="Start not earlier than after this interval"),
+):
+    """
+    Put one template run into the shared queue (skipped if it is already queued or running).
+    """
+    from rostral.registry import TemplateError
+    from rostral.runqueue import enqueue as enqueue_run
+
+    try:
+        queued = enqueue_run(str(config), delay=parse_interval(delay))
+    except TemplateError as e:
+        typer.echo(f"❌ {e}", err=True)
+        raise typer.Exit(code=2)
+    if queued:
+        typer.echo(f"📥 Queued {config}")
+    else:
+        typer.echo(f"🔁 {config} is already queued or running")
+
 
 if __name__ == "__main__":
     app()
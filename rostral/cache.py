@@ -1,45 +1,287 @@
 # rostral/cache.py
 
-from rostral.db import Session
-from rostral.models import TransformCache
+"""
+Двухуровневый кэш результатов трансформаций.
+
+Первый уровень — LRU в памяти процесса, второй — таблица transform_cache
+в БД. У каждой трансформации свой TTL (короткоживущие подписанные ссылки
+Яндекс.Диска не должны жить вечно) и своя политика для пустых результатов:
+по умолчанию пустой ответ не кэшируется и не считается попаданием.
+Для целых блоков есть пакетные get_many/put_many — один запрос на пачку.
+"""
+
+import inspect
+import logging
+import os
+import threading
 import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import and_, func, or_
+
+from rostral.db import Session, upsert_statement
+from rostral.models import TransformCache
+
+logger = logging.getLogger(__name__)
+
+MEMORY_CACHE_SIZE = int(os.getenv("ROSTRAL_CACHE_SIZE", 4096))
+# Записи без своего TTL удаляются при обслуживании, если не обновлялись столько дней
+CACHE_MAX_AGE_DAYS = float(os.getenv("ROSTRAL_CACHE_MAX_AGE_DAYS", 90))
+
+# transform_name → ttl; заполняется декоратором cached_transform
+_ttls: Dict[str, Optional[float]] = {}
+
+
+class _MemoryLRU:
+    """Потокобезопасный LRU: ключ → (output, updated_at)"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def put(self, key, output, updated_at: float) -> None:
+        with self._lock:
+            self._data[key] = (output, updated_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_memory = _MemoryLRU(MEMORY_CACHE_SIZE)
+_stats = defaultdict(lambda: {"memory_hits": 0, "db_hits": 0, "misses": 0, "expired": 0, "stores": 0})
+_stats_lock = threading.Lock()
+
+
+def _count(transform: str, kind: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[transform][kind] += n
+
+
+def _fresh(updated_at: Optional[float], ttl: Optional[float]) -> bool:
+    return not ttl or (updated_at is not None and time.time() - updated_at <= ttl)
+
+
+def _usable(output, cache_falsy: bool) -> bool:
+    return cache_falsy or bool(output)
+
+
+def cache_stats() -> Dict[str, dict]:
+    """Счётчики попаданий/промахов по трансформациям с долей попаданий"""
+    with _stats_lock:
+        result = {}
+        for name, counters in _stats.items():
+            hits = counters["memory_hits"] + counters["db_hits"]
+            total = hits + counters["misses"]
+            result[name] = {**counters, "hit_ratio": round(hits / total, 3) if total else 0.0}
+        return result
 
-def get_from_cache(template, transform, input_value):
+
+def reset_cache(stats: bool = True) -> None:
+    """Очищает уровень в памяти (и счётчики); таблица в БД не трогается"""
+    _memory.clear()
+    if stats:
+        with _stats_lock:
+            _stats.clear()
+
+
+def get_many(template: str, transform: str, inputs: Iterable[str], ttl: Optional[float] = None,
+             cache_falsy: bool = False) -> Dict[str, str]:
+    """
+    Возвращает {input: output} для найденных свежих записей.
+    Сначала память, затем один запрос к БД на пачку; найденное в БД
+    поднимается в память.
+    """
+    unique = list(dict.fromkeys(inputs))
+    found = {}
+    missing = []
+    for value in unique:
+        entry = _memory.get((template, transform, value))
+        if entry is not None and _fresh(entry[1], ttl) and _usable(entry[0], cache_falsy):
+            found[value] = entry[0]
+        else:
+            if entry is not None:
+                _memory.discard((template, transform, value))
+            missing.append(value)
+    _count(transform, "memory_hits", len(found))
+
+    if missing:
+        session = Session()
+        try:
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                rows = session.query(TransformCache).filter(
+                    TransformCache.template_name == template,
+                    TransformCache.transform_name == transform,
+                    TransformCache.input.in_(chunk),
+                )
+                for row in rows:
+                    if not _fresh(row.updated_at, ttl):
+                        _count(transform, "expired")
+                    elif _usable(row.output, cache_falsy):
+                        found[row.input] = row.output
+                        _memory.put((template, transform, row.input), row.output, row.updated_at)
+                        _count(transform, "db_hits")
+        finally:
+            session.close()
+
+    _count(transform, "misses", len(unique) - len(found))
+    return found
+
+
+def put_many(template: str, transform: str, outputs: Dict[str, str]) -> None:
+    """Сохраняет пачку результатов одной транзакцией и кладёт их в память"""
+    if not outputs:
+        return
+
+    now = time.time()
+    for value, output in outputs.items():
+        _memory.put((template, transform, value), output, now)
+
+    rows = [
+        {"template_name": template, "transform_name": transform, "input": value, "output": output, "updated_at": now}
+        for value, output in outputs.items()
+    ]
     session = Session()
-    row = session.query(TransformCache).filter_by(
-        template_name=template,
-        transform_name=transform,
-        input=input_value
-    ).first()
-    session.close()
-    return row.output if row else None
+    try:
+        upsert = upsert_statement(TransformCache.__table__, ["output", "updated_at"])
+        if upsert is not None:
+            session.execute(upsert, rows)
+        else:
+            inputs = list(outputs)
+            for i in range(0, len(inputs), 500):
+                session.query(TransformCache).filter(
+                    TransformCache.template_name == template,
+                    TransformCache.transform_name == transform,
+                    TransformCache.input.in_(inputs[i:i + 500]),
+                ).delete(synchronize_session=False)
+            session.add_all([TransformCache(**row) for row in rows])
+        session.commit()
+        _count(transform, "stores", len(outputs))
+    except Exception as e:
+        session.rollback()
+        logger.error(f"❌ Transform cache save error: {str(e)}")
+    finally:
+        session.close()
 
-def save_to_cache(template, transform, input_value, output_value):
+
+def evict_stale(max_age_days: Optional[float] = None, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Удаляет из transform_cache устаревшие записи: просроченные по TTL своей
+    трансформации и все, что не обновлялись дольше max_age_days
+    (по умолчанию ROSTRAL_CACHE_MAX_AGE_DAYS; 0 — без общего ограничения).
+    Возвращает {transform_name: число удалённых строк}.
+    """
+    max_age_days = CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    now = time.time()
+    conditions = [
+        and_(TransformCache.transform_name == name, TransformCache.updated_at < now - ttl)
+        for name, ttl in _ttls.items() if ttl
+    ]
+    if max_age_days:
+        conditions.append(TransformCache.updated_at < now - max_age_days * 86400)
+    if not conditions:
+        return {}
+
+    stale = or_(*conditions)
     session = Session()
-    row = TransformCache(
-        template_name=template,
-        transform_name=transform,
-        input=input_value,
-        output=output_value,
-        updated_at=time.time()
-    )
-    session.merge(row)
-    session.commit()
-    session.close()
-
-def cached_transform(transform_name: str):
+    try:
+        counts = dict(
+            session.query(TransformCache.transform_name, func.count())
+            .filter(stale).group_by(TransformCache.transform_name)
+        )
+        if counts and not dry_run:
+            session.query(TransformCache).filter(stale).delete(synchronize_session=False)
+            session.commit()
+            _memory.clear()
+        return counts
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def get_from_cache(template, transform, input_value, ttl: Optional[float] = None):
+    return get_many(template, transform, [input_value], ttl=ttl).get(input_value)
+
+
+def save_to_cache(template, transform, input_value, output_value):
+    put_many(template, transform, {input_value: output_value})
+
+
+def _accepted_kwargs(func):
+    """Функция, отбирающая из kwargs только параметры, которые принимает func"""
+    params = inspect.signature(func).parameters
+    if any(p.kind == inspect.Parameter.VAR_KEYWORD for p in params.values()):
+        return lambda kwargs: kwargs
+    names = set(params)
+    return lambda kwargs: {k: v for k, v in kwargs.items() if k in names}
+
+
+def cached_transform(transform_name: str, ttl: Optional[float] = None, cache_falsy: bool = False,
+                     max_workers: int = 1):
+    """
+    Кэширует трансформацию по (template_name, transform_name, input).
+    :param ttl: срок жизни записи в секундах (None — бессрочно)
+    :param cache_falsy: кэшировать ли пустые результаты; по умолчанию пустой
+        результат не сохраняется и трансформация повторяется при следующем вызове
+    :param max_workers: сколько промахов пакета вычислять параллельно (для I/O-трансформаций)
+    Обёртка требует template_name, но передаёт функции только те аргументы,
+    которые она объявляет. Пакетный вариант доступен как wrapper.many(inputs, ...).
+    """
     def decorator(func):
-        def wrapper(input_value: str, **kwargs):
+        select_kwargs = _accepted_kwargs(func)
+
+        def _require_template(kwargs) -> str:
             template_name = kwargs.get("template_name")
             if not template_name:
                 raise ValueError("Missing required keyword argument: template_name")
+            return template_name
+
+        @wraps(func)
+        def wrapper(input_value: str, **kwargs):
+            return wrapper.many([input_value], **kwargs)[input_value]
 
-            cached = get_from_cache(template_name, transform_name, input_value)
-            if cached:
-                return cached
+        def many(inputs: Iterable[str], **kwargs) -> Dict[str, str]:
+            """Результаты для всех inputs: попадания одним запросом, промахи вычисляются"""
+            template_name = _require_template(kwargs)
+            inputs = list(dict.fromkeys(inputs))
+            results = get_many(template_name, transform_name, inputs, ttl=ttl, cache_falsy=cache_falsy)
+            misses = [value for value in inputs if value not in results]
+            call_kwargs = select_kwargs(kwargs)
+            if max_workers > 1 and len(misses) > 1:
+                with ThreadPoolExecutor(max_workers=min(max_workers, len(misses))) as executor:
+                    computed = dict(zip(misses, executor.map(lambda value: func(value, **call_kwargs), misses)))
+            else:
+                computed = {value: func(value, **call_kwargs) for value in misses}
+            put_many(template_name, transform_name,
+                     {k: v for k, v in computed.items() if _usable(v, cache_falsy)})
+            results.update(computed)
+            return results
 
-            result = func(input_value, **kwargs)
-            save_to_cache(template_name, transform_name, input_value, result)
-            return result
+        wrapper.many = many
+        wrapper.transform_name = transform_name
+        wrapper.ttl = ttl
+        wrapper.cache_falsy = cache_falsy
+        _ttls[transform_name] = ttl
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,72 @@
+# rostral/compression.py
+
+"""
+Сжатие больших текстовых полей событий (EventText).
+
+Кодек хранится рядом с данными, поэтому база читается при любой настройке:
+  - raw  — короткий текст, сжимать невыгодно
+  - zlib — по умолчанию, есть в стандартной библиотеке
+  - zstd — если установлен пакет zstandard (быстрее и плотнее zlib)
+Кодек для записи выбирается переменной ROSTRAL_TEXT_CODEC (auto | zstd | zlib | raw).
+"""
+
+import logging
+import os
+import zlib
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TEXT_CODEC = os.getenv("ROSTRAL_TEXT_CODEC", "auto").lower()
+MIN_COMPRESS_BYTES = 256
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 6
+
+_zstd = None
+
+
+def _zstandard():
+    """Модуль zstandard или None (зависимость необязательная)"""
+    global _zstd
+    if _zstd is None:
+        try:
+            import zstandard
+            _zstd = zstandard
+        except ImportError:
+            _zstd = False
+    return _zstd or None
+
+
+def write_codec() -> str:
+    if TEXT_CODEC == "auto":
+        return "zstd" if _zstandard() else "zlib"
+    if TEXT_CODEC == "zstd" and not _zstandard():
+        logger.warning("⚠️ ROSTRAL_TEXT_CODEC=zstd, but zstandard is not installed — using zlib")
+        return "zlib"
+    return TEXT_CODEC
+
+
+def compress(text: str, codec: Optional[str] = None) -> Tuple[str, bytes]:
+    """(кодек, данные) для сохранения текста"""
+    raw = text.encode("utf-8")
+    codec = codec or write_codec()
+    if codec == "raw" or len(raw) < MIN_COMPRESS_BYTES:
+        return "raw", raw
+    if codec == "zstd":
+        return "zstd", _zstandard().ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress(codec: str, data: bytes) -> str:
+    if codec == "raw":
+        raw = data
+    elif codec == "zlib":
+        raw = zlib.decompress(data)
+    elif codec == "zstd":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise RuntimeError("Text is stored with zstd: install the zstandard package to read it")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raise ValueError(f"Unknown text codec: {codec}")
+    return raw.decode("utf-8")
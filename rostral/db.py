@@ -1,12 +1,195 @@
-from sqlalchemy import create_engine, exists
+from sqlalchemy import create_engine, event as sa_event, exists, or_, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
-from .models import Base, Event
+from .models import ArchivedEvent, Base, Event, EventText
+from .compression import compress
 from datetime import datetime, timezone
 import hashlib
+import logging
+import os
+import threading
+import time
 
-engine = create_engine("sqlite:///rostral_cache.db")
-Session = sessionmaker(bind=engine)
-Base.metadata.create_all(engine)
+logger = logging.getLogger(__name__)
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return default if value is None else value.strip().lower() not in ("0", "false", "no", "off", "")
+
+
+def database_url() -> str:
+    """
+    URL базы из окружения:
+      - ROSTRAL_DB_URL или DATABASE_URL (как у Railway/Render) — готовый URL SQLAlchemy;
+      - DB_ENGINE=postgres — URL собирается из POSTGRES_HOST/PORT/USER/PASSWORD/DB;
+      - по умолчанию — файл SQLite rostral_cache.db.
+    """
+    url = os.getenv("ROSTRAL_DB_URL") or os.getenv("DATABASE_URL")
+    if not url and os.getenv("DB_ENGINE", "sqlite").lower() in ("postgres", "postgresql"):
+        url = "postgresql+psycopg2://{user}:{password}@{host}:{port}/{db}".format(
+            user=os.getenv("POSTGRES_USER", "rostral"),
+            password=os.getenv("POSTGRES_PASSWORD", ""),
+            host=os.getenv("POSTGRES_HOST", "localhost"),
+            port=os.getenv("POSTGRES_PORT", "5432"),
+            db=os.getenv("POSTGRES_DB", "rostral"),
+        )
+    url = url or "sqlite:///rostral_cache.db"
+    # Провайдеры отдают postgres:// или postgresql:// без драйвера; драйвер по умолчанию
+    # зависит от версии SQLAlchemy, поэтому указываем установленный psycopg2 явно
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            url = "postgresql+psycopg2://" + url[len(prefix):]
+    return url
+
+
+DB_URL = database_url()
+
+# Пул соединений (PostgreSQL): воркеры пишут параллельно, соединения проверяются перед выдачей
+POOL_SIZE = int(os.getenv("ROSTRAL_DB_POOL_SIZE", 5))
+MAX_OVERFLOW = int(os.getenv("ROSTRAL_DB_MAX_OVERFLOW", 10))
+POOL_TIMEOUT = float(os.getenv("ROSTRAL_DB_POOL_TIMEOUT", 30))
+POOL_RECYCLE = int(os.getenv("ROSTRAL_DB_POOL_RECYCLE", 1800))
+POOL_PRE_PING = _env_flag("ROSTRAL_DB_POOL_PRE_PING", True)
+# SQLite: WAL позволяет читать во время записи, writer ждёт блокировку до SQLITE_BUSY_TIMEOUT секунд
+SQLITE_WAL = _env_flag("ROSTRAL_SQLITE_WAL", True)
+SQLITE_BUSY_TIMEOUT = float(os.getenv("ROSTRAL_SQLITE_BUSY_TIMEOUT", 30))
+
+# Движок и схема создаются при первом обращении, а не при импорте:
+# запуск CLI не должен трогать диск, пока база не понадобилась.
+_engine = None
+_session_factory = None
+_init_lock = threading.Lock()
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(url) -> dict:
+    """Параметры create_engine для URL: пул для серверных СУБД, таймаут блокировки для SQLite"""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        return {"connect_args": {"timeout": SQLITE_BUSY_TIMEOUT}}
+    return {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")  # в WAL безопасно и заметно быстрее FULL
+    finally:
+        cursor.close()
+
+
+def create_db_engine(url=None):
+    """Движок по URL (по умолчанию DB_URL) с настройками пула и SQLite-прагмами"""
+    url = make_url(url or DB_URL)
+    engine = create_engine(url, **engine_options(url))
+    if url.get_backend_name() == "sqlite":
+        if SQLITE_WAL and not _is_memory_sqlite(url):
+            sa_event.listen(engine, "connect", _sqlite_pragmas)
+        # Действует только для новой базы: у существующей режим меняет VACUUM (rostral maintain)
+        with engine.connect() as conn:
+            conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+    return engine
+
+
+def get_engine():
+    """Возвращает движок SQLAlchemy, при первом вызове создаёт таблицы"""
+    global _engine
+    if _engine is None:
+        with _init_lock:
+            if _engine is None:
+                engine = create_db_engine()
+                Base.metadata.create_all(engine)
+                _warn_legacy_texts(engine)
+                _engine = engine
+    return _engine
+
+
+def _has_legacy_texts(conn) -> bool:
+    return conn.execute(text(
+        "SELECT 1 FROM events WHERE text IS NOT NULL OR excerpt IS NOT NULL LIMIT 1"
+    )).first() is not None
+
+
+def _warn_legacy_texts(engine) -> None:
+    try:
+        with engine.connect() as conn:
+            if _has_legacy_texts(conn):
+                logger.warning("⚠️ events.text/excerpt hold uncompressed texts: run `python -m rostral migrate-texts`")
+    except Exception as e:
+        logger.debug(f"Legacy text check skipped: {e}")
+
+
+def migrate_event_texts(batch_size: int = 500, vacuum: bool = True) -> dict:
+    """
+    Переносит несжатые events.text/excerpt в event_texts (сжатие, выдержка-ссылка
+    при совпадении с текстом) и очищает старые колонки. Идёт пачками, можно
+    прерывать и запускать повторно. Возвращает отчёт о размерах и скорости.
+    """
+    engine = get_engine()
+    db_file = engine.url.database if engine.url.get_backend_name() == "sqlite" else None
+    size_before = os.path.getsize(db_file) if db_file and os.path.exists(db_file) else None
+    report = {"events": 0, "raw_bytes": 0, "stored_bytes": 0, "seconds": 0.0}
+    started = time.perf_counter()
+
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                "SELECT event_id, text, excerpt FROM events "
+                "WHERE text IS NOT NULL OR excerpt IS NOT NULL LIMIT :limit"
+            ), {"limit": batch_size}).all()
+            if not rows:
+                break
+            stored = []
+            for event_id, body, excerpt in rows:
+                for field, value in (("text", body), ("excerpt", excerpt)):
+                    if not value:
+                        continue
+                    report["raw_bytes"] += len(value.encode("utf-8"))
+                    if field == "excerpt" and value == body:
+                        codec, data = "ref", b"text"
+                    else:
+                        codec, data = compress(value)
+                    report["stored_bytes"] += len(data)
+                    stored.append({"event_id": event_id, "field": field, "codec": codec,
+                                   "size": len(value.encode("utf-8")), "data": data})
+            ids = [r[0] for r in rows]
+            conn.execute(EventText.__table__.delete().where(EventText.event_id.in_(ids)))
+            if stored:
+                conn.execute(EventText.__table__.insert(), stored)
+            conn.execute(Event.__table__.update().where(Event.event_id.in_(ids)).values(text=None, excerpt=None))
+            report["events"] += len(rows)
+        logger.info(f"📦 Migrated texts of {report['events']} events")
+
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    if db_file and vacuum and report["events"]:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+    if size_before is not None:
+        report["db_bytes_before"] = size_before
+        report["db_bytes_after"] = os.path.getsize(db_file)
+    if report["raw_bytes"]:
+        report["compression_ratio"] = round(report["raw_bytes"] / max(1, report["stored_bytes"]), 2)
+    return report
+
+
+def Session():
+    """Открывает новую сессию БД (фабрика сессий создаётся лениво)"""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(bind=get_engine())
+    return _session_factory()
 
 def get_event_hash(record: dict) -> str:
     """
@@ -28,8 +211,10 @@ def is_known_by_hash(record: dict) -> bool:
     session = Session()
     try:
         event_hash = get_event_hash(record)
-        exists = session.query(Event).filter_by(event_id=event_hash).first() is not None
-        return exists
+        return (
+            session.query(exists().where(Event.event_id == event_hash)).scalar()
+            or session.query(exists().where(ArchivedEvent.event_id == event_hash)).scalar()
+        )
     finally:
         session.close()
 
@@ -40,45 +225,149 @@ def is_known_by_url(url: str) -> bool:
 
     session = Session()
     try:
-        return session.query(exists().where(Event.url == url)).scalar()
+        return (
+            session.query(exists().where(Event.url == url)).scalar()
+            or session.query(exists().where(ArchivedEvent.url == url)).scalar()
+        )
+    finally:
+        session.close()
+
+def _known_values(values, *columns) -> set:
+    """Возвращает подмножество values, уже присутствующих в любой из колонок (запрос на пачку)"""
+    values = list({v for v in values if v})
+    if not values:
+        return set()
+
+    session = Session()
+    try:
+        found = set()
+        for i in range(0, len(values), 500):  # ограничение SQLite на число параметров
+            chunk = values[i:i + 500]
+            for column in columns:
+                found.update(value for (value,) in session.query(column).filter(column.in_(chunk)))
+        return found
     finally:
         session.close()
 
+def known_urls(urls) -> set:
+    """Возвращает подмножество URL, уже сохранённых в БД или архиве (один запрос на пачку)"""
+    return _known_values(urls, Event.url, ArchivedEvent.url)
+
+def known_hashes(hashes) -> set:
+    """Возвращает подмножество хэшей событий (event_id), уже сохранённых в БД или архиве"""
+    return _known_values(hashes, Event.event_id, ArchivedEvent.event_id)
+
+def gpt_texts_for(event_ids) -> dict:
+    """Возвращает {event_id: gpt_text} для событий, у которых уже есть ответ GPT"""
+    event_ids = list({e for e in event_ids if e})
+    if not event_ids:
+        return {}
+
+    session = Session()
+    try:
+        rows = session.query(Event.event_id, Event.gpt_text).filter(
+            Event.event_id.in_(event_ids), Event.gpt_text.isnot(None)
+        )
+        return {event_id: gpt_text for event_id, gpt_text in rows if gpt_text}
+    finally:
+        session.close()
+
+def _dialect_insert(table):
+    """insert() диалекта текущего движка, если он поддерживает ON CONFLICT (SQLite, PostgreSQL)"""
+    dialect = get_engine().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(table)
+
+def insert_ignoring_conflicts(table):
+    """
+    INSERT ... ON CONFLICT DO NOTHING: дубликат, который параллельно записал
+    другой воркер, пропускается без исключения и без гонки между проверкой
+    и вставкой. Для СУБД без ON CONFLICT — обычный INSERT.
+    """
+    statement = _dialect_insert(table)
+    return table.insert() if statement is None else statement.on_conflict_do_nothing()
+
+def upsert_statement(table, update_columns):
+    """
+    INSERT ... ON CONFLICT (первичный ключ) DO UPDATE для update_columns.
+    None, если СУБД так не умеет (вызывающий делает DELETE + INSERT).
+    """
+    statement = _dialect_insert(table)
+    if statement is None:
+        return None
+    return statement.on_conflict_do_update(
+        index_elements=[column.name for column in table.primary_key.columns],
+        set_={name: statement.excluded[name] for name in update_columns},
+    )
+
+def _is_archived(conn, url: str, event_hash: str) -> bool:
+    return conn.execute(
+        exists().where(or_(ArchivedEvent.url == url, ArchivedEvent.event_id == event_hash)).select()
+    ).scalar()
+
+def _row(obj) -> dict:
+    return {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+
 def save_event(record: dict, **kwargs) -> bool:
     """
     Сохраняет событие в базу данных.
     Параметры:
     - record: словарь с данными события (обязательно должен содержать 'url')
     - **kwargs: игнорирует лишние параметры (например, config) для совместимости
+    Возвращает False, если событие (по url или хэшу) уже есть в базе или архиве.
     """
-    session = Session()
     try:
         url = record.get("url")
         if not url:
             raise ValueError("URL is required")
 
-        # Проверяем дубликаты
-        if is_known_by_url(url) or is_known_by_hash(record):
-            return False
-
         event = Event(
             event_id=get_event_hash(record),
             url=url,
             title=record.get("title", "")[:500],
-            text=record.get("text", ""),
-            excerpt=record.get("excerpt", ""),
             gpt_text=record.get("gpt_text"),
             error=record.get("error"),
             status=record.get("status", "pending"),
-            template_name=record.get("template_name")
+            template_name=record.get("template_name"),
+            timestamp=datetime.now(timezone.utc),
         )
-        
-        session.add(event)
-        session.commit()
+        # Тексты сжимаются свойствами модели; строки event_texts пишутся ниже одной транзакцией
+        event.text = record.get("text", "")
+        event.excerpt = record.get("excerpt", "")
+
+        with get_engine().begin() as conn:
+            if _is_archived(conn, url, event.event_id):
+                return False
+            values = {key: getattr(event, key) for key in
+                      ("event_id", "url", "title", "gpt_text", "error", "status", "template_name", "timestamp")}
+            result = conn.execute(insert_ignoring_conflicts(Event.__table__).values(**values))
+            if not result.rowcount:
+                return False  # такой url или хэш уже сохранён
+            event.id = result.inserted_primary_key[0]
+
+            texts = [{**_row(stored), "event_id": event.event_id} for stored in event.texts.values()]
+            if texts:
+                conn.execute(EventText.__table__.insert(), texts)
+
+            # Отпечаток для поиска почти-дубликатов хранится рядом с событием
+            from rostral.neardup import fingerprint_rows
+            rows_by_table = {}
+            for obj in fingerprint_rows({**record, "event_id": event.event_id}):
+                rows_by_table.setdefault(obj.__table__, []).append(_row(obj))
+            for table, rows in rows_by_table.items():
+                conn.execute(table.insert(), rows)
+
+        # Живая лента: подписчики /events/stream получают событие сразу
+        from rostral.events import publish_event
+        publish_event(event)
         return True
+    except IntegrityError:
+        return False  # СУБД без ON CONFLICT: дубликат отклонён уникальным индексом
     except Exception as e:
-        session.rollback()
-        print(f"❌ Save error: {str(e)}")
+        logger.error(f"❌ Save error: {str(e)}")
         return False
-    finally:
-        session.close()
\ No newline at end of file
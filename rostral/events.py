@@ -0,0 +1,213 @@
+# rostral/events.py
+
+"""
+Живые обновления ленты: рассылка новых событий подписчикам (SSE).
+
+save_event публикует каждое сохранённое событие; подписчик — очередь
+одного открытого соединения /events/stream. События, сохранённые другим
+процессом (CLI по cron, воркер), подхватывает один общий фоновый поток:
+раз в POLL_INTERVAL секунд он спрашивает у БД max(id) и, если появилось
+новое, рассылает его. Пока подписчиков нет, поток не работает, а
+простаивающий подписчик только ждёт на своей очереди.
+
+feed_version() — кэшируемая версия ленты для ETag / Last-Modified.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import timezone
+from typing import Iterator, List, Optional
+
+from sqlalchemy import func
+
+from rostral.models import Event
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv("ROSTRAL_SSE_POLL_INTERVAL", 5))
+HEARTBEAT_INTERVAL = float(os.getenv("ROSTRAL_SSE_HEARTBEAT", 15))
+SUBSCRIBER_QUEUE_SIZE = 100
+FEED_VERSION_TTL = float(os.getenv("ROSTRAL_FEED_VERSION_TTL", 2))
+
+
+def event_payload(event: Event) -> dict:
+    """Что уходит подписчикам: поля карточки ленты без текстов (они в event_texts)"""
+    timestamp = event.timestamp
+    return {
+        "id": event.id,
+        "event_id": event.event_id,
+        "url": event.url,
+        "title": event.title,
+        "template_name": event.template_name,
+        "status": event.status,
+        "gpt_text": event.gpt_text,
+        "timestamp": timestamp.isoformat(timespec="seconds") if timestamp else None,
+    }
+
+
+class EventBroker:
+    """Рассылка событий по очередям подписчиков плюс общий опрос БД"""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.Lock()
+        self._cursor: Optional[int] = None  # до какого id БД уже просмотрена опросом
+        self._recent = deque(maxlen=SUBSCRIBER_QUEUE_SIZE * 10)  # id уже разосланных событий
+        self._poller: Optional[threading.Thread] = None
+        self._version = None
+        self._version_at = 0.0
+
+    def subscribe(self) -> queue.Queue:
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.append(q)
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll_loop, name="rostral-sse-poller", daemon=True)
+                self._poller.start()
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    @property
+    def subscribers(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, payload: dict) -> None:
+        """Рассылает событие; каждое событие уходит подписчикам один раз"""
+        with self._lock:
+            if payload["id"] in self._recent:
+                return
+            self._recent.append(payload["id"])
+            self._version = None  # лента изменилась: ETag пересчитается
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(payload)
+            except queue.Full:
+                # Медленный клиент: выбрасываем самое старое, он догонит по Last-Event-ID
+                try:
+                    q.get_nowait()
+                    q.put_nowait(payload)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def poll_once(self) -> int:
+        """Рассылает события, сохранённые в обход publish (другим процессом)"""
+        from rostral.db import Session
+
+        session = Session()
+        try:
+            newest = session.query(func.max(Event.id)).scalar() or 0
+            cursor = self._cursor
+            if cursor is None:
+                # Первый опрос только запоминает позицию: историю шлём по Last-Event-ID
+                self._cursor = newest
+                return 0
+            if newest <= cursor:
+                return 0
+            rows = session.query(Event).filter(Event.id > cursor).order_by(Event.id).all()
+            for event in rows:
+                self.publish(event_payload(event))
+            self._cursor = newest
+            return len(rows)
+        finally:
+            session.close()
+
+    def _poll_loop(self) -> None:
+        while self.subscribers:
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning(f"⚠️ SSE poll failed: {e}")
+            time.sleep(self.poll_interval)
+
+    def feed_version(self) -> tuple:
+        """(max id, число событий, время новейшего) — кэшируется на FEED_VERSION_TTL секунд"""
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._version_at < FEED_VERSION_TTL:
+                return self._version
+        from rostral.db import Session
+
+        session = Session()
+        try:
+            newest_id, count, newest_at = session.query(
+                func.max(Event.id), func.count(Event.id), func.max(Event.timestamp)
+            ).one()
+        finally:
+            session.close()
+        if newest_at is not None and newest_at.tzinfo is None:
+            newest_at = newest_at.replace(tzinfo=timezone.utc)
+        version = (newest_id or 0, count, newest_at)
+        with self._lock:
+            self._version, self._version_at = version, time.monotonic()
+        return version
+
+
+def events_since(last_id: int) -> List[dict]:
+    """События с id > last_id (докачка после переподключения по Last-Event-ID)"""
+    from rostral.db import Session
+
+    session = Session()
+    try:
+        rows = session.query(Event).filter(Event.id > last_id).order_by(Event.id).limit(SUBSCRIBER_QUEUE_SIZE)
+        return [event_payload(e) for e in rows]
+    finally:
+        session.close()
+
+
+def sse_stream(broker: "EventBroker", last_event_id: Optional[int] = None,
+               heartbeat: float = HEARTBEAT_INTERVAL) -> Iterator[str]:
+    """Поток SSE-сообщений для одного клиента; комментарий-пинг держит соединение живым"""
+    q = broker.subscribe()
+    try:
+        yield f"retry: {int(broker.poll_interval * 1000)}\n\n"
+        replayed = set()
+        if last_event_id is not None:
+            for payload in events_since(last_event_id):
+                replayed.add(payload["id"])
+                yield format_sse(payload)
+        while True:
+            try:
+                payload = q.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            if payload["id"] not in replayed:
+                yield format_sse(payload)
+    finally:
+        broker.unsubscribe(q)
+
+
+def format_sse(payload: dict) -> str:
+    return f"id: {payload['id']}\nevent: event\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+_broker: Optional[EventBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> EventBroker:
+    """Общий для процесса EventBroker"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = EventBroker()
+        return _broker
+
+
+def publish_event(event: Event) -> None:
+    """Вызывается из save_event после коммита; ошибки рассылки не мешают сохранению"""
+    try:
+        get_broker().publish(event_payload(event))
+    except Exception as e:
+        logger.warning(f"⚠️ Event publish failed: {e}")
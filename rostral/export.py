@@ -0,0 +1,170 @@
+# rostral/export.py
+
+"""
+Потоковая выгрузка событий в NDJSON или CSV.
+
+Строки читаются серверным курсором (stream_results + yield_per) и сразу
+превращаются в текст, который отдаётся кусками по ~64 КБ: память не
+зависит от размера таблицы. Используется в /api/export и `rostral export`.
+"""
+
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm import aliased
+
+from rostral.compression import decompress
+from rostral.db import get_engine
+from rostral.models import Event, EventText
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("ndjson", "csv")
+CHUNK_ROWS = 1000
+CHUNK_BYTES = 64 * 1024
+
+COLUMNS = ["id", "event_id", "template_name", "status", "timestamp", "url", "title", "gpt_text", "error"]
+TEXT_COLUMNS = ["excerpt", "text"]  # хранятся сжатыми в event_texts, выгружаются только с with_text
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def parse_date(value: Optional[str], end: bool = False) -> Optional[datetime]:
+    """
+    ISO-дата или дата-время. Голая дата как верхняя граница включает весь день:
+    until=2024-01-31 → всё до 2024-02-01 00:00.
+    """
+    if not value:
+        return None
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            moment = datetime(day.year, day.month, day.day)
+            return moment + timedelta(days=1) if end else moment
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value!r} (expected YYYY-MM-DD or ISO datetime)")
+    # События хранятся в UTC без зоны
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def build_query(template: Optional[Sequence[str]] = None, status: Optional[Sequence[str]] = None,
+                since: Optional[datetime] = None, until: Optional[datetime] = None, with_text: bool = False):
+    columns = [getattr(Event, c) for c in COLUMNS]
+    query = select(*columns)
+    if with_text:
+        # По LEFT JOIN на каждое поле; legacy-колонки — для ещё не мигрированных баз
+        for field in TEXT_COLUMNS:
+            stored = aliased(EventText, name=f"stored_{field}")
+            query = query.outerjoin(stored, and_(stored.event_id == Event.event_id, stored.field == field))
+            query = query.add_columns(
+                stored.codec.label(f"{field}_codec"),
+                stored.data.label(f"{field}_data"),
+                getattr(Event, f"legacy_{field}").label(f"{field}_legacy"),
+            )
+    query = query.order_by(Event.id)
+    if template:
+        query = query.where(Event.template_name.in_(list(template)))
+    if status:
+        query = query.where(Event.status.in_(list(status)))
+    if since:
+        query = query.where(Event.timestamp >= since)
+    if until:
+        query = query.where(Event.timestamp < until)
+    return query
+
+
+def _unpack_texts(row: dict) -> dict:
+    refs = {}
+    for field in TEXT_COLUMNS:
+        codec, data, legacy = row.pop(f"{field}_codec"), row.pop(f"{field}_data"), row.pop(f"{field}_legacy")
+        if codec is None:
+            row[field] = legacy
+        elif codec == "ref":
+            refs[field] = data.decode()  # выдержка совпадает с текстом: берём его
+        else:
+            row[field] = decompress(codec, data)
+    for field, source in refs.items():
+        row[field] = row.get(source)
+    return row
+
+
+def iter_events(chunk_rows: int = CHUNK_ROWS, with_text: bool = False, **filters) -> Iterator[dict]:
+    """События по фильтрам, по одному словарю; БД отдаёт их порциями по chunk_rows"""
+    query = build_query(with_text=with_text, **filters)
+    with get_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(query)
+        for row in result:
+            row = dict(row._mapping)
+            yield _unpack_texts(row) if with_text else row
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="seconds")
+    return value
+
+
+def ndjson_lines(rows: Iterable[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps({k: _value(v) for k, v in row.items()}, ensure_ascii=False) + "\n"
+
+
+def csv_lines(rows: Iterable[dict], columns: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_value(row.get(c)) if row.get(c) is not None else "" for c in columns])
+        # Одна строка в буфере: после выдачи он очищается
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _chunked(lines: Iterable[str], size: Optional[int] = None) -> Iterator[str]:
+    """Склеивает строки в куски ~size символов: меньше системных вызовов и HTTP-чанков"""
+    size = size or CHUNK_BYTES
+    parts, length = [], 0
+    for line in lines:
+        parts.append(line)
+        length += len(line)
+        if length >= size:
+            yield "".join(parts)
+            parts, length = [], 0
+    if parts:
+        yield "".join(parts)
+
+
+def export_events(fmt: str = "ndjson", template=None, status=None, since: Optional[str] = None,
+                  until: Optional[str] = None, with_text: bool = False) -> Iterator[str]:
+    """
+    Генератор текстовых кусков выгрузки.
+    Фильтры проверяются сразу (ValueError), а БД читается только при итерации.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt!r} (expected one of {', '.join(FORMATS)})")
+    filters = {
+        "template": template or None,
+        "status": status or None,
+        "since": parse_date(since),
+        "until": parse_date(until, end=True),
+        "with_text": with_text,
+    }
+    columns = COLUMNS + (TEXT_COLUMNS if with_text else [])
+
+    def generate():
+        rows = iter_events(**filters)
+        lines = ndjson_lines(rows) if fmt == "ndjson" else csv_lines(rows, columns)
+        yield from _chunked(lines)
+
+    return generate()
@@ -0,0 +1,222 @@
+# rostral/http_client.py
+
+"""
+Общий HTTP-слой конвейера: все запросы стадий идут через get().
+
+Кассета записывает каждый обмен запуска в один zip-файл (index.json +
+тела ответов, сжатые и без повторов по sha1) и затем отдаёт те же ответы
+без сети. Так селекторы, регулярки и шаблоны алертов можно отлаживать
+за секунды и на том же коде, что работает в бою:
+
+    python -m rostral monitor templates/x.yaml --record cassettes/x.zip
+    python -m rostral monitor templates/x.yaml --replay cassettes/x.zip --dry-run
+
+В кассету попадают и ответы GPT (по хэшу промпта). При воспроизведении
+запрос, которого нет в кассете, завершается CassetteMiss (это
+requests.ConnectionError — стадии обрабатывают его как сетевую ошибку),
+а паузы вежливости по хостам не соблюдаются.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import threading
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from urllib3 import HTTPResponse
+
+logger = logging.getLogger(__name__)
+
+RECORD, REPLAY = "record", "replay"
+CASSETTE_VERSION = 1
+
+# Тела хранятся распакованными: заголовки о сжатии и длине к ним больше не относятся
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+
+
+class CassetteMiss(requests.ConnectionError):
+    """Запроса нет в кассете (или при записи он завершился сетевой ошибкой)"""
+
+
+def request_key(method: str, url: str, params: Optional[dict] = None) -> str:
+    """Ключ запроса в кассете: метод и нормализованный URL с параметрами"""
+    return f"{method.upper()} {requests.Request(method, url, params=params).prepare().url}"
+
+
+class Cassette:
+    """
+    Запись или воспроизведение обменов одного запуска. Повторные запросы
+    с одним ключом отдаются по порядку записи (последний ответ — дальше по кругу).
+    """
+
+    def __init__(self, path: Union[str, Path], mode: str):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: List[dict] = []
+        self._bodies: set = set()
+        self._served: Dict[str, int] = {}
+        if mode == RECORD:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._zip = zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_DEFLATED)
+        else:
+            self._zip = zipfile.ZipFile(self.path, "r")
+            index = json.loads(self._zip.read("index.json"))
+            self._entries = index["entries"]
+        self._by_key: Dict[str, List[dict]] = {}
+        for entry in self._entries:
+            self._by_key.setdefault(entry["key"], []).append(entry)
+
+    # --- хранение ---
+
+    def _put_body(self, body: bytes) -> str:
+        name = f"bodies/{hashlib.sha1(body).hexdigest()}"
+        if name not in self._bodies:
+            self._zip.writestr(name, body)
+            self._bodies.add(name)
+        return name
+
+    def _add(self, entry: dict, body: Optional[bytes] = None) -> dict:
+        with self._lock:
+            if body is not None:
+                entry["body"] = self._put_body(body)
+            self._entries.append(entry)
+            self._by_key.setdefault(entry["key"], []).append(entry)
+        return entry
+
+    def _next(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entries = self._by_key.get(key)
+            if not entries:
+                self.misses += 1
+                return None
+            index = self._served.get(key, 0)
+            self._served[key] = index + 1
+            self.hits += 1
+            return entries[min(index, len(entries) - 1)]
+
+    def _body(self, entry: dict) -> bytes:
+        if not entry.get("body"):
+            return b""
+        with self._lock:
+            return self._zip.read(entry["body"])
+
+    # --- HTTP ---
+
+    def request(self, method: str, url: str, send: Callable[[], requests.Response],
+                params: Optional[dict] = None) -> requests.Response:
+        key = request_key(method, url, params)
+        if self.mode == REPLAY:
+            entry = self._next(key)
+            if entry is None:
+                raise CassetteMiss(f"Not in cassette {self.path.name}: {key}")
+        else:
+            try:
+                response = send()
+            except requests.RequestException as e:
+                self._add({"key": key, "error": f"{type(e).__name__}: {e}"})
+                raise
+            try:
+                body = response.content  # при записи поток читается целиком
+            finally:
+                response.close()
+            entry = self._add({
+                "key": key,
+                "url": response.url,
+                "status": response.status_code,
+                "reason": response.reason,
+                "encoding": response.encoding,
+                "headers": {k: v for k, v in response.headers.items() if k.lower() not in _DROP_HEADERS},
+            }, body)
+        if entry.get("error"):
+            raise CassetteMiss(f"Recorded failure for {key}: {entry['error']}")
+        return _build_response(method, entry, self._body(entry))
+
+    # --- произвольные вызовы (GPT) ---
+
+    def call(self, kind: str, payload: str, fn: Callable[[], str]) -> str:
+        """Ответ внешнего вызова по хэшу входа: при записи сохраняется, при воспроизведении читается"""
+        key = f"{kind} {hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+        if self.mode == REPLAY:
+            entry = self._next(key)
+            if entry is None:
+                raise CassetteMiss(f"Not in cassette {self.path.name}: {kind} call")
+            return self._body(entry).decode("utf-8")
+        result = fn()
+        if isinstance(result, str):  # ошибки бэкенда не записываются
+            self._add({"key": key}, result.encode("utf-8"))
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            if self.mode == RECORD:
+                self._zip.writestr("index.json", json.dumps({
+                    "version": CASSETTE_VERSION,
+                    "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "entries": self._entries,
+                }, ensure_ascii=False, separators=(",", ":")))
+            self._zip.close()
+
+
+def _build_response(method: str, entry: dict, body: bytes) -> requests.Response:
+    """requests.Response из записи: работают .content/.text/.json(), iter_content и .raw"""
+    headers = entry.get("headers") or {}
+    response = requests.Response()
+    response.status_code = entry["status"]
+    response.reason = entry.get("reason")
+    response.headers = CaseInsensitiveDict(headers)
+    response.raw = HTTPResponse(body=io.BytesIO(body), headers=headers, status=entry["status"],
+                                reason=entry.get("reason"), preload_content=False, decode_content=False)
+    response.url = entry.get("url")
+    response.encoding = entry.get("encoding")
+    response.request = requests.Request(method, entry.get("url")).prepare()
+    return response
+
+
+_active: Optional[Cassette] = None
+
+
+@contextmanager
+def use_cassette(path: Union[str, Path], mode: str) -> Iterator[Cassette]:
+    """Включает кассету для всех запросов процесса (включая потоки загрузки)"""
+    global _active
+    if _active is not None:
+        raise RuntimeError(f"Cassette {_active.path} is already in use")
+    cassette = Cassette(path, mode)
+    _active = cassette
+    logger.info(f"📼 Cassette {mode}: {cassette.path}")
+    try:
+        yield cassette
+    finally:
+        _active = None
+        cassette.close()
+        if mode == REPLAY:
+            logger.info(f"📼 Replayed {cassette.hits} responses, {cassette.misses} not in cassette")
+        else:
+            logger.info(f"📼 Recorded {len(cassette._entries)} exchanges → {cassette.path}")
+
+
+def active_cassette() -> Optional[Cassette]:
+    return _active
+
+
+def replaying() -> bool:
+    return _active is not None and _active.mode == REPLAY
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """requests.get через активную кассету (если она есть)"""
+    if _active is None:
+        return requests.get(url, **kwargs)
+    return _active.request("GET", url, lambda: requests.get(url, **kwargs), params=kwargs.get("params"))
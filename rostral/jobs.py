@@ -0,0 +1,182 @@
+# rostral/jobs.py
+
+"""
+Фоновые запуски шаблонов для веб-интерфейса.
+
+Обработчик запроса только ставит задачу в очередь и сразу отвечает её id;
+конвейер выполняется в ограниченном пуле потоков. Повторный запуск шаблона,
+который уже стоит в очереди или выполняется, не создаёт вторую копию —
+возвращается существующая задача. Ход выполнения (по стадиям) доступен
+через Job.to_dict() для эндпоинта /jobs/<id>.
+"""
+
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from rostral.registry import get_registry
+from rostral.runner import PipelineRunner
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("ROSTRAL_JOB_WORKERS", 2))
+JOB_HISTORY = int(os.getenv("ROSTRAL_JOB_HISTORY", 100))  # сколько завершённых задач помнить
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class Job:
+    """Один запуск шаблона: статус, прогресс по стадиям, итог или ошибка"""
+
+    def __init__(self, template: str, key: str):
+        self.id = uuid.uuid4().hex
+        self.template = template
+        self.key = key
+        self.status = QUEUED
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.stages: List[dict] = []
+        self.stage_total = 0
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+    def on_stage(self, name: str, status: str, index: int, total: int, items: Optional[int]) -> None:
+        """Callback для PipelineRunner.run: фиксирует начало и конец каждой стадии"""
+        with self._lock:
+            self.stage_total = total
+            if status == "running":
+                self.stages.append({"name": name, "status": status, "started_at": datetime.now(), "items": None})
+            elif self.stages:
+                self.stages[-1].update({"status": status, "finished_at": datetime.now(), "items": items})
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            stages = [
+                {
+                    "name": s["name"],
+                    "status": s["status"],
+                    "items": s["items"],
+                    "seconds": round(((s.get("finished_at") or datetime.now()) - s["started_at"]).total_seconds(), 2),
+                }
+                for s in self.stages
+            ]
+        finished = sum(s["status"] == "done" for s in stages)
+        return {
+            "id": self.id,
+            "template": self.template,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(timespec="seconds"),
+            "started_at": self.started_at.isoformat(timespec="seconds") if self.started_at else None,
+            "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None,
+            "current_stage": stages[-1]["name"] if stages and self.status == RUNNING else None,
+            "progress": round(finished / self.stage_total, 2) if self.stage_total else (1.0 if self.status == SUCCEEDED else 0.0),
+            "stages": stages,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Очередь фоновых запусков с ограниченным пулом.
+    :param max_workers: одновременно выполняемых конвейеров
+    :param history: сколько задач (включая завершённые) хранить для опроса статуса
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, history: int = JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="rostral-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        self._history = history
+        self._lock = threading.Lock()
+
+    def submit(self, template_path: str) -> Job:
+        """Ставит шаблон в очередь; если он уже в работе — возвращает существующую задачу"""
+        key = str(Path(template_path).resolve())
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None and job.active:
+                logger.info(f"🔁 Template {template_path} is already running as job {job.id}")
+                return job
+            job = Job(template_path, key)
+            self._active[key] = job
+            self._jobs[job.id] = job
+            self._trim()
+        logger.info(f"📥 Job {job.id} queued: {template_path}")
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _trim(self) -> None:
+        # Старые завершённые задачи вытесняются; активные храним всегда
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self._history:
+                break
+            if not self._jobs[job_id].active:
+                del self._jobs[job_id]
+
+    def _run(self, job: Job) -> None:
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        try:
+            compiled = get_registry().get(job.template)  # из кэша реестра, перечитывается при изменении файла
+            context = PipelineRunner(compiled).run(on_stage=job.on_stage)
+            job.result = summarize(context)
+            job.status = SUCCEEDED
+            logger.info(f"✅ Job {job.id} finished: {job.template}")
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+            logger.exception(f"❌ Job {job.id} failed: {e}")
+        finally:
+            job.finished_at = datetime.now()
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+            job.done.set()
+
+
+def summarize(context: dict) -> dict:
+    """Краткий итог запуска для ответа API (контекст целиком содержит PDF и тексты)"""
+    events = context.get("events") if isinstance(context, dict) else None
+    alerts = context.get("alert") if isinstance(context, dict) else None
+    return {
+        "events": len(events) if isinstance(events, list) else 0,
+        "alerts": sorted(alerts) if isinstance(alerts, dict) else [],
+    }
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Общий для процесса JobManager (создаётся при первом обращении)"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
@@ -0,0 +1,152 @@
+# rostral/log.py
+
+"""
+Централизованная настройка логирования Rostral.
+
+Стадии пишут в собственные логгеры (`logging.getLogger(__name__)`),
+а записи уходят в очередь: форматирование и запись в файл/консоль
+выполняет фоновый поток QueueListener, так что конвейер не ждёт I/O.
+Файл пишется пачками с ротацией по размеру.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from typing import Optional
+
+LOG_LEVEL = os.getenv("ROSTRAL_LOG_LEVEL", "INFO")
+LOG_FILE = os.getenv("ROSTRAL_LOG_FILE", "rostral.log")
+LOG_FORMAT = os.getenv("ROSTRAL_LOG_FORMAT", "text")  # text | json
+LOG_MAX_BYTES = int(os.getenv("ROSTRAL_LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("ROSTRAL_LOG_BACKUP_COUNT", 5))
+LOG_FLUSH_INTERVAL = float(os.getenv("ROSTRAL_LOG_FLUSH_INTERVAL", 1.0))
+
+# Отладочные выгрузки (файлы промптов, трассировка regex) выключены по умолчанию
+DEBUG_PAYLOADS = os.getenv("ROSTRAL_DEBUG_PAYLOADS", "").lower() in ("1", "true", "yes", "on")
+
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+# Стандартные атрибуты LogRecord — всё остальное считается структурными полями из extra=
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись как одну JSON-строку, включая поля из extra="""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class BufferedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler, который не сбрасывает буфер после каждой записи.
+    Сброс происходит по интервалу, на WARNING и выше, и при закрытии.
+    Размер файла считается самостоятельно: tell()/seek() сбросили бы буфер.
+    """
+
+    def __init__(self, filename, flush_interval: float = LOG_FLUSH_INTERVAL, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._size = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            msg = self.format(record) + self.terminator
+            size = len(msg.encode(self.encoding or "utf-8", errors="replace"))  # кириллица и эмодзи — 2–4 байта
+            if self.maxBytes and self._size + size >= self.maxBytes:
+                self.doRollover()
+                self._size = 0
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self._size += size
+            if record.levelno >= logging.WARNING or time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        super().flush()
+        self._last_flush = time.monotonic()
+
+
+class _BatchingQueueListener(logging.handlers.QueueListener):
+    """QueueListener, который сбрасывает буферы обработчиков в периоды простоя"""
+
+    def __init__(self, log_queue, *handlers, flush_interval: float = LOG_FLUSH_INTERVAL):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, timeout=self.flush_interval)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush()
+
+
+def setup_logging(level: Optional[str] = None, log_file: Optional[str] = LOG_FILE, fmt: Optional[str] = None) -> None:
+    """
+    Настраивает корневой логгер: QueueHandler → фоновый поток → консоль и файл.
+    Повторный вызов перенастраивает обработчики (например, при смене уровня).
+    """
+    global _listener
+
+    shutdown_logging()
+    level = (level or LOG_LEVEL).upper()
+    fmt = fmt or LOG_FORMAT
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter("%(message)s"))
+    handlers = [console]
+
+    if log_file:
+        file_handler = BufferedRotatingFileHandler(
+            log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+        file_handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = _BatchingQueueListener(log_queue, *handlers)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Останавливает фоновый поток и сбрасывает все буферы на диск"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,244 @@
+# rostral/maintenance.py
+
+"""
+Обслуживание базы: хранение событий, чистка кэша, VACUUM/ANALYZE.
+
+  - события старше retention.keep_days шаблона (или сверх retention.keep_events)
+    переносятся в холодный архив archive/<template>/events-<время>.jsonl.gz
+    (или .parquet при ROSTRAL_ARCHIVE_FORMAT=parquet и установленном pyarrow),
+    а в archived_events остаются только ключи дедупликации;
+  - из transform_cache удаляются записи, просроченные по TTL трансформации
+    или не обновлявшиеся дольше ROSTRAL_CACHE_MAX_AGE_DAYS;
+  - SQLite переводится в auto_vacuum=INCREMENTAL (один раз полный VACUUM),
+    дальше освобождённые страницы возвращаются порциями, статистика
+    обновляется PRAGMA optimize; на PostgreSQL выполняется ANALYZE.
+
+Шаблоны без секции retention обслуживаются по ROSTRAL_RETENTION_DAYS
+(не задано — события не удаляются). Запуск: `python -m rostral maintain`.
+"""
+
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import or_, select, text
+
+from rostral.db import get_engine
+from rostral.export import COLUMNS, TEXT_COLUMNS, _unpack_texts, _value, build_query
+from rostral.models import (
+    ArchivedEvent, Event, EventFingerprint, EventFingerprintBand, EventText, RetentionConfig,
+)
+from rostral.registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv("ROSTRAL_ARCHIVE_DIR", "archive")
+ARCHIVE_FORMAT = os.getenv("ROSTRAL_ARCHIVE_FORMAT", "jsonl").lower()
+RETENTION_DAYS = os.getenv("ROSTRAL_RETENTION_DAYS")
+VACUUM_PAGES = int(os.getenv("ROSTRAL_VACUUM_PAGES", 5000))  # страниц за один проход incremental_vacuum
+BATCH_SIZE = 500
+
+
+def default_policy() -> Optional[RetentionConfig]:
+    """Политика для шаблонов без секции retention (из ROSTRAL_RETENTION_DAYS)"""
+    if not RETENTION_DAYS:
+        return None
+    return RetentionConfig(keep_days=int(RETENTION_DAYS))
+
+
+def load_policies(folder: Path = Path("templates")) -> Dict[str, RetentionConfig]:
+    """{template_name: RetentionConfig} по всем шаблонам папки с секцией retention"""
+    return {
+        template.name: template.config.retention
+        for template in get_registry(folder).templates() if template.config.retention
+    }
+
+
+def expired_ids(conn, template: Optional[str], policy: RetentionConfig, now: datetime) -> List[int]:
+    """id событий шаблона, вышедших за политику хранения (по возрасту или по количеству)"""
+    of_template = Event.template_name.is_(None) if template is None else Event.template_name == template
+    conditions = []
+    if policy.keep_days:
+        conditions.append(Event.timestamp < now - timedelta(days=policy.keep_days))
+    if policy.keep_events:
+        # Самое новое из вытесняемых: всё, что не новее него, уходит в архив
+        boundary = conn.execute(
+            select(Event.id).where(of_template).order_by(Event.id.desc()).offset(policy.keep_events).limit(1)
+        ).scalar()
+        if boundary is not None:
+            conditions.append(Event.id <= boundary)
+    if not conditions:
+        return []
+    return list(conn.execute(select(Event.id).where(of_template, or_(*conditions)).order_by(Event.id)).scalars())
+
+
+class _JsonlArchive:
+    suffix = ".jsonl.gz"
+
+    def __init__(self, path: Path):
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+
+    def write(self, rows: List[dict]) -> None:
+        for row in rows:
+            self._file.write(json.dumps({k: _value(v) for k, v in row.items()}, ensure_ascii=False) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ParquetArchive:
+    suffix = ".parquet"
+
+    def __init__(self, path: Path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        # Схема фиксирована: пачка из одних NULL не должна менять типы колонок
+        schema = pa.schema([(c, pa.int64() if c == "id" else pa.string()) for c in COLUMNS + TEXT_COLUMNS])
+        self._writer = pq.ParquetWriter(str(path), schema, compression="zstd")
+
+    def write(self, rows: List[dict]) -> None:
+        rows = [{k: _value(v) for k, v in row.items()} for row in rows]
+        self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self._writer.schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def _archive_class():
+    if ARCHIVE_FORMAT == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+            return _ParquetArchive
+        except ImportError:
+            logger.warning("⚠️ ROSTRAL_ARCHIVE_FORMAT=parquet, but pyarrow is not installed — using JSONL")
+    return _JsonlArchive
+
+
+def write_archive(conn, ids: List[int], template: Optional[str], archive_dir: Path, now: datetime) -> Path:
+    """Выгружает события с текстами в архивный файл; файл закрыт до удаления из БД"""
+    archive_class = _archive_class()
+    folder = archive_dir / (template or "_untemplated")
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / f"events-{now:%Y%m%dT%H%M%S}{archive_class.suffix}"
+    archive = archive_class(path)
+    try:
+        for i in range(0, len(ids), BATCH_SIZE):
+            query = build_query(with_text=True).where(Event.id.in_(ids[i:i + BATCH_SIZE]))
+            archive.write([_unpack_texts(dict(row._mapping)) for row in conn.execute(query)])
+    except Exception:
+        archive.close()
+        path.unlink(missing_ok=True)
+        raise
+    archive.close()
+    return path
+
+
+def delete_events(ids: List[int]) -> None:
+    """Удаляет события вместе с текстами и отпечатками, оставляя ключи в archived_events"""
+    engine = get_engine()
+    for i in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[i:i + BATCH_SIZE]
+        with engine.begin() as conn:
+            rows = conn.execute(select(Event.event_id, Event.url, Event.template_name).where(Event.id.in_(chunk))).all()
+            event_ids = [r.event_id for r in rows]
+            conn.execute(ArchivedEvent.__table__.insert(), [
+                {"event_id": r.event_id, "url": r.url, "template_name": r.template_name}
+                for r in rows if r.event_id
+            ])
+            for model in (EventText, EventFingerprint, EventFingerprintBand):
+                conn.execute(model.__table__.delete().where(model.event_id.in_(event_ids)))
+            conn.execute(Event.__table__.delete().where(Event.id.in_(chunk)))
+
+
+def optimize_database(full: bool = False) -> dict:
+    """
+    SQLite: перевод в auto_vacuum=INCREMENTAL (полный VACUUM один раз или по full),
+    затем incremental_vacuum порциями по VACUUM_PAGES и PRAGMA optimize.
+    PostgreSQL: ANALYZE (место возвращает autovacuum).
+    """
+    engine = get_engine()
+    report = {}
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if engine.url.get_backend_name() != "sqlite":
+            conn.execute(text("ANALYZE"))
+            report["analyzed"] = True
+            return report
+
+        page_size = conn.execute(text("PRAGMA page_size")).scalar()
+        free_pages = conn.execute(text("PRAGMA freelist_count")).scalar()
+        if full or conn.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+            logger.info("🧹 Full VACUUM (switching to auto_vacuum=INCREMENTAL)")
+            conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+            conn.execute(text("VACUUM"))
+            report["vacuum"] = "full"
+            report["freed_bytes"] = free_pages * page_size
+        elif free_pages:
+            # Страница освобождается на каждом шаге оператора, а sqlite3.execute делает
+            # только один шаг; executescript выполняет прагму до конца
+            conn.connection.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+            report["vacuum"] = "incremental"
+            report["freed_bytes"] = (free_pages - conn.execute(text("PRAGMA freelist_count")).scalar()) * page_size
+
+        has_stats = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")).first()
+        conn.execute(text("PRAGMA optimize" if has_stats else "ANALYZE"))
+        report["analyzed"] = True
+    return report
+
+
+def _db_file() -> Optional[str]:
+    engine = get_engine()
+    if engine.url.get_backend_name() == "sqlite" and engine.url.database and os.path.exists(engine.url.database):
+        return engine.url.database
+    return None
+
+
+def run_maintenance(templates_dir: Path = Path("templates"), archive_dir: Optional[Path] = None,
+                    dry_run: bool = False, full_vacuum: bool = False, now: Optional[datetime] = None) -> dict:
+    """
+    Один проход обслуживания. Возвращает отчёт:
+    {"templates": {name: {"expired", "archived", "file"}}, "cache_evicted": {...}, "database": {...}, ...}
+    """
+    from rostral.cache import evict_stale
+    import rostral.stages.transforms  # noqa: F401 — регистрирует TTL трансформаций
+
+    started = time.perf_counter()
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)  # события хранятся в UTC без зоны
+    archive_dir = Path(archive_dir or ARCHIVE_DIR)
+    policies = load_policies(templates_dir)
+    fallback = default_policy()
+    engine = get_engine()
+    db_file = _db_file()
+    report = {"templates": {}, "dry_run": dry_run, "db_bytes_before": os.path.getsize(db_file) if db_file else None}
+
+    with engine.connect() as conn:
+        templates = list(conn.execute(select(Event.template_name).distinct()).scalars())
+    for template in templates:
+        policy = policies.get(template, fallback)
+        if policy is None:
+            continue
+        with engine.connect() as conn:
+            ids = expired_ids(conn, template, policy, now)
+            entry = {"expired": len(ids), "archived": 0, "file": None}
+            report["templates"][template or "_untemplated"] = entry
+            if not ids or dry_run:
+                continue
+            if policy.archive:
+                entry["file"] = str(write_archive(conn, ids, template, archive_dir, now))
+                entry["archived"] = len(ids)
+        delete_events(ids)
+        logger.info(f"📦 {template}: {len(ids)} events moved out of the database"
+                    + (f" → {entry['file']}" if entry["file"] else ""))
+
+    report["cache_evicted"] = evict_stale(dry_run=dry_run)
+    if not dry_run:
+        report["database"] = optimize_database(full=full_vacuum)
+    report["db_bytes_after"] = os.path.getsize(db_file) if db_file else None
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
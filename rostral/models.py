@@ -1,35 +1,89 @@
-from pydantic import BaseModel, HttpUrl
-from typing import Any, Dict, List, Optional, Union
+from pydantic import BaseModel, Field, HttpUrl
+from typing import Any, Dict, List, Literal, Optional, Union
 import yaml
 from pathlib import Path
-from sqlalchemy import Column, String, Float, Integer, Text, DateTime
+from sqlalchemy import BigInteger, Column, ForeignKey, Index, String, Float, Integer, LargeBinary, Text, DateTime, text as sql_text
+from sqlalchemy.orm import attribute_keyed_dict, deferred, relationship
 from datetime import datetime, timezone
 from sqlalchemy.ext.declarative import declarative_base
+from rostral.compression import compress, decompress
+
+class HostPolicyConfig(BaseModel):
+    """Per-host overrides for the download scheduler"""
+    min_interval: Optional[float] = None
+    max_concurrency: Optional[int] = None
+
 
 class DownloadConfig(BaseModel):
     """
     Configuration for DownloadStage:
       - extensions: list of file suffixes to download (e.g. ['.pdf', '.docx'])
       - timeout: HTTP request timeout in seconds
+      - workers: parallel downloads (across all hosts)
+      - min_interval: minimum seconds between requests to the same host
+      - max_per_host: concurrent requests to the same host
+      - respect_robots: raise min_interval to robots.txt Crawl-delay
+      - hosts: per-host overrides, e.g. {"disk.yandex.ru": {"min_interval": 1}}
     """
     extensions: List[str] = [".pdf", ".docx"]
     timeout: int = 20
     allow_html: bool = False
     allow_json: bool = False 
+    workers: int = 4
+    min_interval: float = 0.5
+    max_per_host: int = 2
+    respect_robots: bool = True
+    hosts: Dict[str, HostPolicyConfig] = {}
 
 class FetchConfig(BaseModel):
+    """
+    HTTP settings for the source request:
+      - stream: for json sources, read the selected array incrementally
+        (requires ijson) instead of loading the whole response
+    """
     headers: Dict[str, str] = {}
     retry_policy: Dict[str, Any]
     timeout: int = 10
     verify_ssl: bool = True
     selector: Optional[str] = None
+    stream: bool = False
+
+class PaginationConfig(BaseModel):
+    """
+    Declarative pagination for html/json sources:
+      - style: page | offset | cursor | next_link
+      - param: query parameter carrying the page number, offset or cursor
+      - start: first page number (or offset)
+      - page_size: items per page; offset step, sent as size_param if given
+      - next: cursor / next link — JMESPath for json, CSS selector (href) for html
+      - max_pages: hard limit of pages per run
+      - concurrency: parallel requests for page/offset styles
+      - stop_when_known: stop once a page contains only already-known items
+    """
+    style: Literal["page", "offset", "cursor", "next_link"] = "page"
+    param: str = "page"
+    start: int = 1
+    page_size: Optional[int] = None
+    size_param: Optional[str] = None
+    next: Optional[str] = None
+    max_pages: int = 5
+    concurrency: int = 4
+    stop_when_known: bool = True
+
 
 class SourceConfig(BaseModel):
+    """
+    Source of a template:
+      - endpoints: additional URLs (Jinja templates, like url) fetched
+        as extra pages after the main one
+      - pagination: how to walk through pages of the main url
+    """
     type: str
     url: str
     endpoints: Optional[Dict[str, str]] = None
     frequency: str
     fetch: FetchConfig
+    pagination: Optional[PaginationConfig] = None
 
 
 class ExtractFieldConfig(BaseModel):
@@ -39,10 +93,18 @@ class ExtractFieldConfig(BaseModel):
 
 
 class ExtractItemConfig(BaseModel):
+    """
+    Extraction block:
+      - limit: maximum number of matched elements to read
+      - stop_after_known: incremental mode — already-known items are dropped
+        during extraction, and reading (and paginating) stops after N
+        consecutive known items (sources are expected to be newest-first)
+    """
     selector: str
     type: str
     fields: Dict[str, Union[ExtractFieldConfig, str]]
     limit: Optional[int] = None
+    stop_after_known: Optional[int] = None
 
 class FilterRule(BaseModel):
     unique: Optional[str] = None
@@ -60,7 +122,18 @@ class NormalizeConfig(BaseModel):
 
 
 class ProcessingConfig(BaseModel):  
+    """
+    Document processing:
+      - extract_regex: patterns for the excerpt sent to GPT
+      - near_duplicates: what to do with a document whose text is nearly
+        identical to an already known one — link (keep, reuse the original's
+        GPT answer), skip (drop the record) or off
+      - near_duplicate_threshold: minimal estimated Jaccard similarity
+        of the texts (word 3-shingles) to treat documents as duplicates
+    """
     extract_regex: List[str] = []
+    near_duplicates: Literal["link", "skip", "off"] = "link"
+    near_duplicate_threshold: float = Field(0.75, gt=0, le=1)
 
 
 class GPTConfig(BaseModel):
@@ -77,6 +150,33 @@ class TestEvent(BaseModel):
     note: Optional[str] = None
 
 
+class RetentionConfig(BaseModel):
+    """
+    Retention of saved events (rostral maintain):
+      - keep_days: archive events older than this many days
+      - keep_events: keep at most this many newest events of the template
+      - archive: write removed events to the cold archive (false — just delete)
+    """
+    keep_days: Optional[int] = Field(None, gt=0)
+    keep_events: Optional[int] = Field(None, gt=0)
+    archive: bool = True
+
+
+class TrackConfig(BaseModel):
+    """
+    Value tracking (prices, availability) between runs:
+      - field: extract block whose records are tracked
+      - key: record field identifying the tracked item (usually its url)
+      - values: tracked fields and their types (text | number | date | bool);
+        a record goes on to alerting only when one of them has changed
+      - notify_new: also pass through records seen for the first time
+    """
+    field: str = "events"
+    key: str = "url"
+    values: Dict[str, Literal["text", "number", "date", "bool"]]
+    notify_new: bool = True
+
+
 class Config(BaseModel):
     version: int
     meta: Dict[str, Any]
@@ -90,6 +190,8 @@ class Config(BaseModel):
     processing: Optional[ProcessingConfig] = None
     gpt: Optional[GPTConfig] = None     
     alert: Optional[AlertConfig] = None
+    retention: Optional[RetentionConfig] = None
+    track: Optional[TrackConfig] = None
 
     test_event: Optional[TestEvent] = None
     secrets: Optional[Dict[str, Any]] = None
@@ -118,16 +220,165 @@ class TransformCache(Base):
 
 timestamp = datetime.now(timezone.utc)
 class Event(Base):
+    """
+    Сохранённое событие. Полный текст и выдержка лежат сжатыми в event_texts
+    и читаются только при обращении к event.text / event.excerpt
+    (для списков — selectinload(Event.texts) одним запросом).
+    """
     __tablename__ = 'events'
     
     id = Column(Integer, primary_key=True)
     event_id = Column(String, unique=True)
     url = Column(String, unique=True)
     title = Column(String(500))
-    text = Column(Text)
-    excerpt = Column(Text)
+    # Старое несжатое хранение: только чтение до миграции (rostral migrate-texts)
+    legacy_text = deferred(Column("text", Text))
+    legacy_excerpt = deferred(Column("excerpt", Text))
     gpt_text = Column(Text, nullable=True)
     error = Column(Text, nullable=True)
     status = Column(String(50), default='pending')
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    template_name = Column(String)
\ No newline at end of file
+    template_name = Column(String)
+
+    texts = relationship(
+        "EventText",
+        collection_class=attribute_keyed_dict("field"),
+        cascade="all, delete-orphan",
+        lazy="select",
+    )
+
+    def _get_text(self, field: str) -> Optional[str]:
+        stored = self.texts.get(field)
+        if stored is None:
+            return getattr(self, f"legacy_{field}")
+        if stored.codec == "ref":
+            return self._get_text(stored.data.decode())
+        return decompress(stored.codec, stored.data)
+
+    def _store_text(self, field: str, value: str) -> None:
+        codec, data = compress(value)
+        self.texts[field] = EventText(field=field, codec=codec, size=len(value.encode("utf-8")), data=data)
+
+    def _set_text(self, field: str, value: Optional[str]) -> None:
+        if field == "text":
+            # Выдержка-ссылка указывает на текущий текст: перед его заменой она получает свою копию
+            excerpt = self.texts.get("excerpt")
+            if excerpt is not None and excerpt.codec == "ref":
+                current = self._get_text("text")
+                if current and current != value:
+                    self._store_text("excerpt", current)
+        if not value:
+            self.texts.pop(field, None)
+            return
+        # Выдержка короткого документа часто совпадает с текстом: храним ссылку, а не копию
+        if field == "excerpt" and value == self.text:
+            self.texts[field] = EventText(field=field, codec="ref", size=len(value.encode("utf-8")), data=b"text")
+            return
+        self._store_text(field, value)
+
+    @property
+    def text(self) -> Optional[str]:
+        return self._get_text("text")
+
+    @text.setter
+    def text(self, value: Optional[str]) -> None:
+        self._set_text("text", value)
+
+    @property
+    def excerpt(self) -> Optional[str]:
+        return self._get_text("excerpt")
+
+    @excerpt.setter
+    def excerpt(self, value: Optional[str]) -> None:
+        self._set_text("excerpt", value)
+
+
+class EventText(Base):
+    """Большое текстовое поле события (text, excerpt) в сжатом виде"""
+    __tablename__ = 'event_texts'
+
+    event_id = Column(String, ForeignKey("events.event_id", ondelete="CASCADE"), primary_key=True)
+    field = Column(String(20), primary_key=True)
+    codec = Column(String(10), nullable=False)  # raw | zlib | zstd | ref (ссылка на другое поле)
+    size = Column(Integer)  # исходный размер в байтах UTF-8
+    data = Column(LargeBinary, nullable=False)
+
+
+class QueuedRun(Base):
+    """
+    Запуск шаблона в общей очереди (rostral schedule / rostral worker).
+    Воркер, забравший запуск, держит аренду (lease) и продлевает её heartbeat'ом;
+    запуск с истёкшей арендой возвращается в очередь. Уникальный частичный индекс
+    не даёт поставить шаблон второй раз, пока он в очереди или выполняется.
+    """
+    __tablename__ = 'run_queue'
+
+    id = Column(Integer, primary_key=True)
+    template_name = Column(String, nullable=False)
+    template_path = Column(String, nullable=False)
+    status = Column(String(20), nullable=False, default='queued')  # queued | running | succeeded | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, nullable=False)  # не раньше этого времени (отсрочка после ошибки)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    enqueued_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    result = Column(Text, nullable=True)  # JSON-итог запуска
+    error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_run_queue_claim", "status", "available_at"),
+        Index(
+            "uq_run_queue_active_template", "template_name", unique=True,
+            sqlite_where=sql_text("status IN ('queued', 'running')"),
+            postgresql_where=sql_text("status IN ('queued', 'running')"),
+        ),
+    )
+
+
+class ArchivedEvent(Base):
+    """
+    След события, перенесённого в холодный архив: только ключи дедупликации,
+    чтобы архивированный документ не считался новым при следующем обходе.
+    """
+    __tablename__ = 'archived_events'
+
+    event_id = Column(String, primary_key=True)
+    url = Column(String, index=True)
+    template_name = Column(String)
+    archived_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class Snapshot(Base):
+    """
+    Последние значения отслеживаемой записи (track: в шаблоне). digest —
+    16-байтный хэш типизированных значений: неизменившаяся запись стоит
+    одного сравнения хэша, сами значения читаются только для изменившихся.
+    """
+    __tablename__ = 'snapshots'
+
+    template_name = Column(String, primary_key=True)
+    record_key = Column(String, primary_key=True)
+    digest = Column(LargeBinary(16), nullable=False)
+    values = Column(Text, nullable=False)  # JSON {поле: значение}
+    updated_at = Column(Float)
+
+
+class EventFingerprint(Base):
+    """MinHash-подпись текста события для поиска почти-дубликатов"""
+    __tablename__ = 'event_fingerprints'
+
+    event_id = Column(String, primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+    duplicate_of = Column(String, nullable=True, index=True)
+    template_name = Column(String)
+
+
+class EventFingerprintBand(Base):
+    """LSH-полосы подписи: документы с общим ключом полосы — кандидаты в дубликаты"""
+    __tablename__ = 'event_fingerprint_bands'
+
+    band_key = Column(BigInteger, primary_key=True)
+    event_id = Column(String, primary_key=True)
@@ -0,0 +1,145 @@
+# rostral/neardup.py
+
+"""
+Поиск почти-дубликатов документов.
+
+Госсайты перевыкладывают один и тот же документ с новым заголовком,
+исправленной опечаткой или другим сканом — md5(url+title) считает его
+новым. Здесь по тексту строится MinHash-подпись (64 хэш-функции по
+словным 3-шинглам), а кандидаты ищутся через LSH: подпись режется на
+16 полос по 4 значения, ключ каждой полосы хранится в индексированной
+таблице. Поиск — один запрос `band_key IN (...)` по индексу и оценка
+сходства Жаккара по подписям горстки кандидатов.
+"""
+
+import hashlib
+import logging
+import random
+import re
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from rostral.db import get_engine
+from rostral.models import EventFingerprint, EventFingerprintBand
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+MIN_TOKENS = 20  # на коротких текстах подпись ненадёжна
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Коэффициенты хэш-функций фиксированы: подписи должны совпадать между запусками
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shingles(text: str) -> set:
+    tokens = _TOKEN.findall((text or "").lower())
+    if len(tokens) < MIN_TOKENS:
+        return set()
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> Optional[List[int]]:
+    """MinHash-подпись текста (NUM_PERM 32-битных значений) или None для короткого текста"""
+    features = [_feature_hash(s) for s in shingles(text)]
+    if not features:
+        return None
+    return [min((a * x + b) % _PRIME for x in features) & _MAX_HASH for a, b in _PERMUTATIONS]
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """Оценка сходства Жаккара по двум подписям"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def band_keys(signature: List[int]) -> List[int]:
+    """Ключи LSH-полос: номер полосы + её значения → 63-битное целое"""
+    keys = []
+    for i in range(BANDS):
+        chunk = signature[i * ROWS:(i + 1) * ROWS]
+        digest = hashlib.blake2b(repr((i, chunk)).encode(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big") >> 1)  # помещается в BIGINT со знаком
+    return keys
+
+
+def pack(signature: List[int]) -> bytes:
+    """Подпись в BLOB: little-endian uint32, одинаково на всех машинах с общей БД"""
+    return struct.pack(f"<{len(signature)}I", *signature)
+
+
+def unpack(blob: bytes) -> List[int]:
+    return list(struct.unpack(f"<{len(blob) // 4}I", blob))
+
+
+class NearDuplicateIndex:
+    """
+    Индекс почти-дубликатов: сохранённые подписи (БД) плюс добавленные
+    в текущем запуске, ещё не сохранённые вместе с событиями.
+    """
+
+    def __init__(self, threshold: float = 0.75):
+        self.threshold = threshold
+        self._pending: Dict[int, List[Tuple[List[int], str]]] = {}
+
+    def find(self, signature: List[int]) -> Optional[str]:
+        """event_id самого похожего известного документа со сходством ≥ threshold"""
+        keys = band_keys(signature)
+        best = None
+        for other, event_id in self._pending_candidates(keys) + self._stored_candidates(keys):
+            score = similarity(signature, other)
+            if score >= self.threshold and (best is None or score > best[0]):
+                best = (score, event_id)
+        return best[1] if best else None
+
+    def add(self, signature: List[int], event_id: str) -> None:
+        for key in band_keys(signature):
+            self._pending.setdefault(key, []).append((signature, event_id))
+
+    def _pending_candidates(self, keys: Iterable[int]) -> List[Tuple[List[int], str]]:
+        found = {}
+        for key in keys:
+            for signature, event_id in self._pending.get(key, []):
+                found[event_id] = (signature, event_id)
+        return list(found.values())
+
+    def _stored_candidates(self, keys: List[int]) -> List[Tuple[List[int], str]]:
+        # Core-запрос без ORM-сессии: на горячем пути она стоит дороже самого поиска
+        query = (
+            select(EventFingerprint.signature, EventFingerprint.event_id, EventFingerprint.duplicate_of)
+            .join(EventFingerprintBand, EventFingerprintBand.event_id == EventFingerprint.event_id)
+            .where(EventFingerprintBand.band_key.in_(keys))
+            .distinct()
+        )
+        with get_engine().connect() as conn:
+            rows = conn.execute(query).all()
+        # Дубликат указывает на оригинал: связываем всегда с первоисточником
+        return [(unpack(signature), original or event_id) for signature, event_id, original in rows]
+
+def fingerprint_rows(record: dict) -> list:
+    """Строки event_fingerprints и полос для сохраняемой записи (если подпись посчитана)"""
+    signature = record.get("minhash")
+    if not signature or not record.get("event_id"):
+        return []
+    event_id = record["event_id"]
+    return [
+        EventFingerprint(
+            event_id=event_id,
+            signature=pack(signature),
+            duplicate_of=record.get("duplicate_of"),
+            template_name=record.get("template_name"),
+        ),
+        *(EventFingerprintBand(band_key=key, event_id=event_id) for key in set(band_keys(signature))),
+    ]
@@ -0,0 +1,138 @@
+# rostral/politeness.py
+
+"""
+Вежливое обращение к сайтам: планировщик запросов по хостам.
+
+У каждого хоста своя очередь: не больше max_concurrency одновременных
+запросов и не чаще одного запуска в min_interval секунд. Интервал
+увеличивается до Crawl-delay из robots.txt, а ответ с Retry-After
+откладывает следующий запрос к этому хосту. Запросы к разным хостам
+друг друга не ждут.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+from rostral import http_client
+
+logger = logging.getLogger(__name__)
+
+
+def host_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах: число секунд или HTTP-дата"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+class _HostState:
+    def __init__(self, min_interval: float, max_concurrency: int):
+        self.min_interval = min_interval
+        self.slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+
+class HostScheduler:
+    """
+    Планировщик запросов по хостам.
+    :param min_interval: минимальный интервал между запусками запросов к одному хосту
+    :param max_concurrency: одновременных запросов к одному хосту
+    :param hosts: переопределения по хостам {host: {"min_interval": .., "max_concurrency": ..}}
+    :param respect_robots: учитывать Crawl-delay из robots.txt
+    """
+
+    def __init__(self, min_interval: float = 0.5, max_concurrency: int = 2, hosts: Optional[Dict[str, dict]] = None,
+                 respect_robots: bool = True, user_agent: str = "*", verify_ssl: bool = True, headers: Optional[dict] = None):
+        self.min_interval = min_interval
+        self.max_concurrency = max_concurrency
+        self.hosts = {host.lower(): settings for host, settings in (hosts or {}).items()}
+        self.respect_robots = respect_robots
+        self.user_agent = user_agent
+        self.verify_ssl = verify_ssl
+        self.headers = headers or {}
+        self._states: Dict[str, _HostState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, url: str) -> _HostState:
+        host = host_of(url)
+        with self._lock:
+            state = self._states.get(host)
+            if state is not None:
+                return state
+
+        # robots.txt читаем вне общей блокировки: другие хосты не должны его ждать
+        settings = self.hosts.get(host, {})
+        interval = settings.get("min_interval")
+        interval = self.min_interval if interval is None else interval
+        crawl_delay = self._crawl_delay(url) if self.respect_robots else None
+        if crawl_delay and crawl_delay > interval:
+            logger.info(f"🤖 {host}: Crawl-delay {crawl_delay}s from robots.txt")
+            interval = crawl_delay
+        concurrency = settings.get("max_concurrency") or self.max_concurrency
+
+        with self._lock:
+            return self._states.setdefault(host, _HostState(interval, concurrency))
+
+    def _crawl_delay(self, url: str) -> Optional[float]:
+        parsed = urlparse(url)
+        robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+        try:
+            response = http_client.get(robots_url, timeout=5, verify=self.verify_ssl, headers=self.headers)
+            if not response.ok:
+                return None
+            parser = RobotFileParser()
+            parser.parse(response.text.splitlines())
+            delay = parser.crawl_delay(self.user_agent)
+            return float(delay) if delay is not None else None
+        except Exception as e:
+            logger.debug(f"robots.txt is not available for {parsed.netloc}: {e}")
+            return None
+
+    @contextmanager
+    def slot(self, url: str):
+        """Ждёт очереди хоста и держит слот на время запроса"""
+        if http_client.replaying():  # ответы из кассеты: сайту паузы не нужны
+            yield
+            return
+        state = self._state(url)
+        state.slots.acquire()
+        try:
+            with state.lock:
+                now = time.monotonic()
+                start = max(now, state.next_at)
+                state.next_at = start + state.min_interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+        finally:
+            state.slots.release()
+
+    def defer(self, url: str, seconds: float) -> None:
+        """Откладывает следующие запросы к хосту (Retry-After, backoff после ошибки)"""
+        if http_client.replaying():
+            return
+        state = self._state(url)
+        with state.lock:
+            state.next_at = max(state.next_at, time.monotonic() + seconds)
+        logger.debug(f"⏸ {host_of(url)}: next request in {seconds:.1f}s")
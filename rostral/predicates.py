@@ -0,0 +1,334 @@
+"""
+Маленький язык условий для фильтров normalize.
+
+Выражение пишется в синтаксисе Python, но разбирается через ast и
+компилируется один раз в цепочку замыканий — eval не используется,
+доступны только поля записи, литералы и функции из FUNCTIONS:
+
+    price < 1000 and status in ["new", "updated"]
+    date(published) >= days_ago(7)
+    matches(title, "заключени[ея]") or not text
+
+Имена — поля записи (item.get), a.b — вложенное поле словаря. При
+сравнении строки с числом или датой строка приводится к типу другой
+стороны ("1 990 ₽" < 2000, "01.05.2024" >= days_ago(30)).
+"""
+
+import ast
+import logging
+import operator
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Флаги, с которыми регулярки применяются в стадиях processing и normalize
+REGEX_FLAGS = re.DOTALL | re.IGNORECASE
+
+# Именованные фильтры (ключ filter: в шаблоне)
+PRESETS = {
+    # запись с извлечённым текстом документа или страницы, без ошибки обработки
+    "documents": "text and not error",
+}
+
+Predicate = Callable[[dict], bool]
+
+
+class PredicateError(ValueError):
+    """Выражение фильтра не разбирается или использует недоступный синтаксис"""
+
+
+def _utc(value: datetime) -> datetime:
+    # Наивные и aware-даты нельзя сравнивать — приводим всё к наивному UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def to_date(value: Any) -> Optional[datetime]:
+    """ISO 8601, RFC 822 (pubDate в RSS) или дд.мм.гггг → datetime; иначе None"""
+    if isinstance(value, datetime):
+        return _utc(value)
+    if not isinstance(value, str) or not value.strip():
+        return None
+    text = value.strip()
+    try:
+        return _utc(datetime.fromisoformat(text.replace("Z", "+00:00")))
+    except ValueError:
+        pass
+    for fmt in ("%d.%m.%Y", "%d.%m.%Y %H:%M", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    try:
+        return _utc(parsedate_to_datetime(text))
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+_NUMBER = re.compile(r"-?\d+(?:[.,]\d+)?")
+
+
+def to_number(value: Any) -> Optional[float]:
+    """Число из строки вида "1 990,50 ₽"; иначе None"""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return value
+    if not isinstance(value, str):
+        return None
+    match = _NUMBER.search(re.sub(r"(?<=\d)\s(?=\d)", "", value))
+    return float(match.group().replace(",", ".")) if match else None
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+FUNCTIONS: Dict[str, Callable] = {
+    "date": to_date,
+    "number": to_number,
+    "now": _now,
+    "days_ago": lambda days: _now() - timedelta(days=days),
+    "hours_ago": lambda hours: _now() - timedelta(hours=hours),
+    "len": lambda value: len(value) if value is not None else 0,
+    "lower": lambda value: str(value).lower() if value is not None else "",
+    "startswith": lambda value, prefix: isinstance(value, str) and value.startswith(prefix),
+    "endswith": lambda value, suffix: isinstance(value, str) and value.endswith(suffix),
+}
+
+
+def _coerce(left: Any, right: Any):
+    """Приводит строку к числу/дате, если другая сторона — число/дата"""
+    for a, b, swap in ((left, right, False), (right, left, True)):
+        if isinstance(a, str) and not isinstance(b, str):
+            if isinstance(b, datetime):
+                a = to_date(a)
+            elif isinstance(b, (int, float)):
+                a = to_number(a)
+            else:
+                continue
+            return (b, a) if swap else (a, b)
+    return left, right
+
+
+def _ordered(op):
+    def compare(left, right):
+        left, right = _coerce(left, right)
+        if left is None or right is None:
+            return False
+        try:
+            return op(left, right)
+        except TypeError:
+            return False
+    return compare
+
+
+def _equal(left, right):
+    left, right = _coerce(left, right)
+    return left == right
+
+
+def _contains(left, right):
+    if right is None:
+        return False
+    if isinstance(right, str):
+        return isinstance(left, str) and left.lower() in right.lower()
+    return left in right
+
+
+_COMPARE = {
+    ast.Eq: _equal,
+    ast.NotEq: lambda a, b: not _equal(a, b),
+    ast.Lt: _ordered(operator.lt),
+    ast.LtE: _ordered(operator.le),
+    ast.Gt: _ordered(operator.gt),
+    ast.GtE: _ordered(operator.ge),
+    ast.In: _contains,
+    ast.NotIn: lambda a, b: not _contains(a, b),
+}
+
+
+def _literal(node: ast.AST):
+    """Значение литерала (в т.ч. списка литералов) или KeyError, если это не литерал"""
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        raise KeyError
+
+
+def _field(name: str):
+    return lambda item: item.get(name)
+
+
+def _compile(node: ast.AST) -> Callable[[dict], Any]:
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda item: value
+
+    if isinstance(node, ast.Name):
+        return _field(node.id)
+
+    if isinstance(node, ast.Attribute):
+        parent = _compile(node.value)
+        attr = node.attr
+        return lambda item: (lambda v: v.get(attr) if isinstance(v, dict) else None)(parent(item))
+
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        try:
+            values = _literal(node)
+            # Набор литералов — frozenset, проверка членства за O(1)
+            frozen = frozenset(values)
+            return lambda item: frozen
+        except (KeyError, TypeError):
+            elements = [_compile(e) for e in node.elts]
+            return lambda item: [e(item) for e in elements]
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile(node.operand)
+        if isinstance(node.op, ast.Not):
+            return lambda item: not operand(item)
+        if isinstance(node.op, ast.USub):
+            return lambda item: -operand(item)
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile(v) for v in node.values]
+        if isinstance(node.op, ast.And):
+            return lambda item: all(p(item) for p in parts)
+        return lambda item: any(p(item) for p in parts)
+
+    if isinstance(node, ast.Compare):
+        operands = [_compile(node.left)] + [_compile(c) for c in node.comparators]
+        ops = []
+        for op in node.ops:
+            if type(op) not in _COMPARE:
+                raise PredicateError(f"unsupported operator {type(op).__name__}")
+            ops.append(_COMPARE[type(op)])
+
+        def compare(item):
+            left = operands[0](item)
+            for op, right_fn in zip(ops, operands[1:]):
+                right = right_fn(item)
+                if not op(left, right):
+                    return False
+                left = right
+            return True
+        return compare
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.keywords:
+            raise PredicateError("only calls like name(arg, ...) are allowed")
+        name = node.func.id
+        if name == "matches":
+            return _compile_matches(node)
+        if name not in FUNCTIONS:
+            raise PredicateError(f"unknown function {name!r} (available: matches, {', '.join(sorted(FUNCTIONS))})")
+        fn = FUNCTIONS[name]
+        args = [_compile(a) for a in node.args]
+        return lambda item: fn(*[a(item) for a in args])
+
+    raise PredicateError(f"unsupported syntax: {type(node).__name__}")
+
+
+def _compile_matches(node: ast.Call):
+    if len(node.args) != 2:
+        raise PredicateError("matches() takes a field and a pattern")
+    value = _compile(node.args[0])
+    try:
+        pattern = _literal(node.args[1])
+    except KeyError:
+        raise PredicateError("matches() pattern must be a string literal")
+    regex = _regex(pattern)
+    return lambda item: (lambda v: isinstance(v, str) and regex.search(v) is not None)(value(item))
+
+
+def _regex(pattern: str) -> re.Pattern:
+    try:
+        return re.compile(pattern, REGEX_FLAGS)
+    except re.error as e:
+        raise PredicateError(f"invalid regex {pattern!r}: {e}")
+
+
+@lru_cache(maxsize=None)
+def compile_predicate(expression: str) -> Predicate:
+    """Выражение или имя из PRESETS → функция item -> bool (компилируется один раз)"""
+    source = PRESETS.get(expression.strip(), expression)
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise PredicateError(f"syntax error in {expression!r}: {e.msg}")
+    fn = _compile(tree.body)
+    return lambda item: bool(fn(item))
+
+
+@lru_cache(maxsize=None)
+def compile_condition(pattern: str) -> Predicate:
+    """Прежний condition: регулярка по item['text']; пустой текст не проходит"""
+    regex = _regex(pattern)
+    return lambda item: bool(item.get("text")) and regex.search(item["text"]) is not None
+
+
+@dataclass
+class Check:
+    """Одна проверка правила со счётчиками для filter_stats"""
+    label: str
+    test: Predicate
+    removed: int = 0
+    errors: int = 0
+
+
+@dataclass
+class UniqueCheck(Check):
+    seen: set = field(default_factory=set)
+
+
+def compile_filters(filter_rules) -> List[Check]:
+    """FilterRule'ы правила → плоский список проверок в порядке шаблона"""
+    checks: List[Check] = []
+    for rule in filter_rules:
+        if rule.unique:
+            checks.append(UniqueCheck(f"unique: {rule.unique}", _field(rule.unique)))
+        if rule.filter:
+            checks.append(Check(f"filter: {rule.filter}", compile_predicate(rule.filter)))
+        if rule.condition:
+            checks.append(Check(f"condition: {rule.condition}", compile_condition(rule.condition)))
+    return checks
+
+
+def reset_checks(checks: List[Check]) -> None:
+    """Обнуляет счётчики и множества unique перед новым запуском"""
+    for check in checks:
+        check.removed = check.errors = 0
+        if isinstance(check, UniqueCheck):
+            check.seen = set()
+
+
+def apply_filters(items: List[dict], checks: List[Check]) -> List[dict]:
+    """
+    Все проверки за один проход по блоку; запись отсеивается первой не прошедшей.
+    Счётчики и unique копятся между вызовами (пачки одного запуска), сброс — reset_checks.
+    """
+    kept = []
+    for item in items:
+        for check in checks:
+            try:
+                if isinstance(check, UniqueCheck):
+                    key = check.test(item)
+                    passed = key not in check.seen
+                    check.seen.add(key)
+                else:
+                    passed = check.test(item)
+            except Exception:
+                check.errors += 1
+                passed = False
+            if not passed:
+                check.removed += 1
+                break
+        else:
+            kept.append(item)
+    return kept
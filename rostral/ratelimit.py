@@ -0,0 +1,66 @@
+# rostral/ratelimit.py
+
+"""
+Ограничение частоты запросов к внешним API.
+
+TokenBucket разделяется всеми потоками процесса: параллельные запросы
+к одному API (например, к cloud-api Яндекс.Диска) вместе не превышают
+заданную частоту, а короткие всплески до `capacity` проходят без ожидания.
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """Потокобезопасное ведро токенов: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Забирает токены, если они есть; не ждёт"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Ждёт, пока появятся токены; возвращает время ожидания в секундах"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(name: str, rate: float, capacity: Optional[float] = None) -> TokenBucket:
+    """Именованное ведро на процесс: все вызывающие с одним name делят лимит"""
+    with _buckets_lock:
+        bucket = _buckets.get(name)
+        if bucket is None:
+            bucket = _buckets[name] = TokenBucket(rate, capacity)
+        return bucket
@@ -0,0 +1,286 @@
+# rostral/registry.py
+
+"""
+Реестр скомпилированных шаблонов.
+
+Шаблон читается и проверяется один раз: pydantic-модель, CSS-селекторы,
+JMESPath-выражения, регулярки, фильтры normalize и Jinja-шаблоны
+компилируются заранее, и все ошибки собираются в TemplateError до первого
+сетевого запроса. Скомпилированные объекты остаются в кэшах функций
+компиляции (compile_selector, compile_expression, compile_jinja, ...),
+откуда их берут стадии; PipelineRunner не проверяет шаблон из реестра
+повторно. Результат
+кэшируется по (mtime, размер) файла: изменённый шаблон перечитывается при
+следующем обращении (hot reload для демона и веб-интерфейса), неизменённый
+не читается с диска вовсе. Список шаблонов папки тоже кэшируется и
+обходится заново, только когда меняется mtime одной из её подпапок.
+"""
+
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import yaml
+from pydantic import ValidationError
+
+from rostral.models import Config, ExtractFieldConfig
+from rostral.predicates import REGEX_FLAGS, compile_condition, compile_predicate
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = Path(os.getenv("ROSTRAL_TEMPLATES_DIR", "templates"))
+TEMPLATE_SUFFIXES = (".yaml", ".yml")
+SOURCE_TYPES = ("html", "json", "rss")
+
+
+class TemplateError(ValueError):
+    """Шаблон не проходит проверку; problems — все найденные ошибки"""
+
+    def __init__(self, path: str, problems: List[str]):
+        self.path = str(path)
+        self.problems = list(problems)
+        super().__init__(f"Invalid template {self.path}: " + "; ".join(self.problems))
+
+
+@dataclass
+class CompiledTemplate:
+    """Проверенный шаблон; PipelineRunner принимает его без повторной проверки"""
+    path: str
+    config: Config
+    stamp: Optional[Tuple[int, int]] = None  # (st_mtime_ns, st_size) прочитанного файла
+
+    @property
+    def name(self) -> str:
+        return self.config.template_name
+
+
+def _compile_css(css: str):
+    from rostral.stages.selectors import compile_selector
+    return compile_selector(css)
+
+
+def _compile_jmespath(expression: str):
+    from rostral.stages.json_extract import compile_expression
+    return compile_expression(expression)
+
+
+def compile_config(config: Config, path: str = "<config>") -> CompiledTemplate:
+    """
+    Компилирует все выражения шаблона. Ошибки не прерывают проверку:
+    TemplateError перечисляет их все сразу.
+    """
+    from rostral.stages.base import compile_jinja
+
+    compiled = CompiledTemplate(path=str(path), config=config)
+    problems = []
+
+    def check(where: str, kind: str, compile_fn, source: str):
+        try:
+            return compile_fn(source)
+        except Exception as e:
+            problems.append(f"{where}: invalid {kind} {source!r}: {str(e).splitlines()[0] if str(e) else type(e).__name__}")
+            return None
+
+    def jinja(where: str, source: str, render: bool = False):
+        template = check(where, "Jinja template", compile_jinja, source)
+        if template is not None and render:
+            # url и endpoints рендерятся без контекста — пробуем сразу (now() и фильтры)
+            check(where, "Jinja template", lambda s: template.render(), source)
+
+    source = config.source
+    kind = source.type
+    if kind not in SOURCE_TYPES:
+        problems.append(f"source.type: unsupported source type {kind!r} (expected one of {', '.join(SOURCE_TYPES)})")
+    selector_fn = _compile_jmespath if kind == "json" else _compile_css
+    selector_kind = "JMESPath expression" if kind == "json" else "CSS selector"
+
+    jinja("source.url", source.url, render=True)
+    for name, url in (source.endpoints or {}).items():
+        jinja(f"source.endpoints.{name}", url, render=True)
+    if source.pagination and source.pagination.next and kind in ("html", "json"):
+        check("source.pagination.next", selector_kind, selector_fn, source.pagination.next)
+    if config.download.allow_html and source.fetch.selector:
+        # Текст HTML-страницы события выбирается через BeautifulSoup (soupsieve)
+        import soupsieve
+        check("source.fetch.selector", "CSS selector", soupsieve.compile, source.fetch.selector)
+
+    for block_name, block in (config.extract or {}).items():
+        where = f"extract.{block_name}"
+        if kind != "rss":  # в RSS selector — имя элемента ленты
+            check(f"{where}.selector", selector_kind, selector_fn, block.selector)
+        for field_name, rule in block.fields.items():
+            field_where = f"{where}.fields.{field_name}"
+            expression = rule if isinstance(rule, str) else rule.attr
+            if kind == "json" and expression:
+                check(field_where, "JMESPath expression", _compile_jmespath, expression)
+            if isinstance(rule, ExtractFieldConfig):
+                if rule.transform:
+                    jinja(f"{field_where}.transform", rule.transform)
+                if rule.transform_type:
+                    from rostral.stages.transforms import TRANSFORM_REGISTRY
+                    if rule.transform_type not in TRANSFORM_REGISTRY:
+                        problems.append(f"{field_where}.transform_type: unknown transform {rule.transform_type!r} "
+                                        f"(available: {', '.join(sorted(TRANSFORM_REGISTRY))})")
+
+    if config.processing:
+        for i, pattern in enumerate(config.processing.extract_regex):
+            check(f"processing.extract_regex.{i}", "regex", lambda p: re.compile(p, REGEX_FLAGS), pattern)
+    if config.normalize:
+        for i, rule in enumerate(config.normalize.rules):
+            for j, filter_rule in enumerate(rule.filters):
+                where = f"normalize.rules.{i}.filters.{j}"
+                if filter_rule.filter:
+                    check(f"{where}.filter", "filter expression", compile_predicate, filter_rule.filter)
+                if filter_rule.condition:
+                    check(f"{where}.condition", "regex", compile_condition, filter_rule.condition)
+    if config.track:
+        blocks = config.extract or {}
+        if config.track.field not in blocks:
+            problems.append(f"track.field: unknown extract block {config.track.field!r} "
+                            f"(available: {', '.join(blocks) or 'none'})")
+        if not config.track.values:
+            problems.append("track.values: at least one tracked field is required")
+    if config.gpt:
+        jinja("gpt.prompt", config.gpt.prompt)
+    if config.alert:
+        for name, template in config.alert.templates.items():
+            jinja(f"alert.templates.{name}", template)
+
+    if problems:
+        raise TemplateError(path, problems)
+    return compiled
+
+
+def _validation_problems(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(p) for p in e['loc']) or '<root>'}: {e['msg']}" for e in error.errors()]
+
+
+def compile_file(path: Union[str, Path]) -> CompiledTemplate:
+    """Читает, валидирует и компилирует шаблон с диска"""
+    try:
+        data = yaml.safe_load(Path(path).read_text(encoding="utf-8"))
+    except yaml.YAMLError as e:
+        raise TemplateError(path, [f"YAML syntax error: {' '.join(str(e).split())}"])
+    try:
+        config = Config.model_validate(data)
+    except ValidationError as e:
+        raise TemplateError(path, _validation_problems(e))
+    return compile_config(config, str(path))
+
+
+def _stamp(stat: os.stat_result) -> Tuple[int, int]:
+    return stat.st_mtime_ns, stat.st_size
+
+
+class TemplateRegistry:
+    """
+    Кэш скомпилированных шаблонов папки. Потокобезопасен; ошибки компиляции
+    тоже кэшируются (до следующего изменения файла), чтобы сломанный шаблон
+    не перечитывался и не логировался на каждом обращении.
+    """
+
+    def __init__(self, folder: Union[str, Path] = TEMPLATES_DIR):
+        self.folder = Path(folder)
+        self._entries: Dict[str, Tuple[Tuple[int, int], Union[CompiledTemplate, TemplateError]]] = {}
+        self._dirs: Dict[str, int] = {}
+        self._paths: Optional[List[Path]] = None
+        self._lock = threading.RLock()
+
+    def get(self, path: Union[str, Path]) -> CompiledTemplate:
+        """Скомпилированный шаблон; перекомпилируется, только если файл изменился"""
+        key = os.path.abspath(path)
+        try:
+            stamp = _stamp(os.stat(key))
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(key, None)
+            raise
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or cached[0] != stamp:
+                try:
+                    entry = compile_file(path)
+                    entry.stamp = stamp
+                except TemplateError as e:
+                    entry = e
+                    logger.error(f"❌ Template {path} rejected:\n" + "\n".join(f"   - {p}" for p in e.problems))
+                else:
+                    if cached is not None:
+                        logger.info(f"🔄 Template reloaded: {path}")
+                self._entries[key] = cached = (stamp, entry)
+        if isinstance(cached[1], TemplateError):
+            raise cached[1]
+        return cached[1]
+
+    def load(self, path: Union[str, Path]) -> Config:
+        """
+        Config шаблона для одного запуска. Копия глубокая: стадии меняют
+        конфиг на ходу (fetch подставляет отрендеренный url).
+        """
+        return self.get(path).config.model_copy(deep=True)
+
+    def _dirs_changed(self) -> bool:
+        for folder, mtime in self._dirs.items():
+            try:
+                if os.stat(folder).st_mtime_ns != mtime:
+                    return True
+            except FileNotFoundError:
+                return True
+        return False
+
+    def paths(self) -> List[Path]:
+        """Файлы шаблонов папки (сначала *.yaml, затем *.yml, по алфавиту)"""
+        with self._lock:
+            if self._paths is None or self._dirs_changed():
+                dirs, found = {}, {suffix: [] for suffix in TEMPLATE_SUFFIXES}
+                if self.folder.is_dir():
+                    for dirpath, _, filenames in os.walk(self.folder):
+                        dirs[dirpath] = os.stat(dirpath).st_mtime_ns
+                        for filename in filenames:
+                            suffix = os.path.splitext(filename)[1]
+                            if suffix in found:
+                                found[suffix].append(Path(dirpath) / filename)
+                self._dirs = dirs
+                self._paths = [p for suffix in TEMPLATE_SUFFIXES for p in sorted(found[suffix])]
+            return list(self._paths)
+
+    def templates(self) -> Iterator[CompiledTemplate]:
+        """Все корректные шаблоны папки; сломанные пропускаются (ошибка уже в логе)"""
+        for path in self.paths():
+            try:
+                yield self.get(path)
+            except (TemplateError, FileNotFoundError):
+                continue
+
+    def validate(self) -> Dict[Path, Optional[TemplateError]]:
+        """{путь: None или TemplateError} по всем шаблонам папки"""
+        report = {}
+        for path in self.paths():
+            try:
+                self.get(path)
+                report[path] = None
+            except TemplateError as e:
+                report[path] = e
+        return report
+
+
+_registries: Dict[str, TemplateRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(folder: Union[str, Path] = TEMPLATES_DIR) -> TemplateRegistry:
+    """Общий на процесс реестр папки шаблонов"""
+    key = os.path.abspath(folder)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = TemplateRegistry(folder)
+        return _registries[key]
+
+
+def load_template(path: Union[str, Path]) -> Config:
+    """Config шаблона из кэша реестра (перечитывается, если файл изменился)"""
+    return get_registry().load(path)
@@ -1,92 +1,310 @@
 # rostral/runner.py
 
-import typer
-from typer import colors
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
 
-from rostral.stages.fetch import FetchStage
-from rostral.stages.event_html import EventHTMLStage
-from rostral.stages.extract import ExtractStage
-from rostral.stages.json_extract import JsonExtractStage
-from rostral.stages.event_json import EventJsonStage 
-from rostral.stages.download import DownloadStage
-from rostral.stages.normalize import NormalizeStage
-from rostral.stages.processing import ProcessingStage
-from rostral.stages.gpt import GPTStage
-from rostral.stages.alert import AlertStage
+from rostral.registry import CompiledTemplate, compile_config
+from rostral.stages import load_stage
+
+logger = logging.getLogger(__name__)
+
+# Точный пик памяти Python по стадиям (tracemalloc заметно замедляет запуск)
+TRACE_MEMORY = os.getenv("ROSTRAL_TRACE_MEMORY", "").lower() in ("1", "true", "yes", "on")
+RECORD_PREFIX = "record."
+MB = 1024 * 1024
+
+
+def current_rss() -> Optional[int]:
+    """Текущий RSS процесса в байтах (None, если платформа не даёт его узнать)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def peak_rss() -> Optional[int]:
+    """Максимальный RSS процесса с момента запуска, в байтах"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _payload_size(value) -> int:
+    return len(value) if isinstance(value, (bytes, bytearray, str)) else 0
+
+
+def drop_fields(containers: List[dict], fields: List[str]) -> int:
+    """
+    Удаляет поля из контекста: ключи верхнего уровня и поля записей
+    ("record.<поле>") во всех блоках. Возвращает примерный объём освобождённых данных.
+    """
+    freed = 0
+    record_fields = [f[len(RECORD_PREFIX):] for f in fields if f.startswith(RECORD_PREFIX)]
+    keys = [f for f in fields if not f.startswith(RECORD_PREFIX)]
+    for container in containers:
+        for key in keys:
+            freed += _payload_size(container.pop(key, None))
+        if not record_fields:
+            continue
+        for items in container.values():
+            if not isinstance(items, list):
+                continue
+            for record in items:
+                if isinstance(record, dict):
+                    for name in record_fields:
+                        freed += _payload_size(record.pop(name, None))
+    return freed
 
 
 class PipelineRunner:
     """
     PipelineRunner executes all configured stages in sequence.
     Each stage receives the output of the previous one.
+    Stage modules are imported lazily via the stage registry,
+    so a template pays only for the dependencies it actually uses.
+    Selectors, expressions, regexes and Jinja templates are compiled
+    up front: a broken template raises TemplateError before any network I/O.
+    A CompiledTemplate from the registry is already checked and is not
+    compiled again; a bare Config is validated here.
+    Intermediate payloads declared by stages (produces / consumes) are dropped
+    from the context after their last consumer; memory is reported per stage.
+    When records can still be dropped after download (PDF parsing, normalize
+    filters), the per-record stages run in batches until MAX_EVENTS_PER_TEMPLATE
+    records are accepted, so nothing past the limit is downloaded or sent to GPT.
     """
 
     def __init__(self, config):
+        if isinstance(config, CompiledTemplate):
+            # Стадии меняют конфиг на ходу (fetch подставляет url) — кэш реестра не трогаем
+            config = config.config.model_copy(deep=True)
+        else:
+            compile_config(config)
         self.config = config
-        self.stages = []
+        self.stages = [load_stage(name)(config) for name in self._stage_names(config)]
+        self.releases = self._releases(self.stages)
+        self.stage_stats: List[dict] = []
+
+    @staticmethod
+    def _releases(stages) -> Dict[int, List[str]]:
+        """{индекс стадии: поля, которые после неё больше никому не нужны}"""
+        last = {}
+        for index, stage in enumerate(stages):
+            for field in stage.produces:
+                last.setdefault(field, index)
+            for field in stage.consumes:
+                if field in last:
+                    last[field] = index
+        releases = {}
+        for field, index in last.items():
+            releases.setdefault(index, []).append(field)
+        return releases
 
+    @staticmethod
+    def _stage_names(config) -> list:
+        """Возвращает имена стадий (ключи STAGE_REGISTRY) в порядке выполнения"""
         # Always include fetch
-        self.stages.append(FetchStage(config))
+        names = ["fetch"]
 
         # Conditionally include other stages
         if config.extract:
             # Выбираем стадию извлечения в зависимости от типа источника
-            if config.source.type == "json":
-                self.stages.append(JsonExtractStage(config))
-                typer.echo("🧠 JsonExtractStage added: JSON processing activated")
-                if getattr(config.download, "allow_json", False):
-                    self.stages.append(EventJsonStage(config)) 
-                    typer.echo("🧠 EventJsonStage added: JSON processing activated")          
-            else:
-                self.stages.append(ExtractStage(config))
+            names.append("json_extract" if config.source.type == "json" else "extract")
+            # Дедупликация и лимит сразу после извлечения: дальше идут только новые записи.
+            # Для track: новизна определяется снимками значений — изменившаяся страница
+            # с уже известным URL тоже должна пройти дальше
+            names.append("snapshot" if config.track else "dedup")
+            if config.source.type == "json" and getattr(config.download, "allow_json", False):
+                names.append("event_json")
+                logger.debug("🧠 EventJsonStage added: JSON processing activated")
         if config.download:
-            self.stages.append(DownloadStage(config))
-            typer.echo(f"Download config: {config.download}")
+            names.append("download")
+            logger.debug(f"Download config: {config.download}")
 
         if getattr(config.download, "allow_html", False):
-            self.stages.append(EventHTMLStage(config))
-            typer.echo("🧠 EventHTMLStage added: HTML processing activated")
-            
-        
+            names.append("event_html")
+            logger.debug("🧠 EventHTMLStage added: HTML processing activated")
+
         if config.processing:
-            self.stages.append(ProcessingStage(config))
+            names.append("processing")
         if config.normalize:
-            self.stages.append(NormalizeStage(config))
+            names.append("normalize")
         if config.gpt:
-            self.stages.append(GPTStage(config))
+            names.append("gpt")
         if config.alert:
-            self.stages.append(AlertStage(config))
-
-    def run(self, dry_run: bool = False):
-        typer.echo("🔧 self.config:")
-        typer.echo(self.config.model_dump_json(indent=2))  # Для Pydantic v2
-        # debug stages order
-        typer.echo("\n🏷 Pipeline stages order:")
-        for idx, stage in enumerate(self.stages, 1):
-            typer.echo(f" {idx}. {stage.__class__.__name__}")
-        typer.echo("")  
-
-        
-        context = {}
-        data = None
-
-        for stage in self.stages:
-            stage_name = stage.__class__.__name__
-            typer.secho(f"\n⏳ Starting stage: {stage_name}", fg=colors.YELLOW)
+            names.append("alert")
+        return names
 
-            data = stage.run(data or context)
+    def run(self, dry_run: bool = False, on_stage=None):
+        """
+        Выполняет стадии по порядку.
+        :param on_stage: необязательный callback(stage_name, status, index, total, items),
+            вызывается со status="running" перед стадией и "done" после неё
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("🔧 self.config:\n" + self.config.model_dump_json(indent=2))  # Для Pydantic v2
+        logger.info("🏷 Pipeline stages order: " + " → ".join(s.__class__.__name__ for s in self.stages))
 
-            typer.secho(f"✅ Stage {stage_name} finished", fg=colors.GREEN)
+        for stage in self.stages:
+            stage.dry_run = dry_run
+            stage.reset()
 
-            if isinstance(data, dict):
-                context.update(data)
-            else:
-                context[stage_name] = data
+        context = {}
+        self.stage_stats = []
+        trace = TRACE_MEMORY and not tracemalloc.is_tracing()
+        if trace:
+            tracemalloc.start()
+        try:
+            self._run_stages(context, on_stage)
+        finally:
+            if trace:
+                tracemalloc.stop()
+        self._log_memory_summary()
 
         if dry_run:
-            typer.echo("\n📝 Dry-run finished. Context:")
+            logger.info("📝 Dry-run finished. Context:")
             for k, v in context.items():
                 snippet = str(v)[:200] + ("..." if len(str(v)) > 200 else "")
-                typer.echo(f"  {k}: {snippet}")
+                logger.info(f"  {k}: {snippet}")
 
         return context
+
+    def _run_stages(self, context: dict, on_stage=None) -> None:
+        data = None
+        index = 0
+        while index < len(self.stages):
+            if self.stages[index].per_record and self._limit_is_deferred():
+                group = [index]
+                while group[-1] + 1 < len(self.stages) and self.stages[group[-1] + 1].per_record:
+                    group.append(group[-1] + 1)
+                data = self._run_limited(group, data or context, context, on_stage)
+                index = group[-1] + 1
+                continue
+            data, seconds, freed = self._run_stage(index, data or context, context, on_stage)
+            self._record_stats(self.stages[index].__class__.__name__, seconds, freed)
+            index += 1
+
+    def _limit_is_deferred(self) -> bool:
+        if self.config.track or not self.config.extract:
+            return False
+        from rostral.stages.dedup import limit_is_deferred
+        return limit_is_deferred(self.config)
+
+    def _run_limited(self, indices: List[int], data: dict, context: dict, on_stage=None) -> dict:
+        """
+        Стадии, которые отсеивают записи (загрузка, разбор PDF, normalize), идут
+        пачками: в пачку берётся столько новых записей блока, сколько не хватает
+        до MAX_EVENTS_PER_TEMPLATE, пока лимит не набран или записи не кончились.
+        Скачиваются и разбираются только записи, которые могут быть сохранены;
+        остальные остаются новыми до следующего запуска.
+        """
+        from rostral.stages import dedup
+
+        cap = dedup.MAX_EVENTS_PER_TEMPLATE
+        pending = {name: items for name, items in data.items() if isinstance(items, list)}
+        kept = {name: [] for name in pending}
+        totals = {index: [0.0, 0] for index in indices}
+        result, batches = data, 0
+        while True:
+            batch = {}
+            for name, items in pending.items():
+                need = max(cap - len(kept[name]), 0)
+                batch[name], pending[name] = items[:need], items[need:]
+            if batches and not any(batch.values()):
+                break
+            batches += 1
+            result = {**data, **batch}
+            for index in indices:
+                result, seconds, freed = self._run_stage(index, result, context, on_stage)
+                totals[index][0] += seconds
+                totals[index][1] += freed
+            for name, items in kept.items():
+                if isinstance(result, dict) and isinstance(result.get(name), list):
+                    items.extend(result[name])
+
+        left = sum(len(items) for items in pending.values())
+        logger.info(f"✂️ Limit {cap}: {batches} batch(es), {left} new items left for the next run")
+        for index, (seconds, freed) in totals.items():
+            self._record_stats(self.stages[index].__class__.__name__, seconds, freed)
+        if isinstance(result, dict):
+            result = {**result, **{name: items for name, items in kept.items() if name in result}}
+            context.update(result)
+        return result
+
+    def _run_stage(self, index: int, data, context: dict, on_stage=None):
+        """Одна стадия: (результат, секунды, освобождённые байты)"""
+        stage = self.stages[index]
+        total = len(self.stages)
+        stage_name = stage.__class__.__name__
+        logger.info(f"⏳ Starting stage: {stage_name}", extra={"stage": stage_name, "template": self.config.template_name})
+        if on_stage:
+            on_stage(stage_name, "running", index, total, None)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+
+        data = stage.run(data)
+
+        logger.info(f"✅ Stage {stage_name} finished", extra={"stage": stage_name, "template": self.config.template_name})
+        if on_stage:
+            events = data.get("events") if isinstance(data, dict) else None
+            on_stage(stage_name, "done", index, total, len(events) if isinstance(events, list) else None)
+
+        if isinstance(data, dict):
+            context.update(data)
+        else:
+            context[stage_name] = data
+
+        # Промежуточные данные, которые дальше никто не читает, освобождаются сразу
+        released = self.releases.get(index, [])
+        freed = drop_fields([context] + ([data] if isinstance(data, dict) and data is not context else []),
+                            released)
+        if released:
+            logger.debug(f"🧹 Released after {stage_name}: {', '.join(released)} (~{freed / MB:.1f} MB)")
+        return data, time.perf_counter() - started, freed
+
+    def _record_stats(self, stage_name: str, seconds: float, freed: int) -> None:
+        previous_peak = self.stage_stats[-1]["peak_rss"] if self.stage_stats else None
+        stats = {
+            "stage": stage_name,
+            "seconds": round(seconds, 3),
+            "rss": current_rss(),
+            "peak_rss": peak_rss(),
+            "released_bytes": freed,
+        }
+        if tracemalloc.is_tracing():
+            stats["heap_peak"] = tracemalloc.get_traced_memory()[1]
+        self.stage_stats.append(stats)
+
+        parts = [f"{stats['seconds']:.2f} s"]
+        if stats["rss"] is not None:
+            parts.append(f"RSS {stats['rss'] / MB:.0f} MB")
+        if stats["peak_rss"] is not None and previous_peak is not None and stats["peak_rss"] > previous_peak:
+            parts.append(f"new peak {stats['peak_rss'] / MB:.0f} MB")
+        if "heap_peak" in stats:
+            parts.append(f"Python heap peak {stats['heap_peak'] / MB:.1f} MB")
+        if freed:
+            parts.append(f"released {freed / MB:.1f} MB")
+        logger.info(f"📈 {stage_name}: " + ", ".join(parts), extra={"stage": stage_name, "template": self.config.template_name})
+
+    def _log_memory_summary(self) -> None:
+        key = "heap_peak" if self.stage_stats and "heap_peak" in self.stage_stats[0] else "rss"
+        measured = [s for s in self.stage_stats if s.get(key) is not None]
+        if not measured:
+            return
+        top = max(measured, key=lambda s: s[key])
+        label = "Python heap peak" if key == "heap_peak" else "RSS"
+        logger.info(f"📈 Highest {label}: {top[key] / MB:.1f} MB in {top['stage']}"
+                    + (f", process peak {measured[-1]['peak_rss'] / MB:.0f} MB" if measured[-1].get("peak_rss") else ""))
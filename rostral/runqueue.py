@@ -0,0 +1,315 @@
+# rostral/runqueue.py
+
+"""
+Общая очередь запусков для нескольких машин.
+
+Планировщик (`rostral schedule`) ставит в таблицу run_queue шаблоны, которым
+подошёл срок по source.frequency. Воркеры (`rostral worker`) на любых машинах
+с общей базой забирают запуски атомарно:
+  - PostgreSQL — SELECT ... FOR UPDATE SKIP LOCKED: воркеры не ждут друг друга;
+  - SQLite — один UPDATE ... WHERE id = (SELECT ...) RETURNING под блокировкой записи.
+Забравший запуск воркер держит аренду и продлевает её heartbeat'ом; если воркер
+упал, аренда истекает и запуск снова попадает в очередь. Ошибка запуска —
+повтор с экспоненциальной отсрочкой, после max_attempts попыток — failed.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from sqlalchemy import and_, select, update
+
+from rostral.db import Session, get_engine, insert_ignoring_conflicts
+from rostral.models import QueuedRun
+from rostral.registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = float(os.getenv("ROSTRAL_LEASE_SECONDS", 300))
+HEARTBEAT_SECONDS = float(os.getenv("ROSTRAL_HEARTBEAT_SECONDS", LEASE_SECONDS / 3))
+MAX_ATTEMPTS = int(os.getenv("ROSTRAL_RUN_ATTEMPTS", 3))
+RETRY_BACKOFF = float(os.getenv("ROSTRAL_RETRY_BACKOFF", 60))  # секунд, удваивается с каждой попыткой
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+FREQUENCIES = {"hourly": 3600, "daily": 86400, "weekly": 7 * 86400}
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def _now() -> datetime:
+    # Время в очереди — UTC без зоны, как у событий
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def parse_interval(value: str) -> float:
+    """'90', '30s', '15m', '6h', '1d' → секунды"""
+    value = str(value).strip().lower()
+    try:
+        if value and value[-1] in _UNITS:
+            return float(value[:-1]) * _UNITS[value[-1]]
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Invalid interval: {value!r} (e.g. 30m, 6h, 1d)")
+
+
+def next_due(frequency: str, last: Optional[datetime], now: datetime) -> datetime:
+    """Когда шаблон с данной частотой снова должен запуститься (hourly/daily/weekly, 30m, cron)"""
+    if last is None:
+        return now
+    frequency = (frequency or "daily").strip()
+    if frequency.lower() in FREQUENCIES:
+        return last + timedelta(seconds=FREQUENCIES[frequency.lower()])
+    if len(frequency.split()) == 5:
+        from croniter import croniter
+        return croniter(frequency, last).get_next(datetime)
+    return last + timedelta(seconds=parse_interval(frequency))
+
+
+def enqueue(template_path: str, template_name: Optional[str] = None, delay: float = 0,
+            max_attempts: int = MAX_ATTEMPTS) -> bool:
+    """
+    Ставит запуск шаблона в очередь. False, если этот шаблон уже в очереди
+    или выполняется (частичный уникальный индекс, безопасно для нескольких планировщиков).
+    """
+    if template_name is None:
+        template_name = get_registry().get(template_path).name
+    now = _now()
+    with get_engine().begin() as conn:
+        result = conn.execute(insert_ignoring_conflicts(QueuedRun.__table__).values(
+            template_name=template_name,
+            template_path=Path(template_path).as_posix(),
+            status=QUEUED,
+            attempts=0,
+            max_attempts=max_attempts,
+            available_at=now + timedelta(seconds=delay),
+            enqueued_at=now,
+        ))
+    if result.rowcount:
+        logger.info(f"📥 Queued {template_name} ({template_path})")
+    return bool(result.rowcount)
+
+
+def schedule_due(templates_dir: Path = Path("templates"), now: Optional[datetime] = None) -> List[str]:
+    """Ставит в очередь все шаблоны папки, у которых подошёл срок. Возвращает их имена"""
+    now = now or _now()
+    queued = []
+    # Реестр не перечитывает неизменённые шаблоны; сломанные пропускаются (ошибка в логе)
+    for template in get_registry(templates_dir).templates():
+        path, config = template.path, template.config
+        session = Session()
+        try:
+            last = session.query(QueuedRun.enqueued_at).filter(
+                QueuedRun.template_name == config.template_name
+            ).order_by(QueuedRun.enqueued_at.desc()).limit(1).scalar()
+        finally:
+            session.close()
+        if next_due(config.source.frequency, last, now) <= now and enqueue(str(path), config.template_name):
+            queued.append(config.template_name)
+    return queued
+
+
+def requeue_expired(now: Optional[datetime] = None) -> int:
+    """Возвращает в очередь запуски, чья аренда истекла (воркер упал или потерял связь)"""
+    now = now or _now()
+    table = QueuedRun.__table__
+    expired = and_(table.c.status == RUNNING, table.c.lease_expires_at < now)
+    with get_engine().begin() as conn:
+        retried = conn.execute(update(table).where(expired, table.c.attempts < table.c.max_attempts).values(
+            status=QUEUED, lease_owner=None, lease_expires_at=None,
+            error="lease expired",
+        )).rowcount
+        failed = conn.execute(update(table).where(expired).values(
+            status=FAILED, lease_owner=None, lease_expires_at=None, finished_at=now, error="lease expired",
+        )).rowcount
+    if retried or failed:
+        logger.warning(f"⚠️ Expired leases: {retried} runs requeued, {failed} failed")
+    return retried + failed
+
+
+def claim(owner: str, lease_seconds: float = LEASE_SECONDS) -> Optional[dict]:
+    """
+    Атомарно забирает самый ранний готовый запуск и выдаёт аренду owner.
+    Возвращает {"id", "template_name", "template_path", "attempts"} или None.
+    """
+    now = _now()
+    table = QueuedRun.__table__
+    claimed = {
+        "status": RUNNING,
+        "lease_owner": owner,
+        "lease_expires_at": now + timedelta(seconds=lease_seconds),
+        "started_at": now,
+        "attempts": table.c.attempts + 1,
+        "error": None,
+    }
+    candidate = (
+        select(table.c.id)
+        .where(table.c.status == QUEUED, table.c.available_at <= now)
+        .order_by(table.c.available_at, table.c.id)
+        .limit(1)
+    )
+    returning = (table.c.id, table.c.template_name, table.c.template_path, table.c.attempts)
+    engine = get_engine()
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            run_id = conn.execute(candidate.with_for_update(skip_locked=True)).scalar()
+            if run_id is None:
+                return None
+            row = conn.execute(update(table).where(table.c.id == run_id).values(**claimed).returning(*returning)).first()
+        else:
+            # Один оператор записи: SQLite сериализует писателей, повторно запуск не выдаётся
+            row = conn.execute(
+                update(table)
+                .where(table.c.id == candidate.scalar_subquery(), table.c.status == QUEUED)
+                .values(**claimed)
+                .returning(*returning)
+            ).first()
+    return dict(row._mapping) if row else None
+
+
+def heartbeat(run_id: int, owner: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+    """Продлевает аренду; False — аренда потеряна (истекла и запуск отдан другому)"""
+    table = QueuedRun.__table__
+    with get_engine().begin() as conn:
+        return bool(conn.execute(
+            update(table)
+            .where(table.c.id == run_id, table.c.lease_owner == owner, table.c.status == RUNNING)
+            .values(lease_expires_at=_now() + timedelta(seconds=lease_seconds))
+        ).rowcount)
+
+
+def complete(run_id: int, owner: str, result: Optional[dict] = None) -> bool:
+    table = QueuedRun.__table__
+    with get_engine().begin() as conn:
+        return bool(conn.execute(
+            update(table)
+            .where(table.c.id == run_id, table.c.lease_owner == owner, table.c.status == RUNNING)
+            .values(status=SUCCEEDED, finished_at=_now(), lease_owner=None, lease_expires_at=None,
+                    result=json.dumps(result, ensure_ascii=False) if result is not None else None)
+        ).rowcount)
+
+
+def fail(run_id: int, owner: str, error: str) -> str:
+    """
+    Отмечает ошибку запуска: пока попытки не исчерпаны — обратно в очередь
+    с отсрочкой RETRY_BACKOFF * 2^(попытка-1), иначе failed. Возвращает новый статус.
+    """
+    table = QueuedRun.__table__
+    now = _now()
+    mine = and_(table.c.id == run_id, table.c.lease_owner == owner, table.c.status == RUNNING)
+    with get_engine().begin() as conn:
+        attempts, max_attempts = conn.execute(select(table.c.attempts, table.c.max_attempts).where(mine)).first() or (None, None)
+        if attempts is None:
+            return "lost"
+        if attempts < max_attempts:
+            values = {"status": QUEUED, "available_at": now + timedelta(seconds=RETRY_BACKOFF * 2 ** (attempts - 1))}
+        else:
+            values = {"status": FAILED, "finished_at": now}
+        conn.execute(update(table).where(mine).values(
+            lease_owner=None, lease_expires_at=None, error=error[:2000], **values))
+    return values["status"]
+
+
+def queue_stats() -> dict:
+    """Число запусков по статусам"""
+    from sqlalchemy import func
+
+    session = Session()
+    try:
+        return dict(session.query(QueuedRun.status, func.count()).group_by(QueuedRun.status))
+    finally:
+        session.close()
+
+
+def run_pipeline(template_path: str) -> dict:
+    """Выполнение запуска по умолчанию: конвейер шаблона и краткий итог"""
+    from rostral.jobs import summarize
+    from rostral.runner import PipelineRunner
+
+    context = PipelineRunner(get_registry().get(template_path)).run()
+    return summarize(context)
+
+
+class _Heartbeat(threading.Thread):
+    """Продлевает аренду, пока выполняется запуск"""
+
+    def __init__(self, run_id: int, owner: str, lease_seconds: float, interval: float):
+        super().__init__(daemon=True, name=f"rostral-heartbeat-{run_id}")
+        self.run_id, self.owner, self.lease_seconds, self.interval = run_id, owner, lease_seconds, interval
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            try:
+                if not heartbeat(self.run_id, self.owner, self.lease_seconds):
+                    self.lost = True
+                    logger.warning(f"⚠️ Lease of run {self.run_id} lost")
+                    return
+            except Exception as e:
+                logger.warning(f"⚠️ Heartbeat of run {self.run_id} failed: {e}")
+
+
+class Worker:
+    """
+    Воркер очереди: забирает запуски, выполняет execute(template_path) → итог,
+    отмечает успех или ошибку. Несколько воркеров (потоков, процессов, машин)
+    работают с одной базой независимо.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None, execute: Callable[[str], dict] = run_pipeline,
+                 lease_seconds: float = LEASE_SECONDS, heartbeat_seconds: float = HEARTBEAT_SECONDS):
+        self.id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.execute = execute
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.processed = 0
+
+    def run_once(self) -> Optional[str]:
+        """Выполняет один запуск из очереди; возвращает его итоговый статус или None, если очередь пуста"""
+        run = claim(self.id, self.lease_seconds)
+        if run is None:
+            return None
+        logger.info(f"▶️ Worker {self.id} runs {run['template_name']} (attempt {run['attempts']})")
+        beat = _Heartbeat(run["id"], self.id, self.lease_seconds, self.heartbeat_seconds)
+        beat.start()
+        try:
+            result = self.execute(run["template_path"])
+        except Exception as e:
+            logger.exception(f"❌ Run {run['id']} ({run['template_name']}) failed: {e}")
+            return fail(run["id"], self.id, str(e))
+        finally:
+            beat.stopped.set()
+            beat.join()
+            self.processed += 1
+        if not complete(run["id"], self.id, result):
+            logger.warning(f"⚠️ Run {run['id']} finished after its lease was lost")
+            return "lost"
+        logger.info(f"✅ Run {run['id']} ({run['template_name']}) succeeded")
+        return SUCCEEDED
+
+    def run_forever(self, poll_interval: float = 5, stop: Optional[threading.Event] = None,
+                    burst: bool = False) -> int:
+        """
+        Цикл воркера. burst=True — выйти, когда очередь опустела.
+        Возвращает число выполненных запусков.
+        """
+        stop = stop or threading.Event()
+        next_check = 0.0
+        while not stop.is_set():
+            # Просроченные аренды ищем раз в heartbeat-интервал, а не перед каждым запуском:
+            # лишняя запись на каждый цикл мешает воркерам на SQLite
+            if time.monotonic() >= next_check:
+                requeue_expired()
+                next_check = time.monotonic() + self.heartbeat_seconds
+            if self.run_once() is None:
+                if burst:
+                    break
+                stop.wait(poll_interval)
+        return self.processed
@@ -0,0 +1,129 @@
+# rostral/snapshots.py
+
+"""
+Снимки отслеживаемых значений (track: в шаблоне).
+
+Для каждой записи хранится (шаблон, ключ записи) → хэш типизированных
+значений и сами значения. За запуск выполняется один запрос за хэшами
+всех ключей (пачками) и ещё один — за прежними значениями только
+изменившихся записей; неизменившаяся страница стоит одного сравнения
+16-байтного хэша. Значения приводятся к типу до хэширования, поэтому
+"1 990 ₽" и "1990 ₽" — одна и та же цена, а не изменение.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, Tuple
+
+from rostral.db import Session, upsert_statement
+from rostral.models import Snapshot
+from rostral.predicates import to_date, to_number
+
+logger = logging.getLogger(__name__)
+
+FALSE_WORDS = {"", "0", "false", "no", "нет", "none", "null"}
+
+
+def _text(value: Any):
+    return " ".join(str(value).split()) if value is not None else None
+
+
+def _number(value: Any):
+    number = to_number(value)
+    if isinstance(number, float) and number.is_integer():
+        return int(number)
+    return number
+
+
+def _date(value: Any):
+    parsed = to_date(value)
+    return parsed.isoformat() if parsed else _text(value)
+
+
+def _bool(value: Any):
+    if isinstance(value, str):
+        return value.strip().lower() not in FALSE_WORDS
+    return bool(value)
+
+
+TYPES = {"text": _text, "number": _number, "date": _date, "bool": _bool}
+
+
+def typed_values(record: dict, spec: Dict[str, str]) -> Dict[str, Any]:
+    """Значения отслеживаемых полей записи, приведённые к типам из track.values"""
+    return {field: TYPES[kind](record.get(field)) for field, kind in spec.items()}
+
+
+def digest(values: Dict[str, Any]) -> bytes:
+    payload = json.dumps(values, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+
+def _chunks(values: list, size: int = 500):
+    for i in range(0, len(values), size):  # ограничение SQLite на число параметров
+        yield values[i:i + size]
+
+
+def load_digests(template: str, keys: Iterable[str]) -> Dict[str, bytes]:
+    """{ключ: хэш} для уже известных записей шаблона"""
+    keys = list(dict.fromkeys(keys))
+    session = Session()
+    try:
+        found = {}
+        for chunk in _chunks(keys):
+            rows = session.query(Snapshot.record_key, Snapshot.digest).filter(
+                Snapshot.template_name == template, Snapshot.record_key.in_(chunk)
+            )
+            found.update((key, bytes(value)) for key, value in rows)
+        return found
+    finally:
+        session.close()
+
+
+def load_values(template: str, keys: Iterable[str]) -> Dict[str, dict]:
+    """{ключ: прежние значения}; вызывается только для изменившихся записей"""
+    keys = list(dict.fromkeys(keys))
+    session = Session()
+    try:
+        found = {}
+        for chunk in _chunks(keys):
+            rows = session.query(Snapshot.record_key, Snapshot.values).filter(
+                Snapshot.template_name == template, Snapshot.record_key.in_(chunk)
+            )
+            found.update((key, json.loads(values)) for key, values in rows)
+        return found
+    finally:
+        session.close()
+
+
+def save_snapshots(template: str, snapshots: Dict[str, Tuple[bytes, dict]]) -> None:
+    """Записывает новые снимки {ключ: (хэш, значения)} одной транзакцией"""
+    if not snapshots:
+        return
+
+    now = time.time()
+    rows = [
+        {"template_name": template, "record_key": key, "digest": value_digest,
+         "values": json.dumps(values, ensure_ascii=False), "updated_at": now}
+        for key, (value_digest, values) in snapshots.items()
+    ]
+    session = Session()
+    try:
+        upsert = upsert_statement(Snapshot.__table__, ["digest", "values", "updated_at"])
+        if upsert is not None:
+            session.execute(upsert, rows)
+        else:
+            for chunk in _chunks(list(snapshots)):
+                session.query(Snapshot).filter(
+                    Snapshot.template_name == template, Snapshot.record_key.in_(chunk)
+                ).delete(synchronize_session=False)
+            session.add_all([Snapshot(**row) for row in rows])
+        session.commit()
+        logger.info(f"📸 Snapshots saved: {template}: {len(rows)}")
+    except Exception as e:
+        session.rollback()
+        logger.error(f"❌ Snapshot save error: {str(e)}")
+    finally:
+        session.close()
@@ -0,0 +1,33 @@
+# rostral/stages/__init__.py
+
+import importlib
+
+# Реестр стадий: короткое имя → "модуль:класс".
+# Модуль стадии (и его тяжёлые зависимости: fitz, gpt4all, bs4 ...)
+# импортируется только тогда, когда стадия действительно нужна шаблону.
+STAGE_REGISTRY = {
+    "fetch": "rostral.stages.fetch:FetchStage",
+    "extract": "rostral.stages.extract:ExtractStage",
+    "json_extract": "rostral.stages.json_extract:JsonExtractStage",
+    "dedup": "rostral.stages.dedup:DedupStage",
+    "snapshot": "rostral.stages.snapshot:SnapshotStage",
+    "event_json": "rostral.stages.event_json:EventJsonStage",
+    "download": "rostral.stages.download:DownloadStage",
+    "event_html": "rostral.stages.event_html:EventHTMLStage",
+    "processing": "rostral.stages.processing:ProcessingStage",
+    "normalize": "rostral.stages.normalize:NormalizeStage",
+    "gpt": "rostral.stages.gpt:GPTStage",
+    "alert": "rostral.stages.alert:AlertStage",
+}
+
+
+def load_stage(name: str):
+    """Возвращает класс стадии по имени из STAGE_REGISTRY, импортируя модуль по требованию"""
+    try:
+        target = STAGE_REGISTRY[name]
+    except KeyError:
+        raise ValueError(f"Unknown pipeline stage: {name}") from None
+
+    module_path, _, class_name = target.partition(":")
+    module = importlib.import_module(module_path)
+    return getattr(module, class_name)
@@ -1,19 +1,19 @@
-import os
-from colorama import Fore, Style
+import logging
 from datetime import datetime
-from jinja2 import Template
 from typing import Dict, Any
-from .base import PipelineStage
-from rostral.db import is_known_by_hash, save_event
+from .base import PipelineStage, compile_jinja
+from rostral.db import save_event
+from rostral.snapshots import save_snapshots
+from rostral.stages.dedup import MAX_EVENTS_PER_TEMPLATE
 
-MAX_EVENTS_PER_TEMPLATE = int(os.getenv("MAX_EVENTS_PER_TEMPLATE", 10))
+logger = logging.getLogger(__name__)
 
 class AlertStage(PipelineStage):
+    consumes = ("gpt_responses", "snapshot_updates")
+
     def run(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        print(f"\n{Fore.YELLOW}⏳ Starting AlertStage{Style.RESET_ALL}")
-        
         if not hasattr(self.config, 'alert'):
-            print(f"{Fore.RED}⚠️ No alert config found{Style.RESET_ALL}")
+            logger.warning("⚠️ No alert config found")
             return {"alert": {"error": "No alert config"}}
 
 
@@ -27,15 +27,16 @@ class AlertStage(PipelineStage):
                             item['gpt'] = data['gpt_responses'].get(doc_id, {})
 
         # Рендерим алерты
-        print(f"🔍 Stages count in AlertStage: {len(data.get('events', []))}")
+        logger.debug(f"🔍 Events count in AlertStage: {len(data.get('events', []))}")
         rendered_alerts = {}
+        failed = False
         for template_name, template_str in self.config.alert.templates.items():
             try:
                 context = {
                     'now': datetime.now(),
                     **data
                 }
-                template = Template(template_str)
+                template = compile_jinja(template_str)
                 rendered = template.render(**context)
                 rendered_alerts[template_name] = rendered
                 
@@ -45,40 +46,34 @@ class AlertStage(PipelineStage):
             except Exception as e:
                 error_msg = f"Rendering error '{template_name}': {str(e)}"
                 rendered_alerts[template_name] = error_msg
-                print(f"{Fore.RED}❌ {error_msg}{Style.RESET_ALL}")
+                failed = True
+                logger.error(f"❌ {error_msg}")
+
+        if self.dry_run:
+            logger.info("📝 Dry-run: events are not saved")
+            return {"alert": rendered_alerts}
 
-        print(f"{Fore.GREEN}✅ AlertStage finished{Style.RESET_ALL}")
-        
+        # Снимки track: сохраняются только после того, как об изменениях оповестили.
+        # Если алерт не отрендерился, изменения останутся изменениями и в следующем запуске
+        if failed and data.get("snapshot_updates"):
+            logger.warning("⚠️ Alert rendering failed: snapshots are not saved")
+        else:
+            save_snapshots(self.config.template_name, data.get("snapshot_updates"))
         if "events" in data and isinstance(data["events"], list):
             events_to_save = data["events"][:MAX_EVENTS_PER_TEMPLATE]
             for record in events_to_save:
-                if is_known_by_hash(record):
-                    record["status"] = "skipped"
+                if not isinstance(record, dict) or not record.get("url"):
                     continue
-                if isinstance(record, dict) and "url" in record:
-                    template_name = record.get("template_name", self.config.template_name)
-                    record["template_name"] = template_name
-                    save_event(record, config=self.config)
-                    print(f"{Fore.BLUE}💾 Event saved: {record['url']}{Style.RESET_ALL}")
+                record["template_name"] = record.get("template_name", self.config.template_name)
+                # save_event сам отбрасывает известные события (по URL и хэшу)
+                if save_event(record, config=self.config):
+                    logger.info(f"💾 Event saved: {record['url']}")
+                else:
+                    record["status"] = "skipped"
         return {"alert": rendered_alerts}
 
     def _print_alert(self, content: str, alert_name: str):
-        """Форматированный вывод алерта в консоль"""
-        print(f"\n{Fore.CYAN}🔔 {alert_name.upper()} {Style.RESET_ALL}")
-        print(f"{Fore.BLUE}{'-'*50}{Style.RESET_ALL}")
-        
-        # Разбиваем на строки и выводим с отступами
-        for line in content.split('\n'):
-            if line.strip():  # Пропускаем пустые строки
-                if line.startswith('==='):
-                    print(f"{Fore.YELLOW}{line}{Style.RESET_ALL}")
-                elif any(line.lstrip().startswith(x) for x in ['-', '•', '*']):
-                    print(f"  {Fore.GREEN}{line.lstrip()}{Style.RESET_ALL}")
-                    print(f"{Fore.MAGENTA}Event already in the database, skipping saving{Style.RESET_ALL}")
-                elif ':' in line:
-                    key, val = line.split(':', 1)
-                    print(f"{Fore.MAGENTA}{key}:{Style.RESET_ALL}{val}")
-                else:
-                    print(line)
-        
-        print(f"{Fore.BLUE}{'-'*50}{Style.RESET_ALL}")
\ No newline at end of file
+        """Выводит отрендеренный алерт в лог одним сообщением"""
+        lines = [line for line in content.split('\n') if line.strip()]  # Пропускаем пустые строки
+        separator = '-' * 50
+        logger.info("\n".join([f"🔔 {alert_name.upper()}", separator, *lines, separator]))
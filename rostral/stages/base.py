@@ -1,9 +1,21 @@
 # rostral/stages/base.py
 
 from abc import ABC, abstractmethod
+from functools import lru_cache
 from jinja2 import Environment, BaseLoader
 from datetime import datetime
 
+# Общее окружение Jinja2 с функцией now(): шаблоны компилируются один раз на процесс
+JINJA_ENV = Environment(loader=BaseLoader())
+JINJA_ENV.globals["now"] = datetime.now
+
+
+@lru_cache(maxsize=1024)
+def compile_jinja(source: str):
+    """Компилирует строку-шаблон Jinja2 (url, transform, prompt, alert) с кэшем"""
+    return JINJA_ENV.from_string(source)
+
+
 class PipelineStage(ABC):
     """
     Abstract base class for all pipeline stages.
@@ -11,11 +23,27 @@ class PipelineStage(ABC):
     Contains helper methods for Jinja2 rendering.
     """
 
+    # Выставляется PipelineRunner.run: в dry-run стадии не пишут результаты в базу
+    dry_run = False
+
+    # Жизненный цикл промежуточных данных: produces — что стадия кладёт в контекст,
+    # consumes — что из этого читает. PipelineRunner удаляет поле после последнего
+    # потребителя (или сразу, если потребителя в конвейере нет). Поля записей
+    # блоков — с префиксом "record.", например "record.file_content".
+    produces: tuple = ()
+    consumes: tuple = ()
+
+    # Стадия обрабатывает записи по отдельности и может их отсеивать (загрузка,
+    # разбор PDF, фильтры): PipelineRunner прогоняет такие стадии пачками, пока
+    # не наберётся MAX_EVENTS_PER_TEMPLATE записей
+    per_record = False
+
     def __init__(self, config):
         self.config = config
-        # Настраиваем окружение Jinja2 с функцией now()
-        self.env = Environment(loader=BaseLoader())
-        self.env.globals["now"] = datetime.now
+        self.env = JINJA_ENV
+
+    def reset(self) -> None:
+        """Сбрасывает состояние стадии перед запуском конвейера (run может вызываться пачками)"""
 
     @abstractmethod
     def run(self, data):
@@ -31,8 +59,7 @@ class PipelineStage(ABC):
         Рендерит Jinja2-шаблон строки (обычно URL),
         подставляя в него now() и другие глобальные функции.
         """
-        tmpl = self.env.from_string(template_str)
-        return tmpl.render()
+        return compile_jinja(template_str).render()
 
     def render_payload(self, payload_template: dict) -> dict:
         """
@@ -41,7 +68,13 @@ class PipelineStage(ABC):
         rendered = {}
         for k, v in payload_template.items():
             if isinstance(v, str):
-                rendered[k] = self.env.from_string(v).render()
+                rendered[k] = compile_jinja(v).render()
             else:
                 rendered[k] = v
         return rendered
+
+    def render_transform(self, template_str: str, value: str) -> str:
+        """
+        Рендерит transform поля извлечения: исходное значение доступно как {{ value }}.
+        """
+        return compile_jinja(template_str).render(value=value)
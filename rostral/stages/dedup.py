@@ -0,0 +1,76 @@
+# rostral/stages/dedup.py
+
+import os
+import logging
+from typing import Any, Dict
+from .base import PipelineStage
+from rostral.db import get_event_hash, known_hashes, known_urls
+from rostral.stages.incremental import record_urls
+
+logger = logging.getLogger(__name__)
+
+MAX_EVENTS_PER_TEMPLATE = int(os.getenv("MAX_EVENTS_PER_TEMPLATE", 10))
+
+
+def limit_is_deferred(config) -> bool:
+    """
+    Записи отсеиваются и после загрузки (разбор PDF, фильтры normalize): тогда
+    лимит применяет PipelineRunner, прогоняя эти стадии пачками, а не DedupStage
+    """
+    return bool(config.processing or config.normalize)
+
+
+class DedupStage(PipelineStage):
+    """
+    Ранняя дедупликация сразу после извлечения.
+    Отбрасывает записи без URL, повторы внутри запуска и уже сохранённые
+    события (по URL и по хэшу url+title — двумя запросами на весь запуск),
+    затем обрезает блоки до MAX_EVENTS_PER_TEMPLATE. Если записи отсеиваются
+    и дальше, лимит набирается пачками в PipelineRunner. Загрузка, OCR и GPT
+    тратятся только на записи, которые будут сохранены.
+    """
+
+    def run(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(data, dict):
+            return data
+
+        blocks = {name: items for name, items in data.items() if isinstance(items, list)}
+        records = [r for items in blocks.values() for r in items if isinstance(r, dict) and r.get("url")]
+        for record in records:
+            record["event_id"] = get_event_hash(record)
+
+        known = known_urls(u for r in records for u in record_urls(r))
+        known |= known_hashes(r["event_id"] for r in records)
+
+        # ProcessingStage (не PDF, ошибка разбора, почти-дубликат) и фильтры normalize
+        # отбрасывают записи позже: обрезав заранее, запуск сохранил бы меньше лимита
+        cap = None if limit_is_deferred(self.config) else MAX_EVENTS_PER_TEMPLATE
+
+        stats = {"known": 0, "duplicates": 0, "no_url": 0, "over_limit": 0}
+        seen = set()
+        for block_name, items in blocks.items():
+            kept = []
+            for record in items:
+                if not isinstance(record, dict) or not record.get("url"):
+                    stats["no_url"] += 1
+                    continue
+
+                keys = [*record_urls(record), record["event_id"]]
+                if any(key in known for key in keys):
+                    stats["known"] += 1
+                elif any(key in seen for key in keys):
+                    stats["duplicates"] += 1
+                elif cap is not None and len(kept) >= cap:
+                    stats["over_limit"] += 1
+                else:
+                    kept.append(record)
+                seen.update(keys)
+
+            data[block_name] = kept
+
+        kept_total = sum(len(data[name]) for name in blocks)
+        logger.info(
+            f"🧹 Dedup: kept={kept_total}, known={stats['known']}, duplicates={stats['duplicates']}, "
+            f"without url={stats['no_url']}, over limit={stats['over_limit']}"
+        )
+        return data
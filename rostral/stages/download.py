@@ -1,21 +1,37 @@
 import requests
-import time
-import typer
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
 from typing import Optional, Dict, Any
 from tqdm import tqdm
 from .base import PipelineStage
 from rostral.models import DownloadConfig
-from rostral.stages.transforms import transform_smart_url
-from rostral.db import is_known_by_hash, get_event_hash
-from rostral.db import is_known_by_url 
+from rostral.stages.transforms import transform_smart_url, is_yandex_disk_url, resolve_yandex_links
+from rostral.cache import cache_stats
+from rostral import http_client
+from rostral.politeness import HostScheduler, parse_retry_after
+
+logger = logging.getLogger(__name__)
 
 class DownloadStage(PipelineStage):
+    produces = ("record.file_content",)
+    per_record = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        download = self.config.download
         self.max_retries = 3
-        self.retry_delay = 2
+        self.retry_delay = 2  # базовая пауза backoff для хоста после неудачи
         self.chunk_size = 1024 * 1024  # 1MB chunks
+        self.workers = max(1, download.workers)
+        self.scheduler = HostScheduler(
+            min_interval=download.min_interval,
+            max_concurrency=download.max_per_host,
+            hosts={host: policy.model_dump(exclude_none=True) for host, policy in download.hosts.items()},
+            respect_robots=download.respect_robots,
+            verify_ssl=getattr(self.config.source.fetch, "verify_ssl", True),
+            headers=self.config.source.fetch.headers or {},
+        )
 
     def _is_pdf_url(self, url: str) -> bool:
         parsed = urlparse(url.lower())
@@ -27,18 +43,21 @@ class DownloadStage(PipelineStage):
         return False
 
     def _download_file(self, url: str, verify_ssl: bool) -> Optional[bytes]:
-        """Загружает файл с обработкой ошибок"""
-        time.sleep(0.5)
+        """Загружает файл с обработкой ошибок; очередь и паузы — по хосту через HostScheduler"""
         source = self.config.source
         headers = source.fetch.headers or {}
         try:
-            with requests.get(
+            with self.scheduler.slot(url), http_client.get(
                 url,
                 stream=True,
                 timeout=self.config.download.timeout,
                 verify=verify_ssl,
                 headers=headers
             ) as response:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after is not None and response.status_code in (429, 503):
+                    logger.warning(f"⏸ {response.status_code} from server, Retry-After {retry_after:.0f}s → {url}")
+                    self.scheduler.defer(url, retry_after)
                 response.raise_for_status()
                 
                 content = bytearray()
@@ -47,16 +66,16 @@ class DownloadStage(PipelineStage):
                         content.extend(chunk)
                 
                 if not content:
-                    typer.echo("⚠️ Empty file loaded")
+                    logger.warning("⚠️ Empty file loaded")
                     return None
                     
                 return bytes(content)
                 
         except requests.exceptions.SSLError:
-            typer.echo("⚠️ SSL error, now attemt without verification")
+            logger.warning("⚠️ SSL error, now attemt without verification")
             return self._download_file(url, verify_ssl=False)
         except Exception as e:
-            typer.echo(f"❌ Loading error: {e}")
+            logger.error(f"❌ Loading error: {e}")
             return None
 
     def _process_record(self, record: Dict[str, Any], verify_ssl: bool) -> bool:
@@ -75,12 +94,12 @@ class DownloadStage(PipelineStage):
 
         # Проверяем, нужно ли загружать
         if not self._is_pdf_url(transformed_url):
-            typer.echo(f"⏭️ Skipped: URL was not recognized as PDF ({transformed_url})")
+            logger.debug(f"⏭️ Skipped: URL was not recognized as PDF ({transformed_url})")
             return False
 
         # Пытаемся загрузить
         for attempt in range(self.max_retries):
-            typer.echo(f"🔄 Attemt {attempt + 1} for {transformed_url}")
+            logger.debug(f"🔄 Attemt {attempt + 1} for {transformed_url}")
             content = self._download_file(transformed_url, verify_ssl)
             
             if content:
@@ -89,10 +108,11 @@ class DownloadStage(PipelineStage):
                     "download_status": "success",
                     "final_url": transformed_url
                 })
-                typer.echo(f"✅ Succesfully loaded {len(content)} bytes")
+                logger.debug(f"✅ Succesfully loaded {len(content)} bytes")
                 return True
-                
-            time.sleep(self.retry_delay)
+
+            # Пауза только для этого хоста: загрузки с других хостов идут дальше
+            self.scheduler.defer(transformed_url, self.retry_delay * 2 ** attempt)
         
         record["download_error"] = f"Cannot download after {self.max_retries} attemts"
         return False
@@ -109,34 +129,38 @@ class DownloadStage(PipelineStage):
                 continue
 
             stats["total"] += len(items)
-            processed_items = []
+            self._prefetch_links(items)
 
-            for record in tqdm(items, desc=f"📥 Downloading [{block_name}]", unit="file"):
+            processed_items = []
+            for record in items:
                 if not isinstance(record, dict):
                     continue
-
-                url = record.get("url_final") or record.get("url")
-                if not url:
-                    typer.echo("⚠️ Event without URL — skipping")
-                    stats["skipped"] += 1
-                    continue
-
-                # ✅ Проверка по URL: если файл уже загружен — не качаем
-                if is_known_by_url(url):
-                    typer.echo(f"⏭️ Skipping: file already loaded → {url}")
-                    record["download_status"] = "skipped"
+                if not (record.get("url_final") or record.get("url")):
+                    logger.warning("⚠️ Event without URL — skipping")
                     stats["skipped"] += 1
                     continue
-
-                # 📦 Пытаемся загрузить
-                if self._process_record(record, verify_ssl):
-                    stats["success"] += 1
-                else:
-                    stats["failed"] += 1
-
                 processed_items.append(record)
 
+            # 📦 Загружаем параллельно; очередность и паузы по хостам держит планировщик
+            with ThreadPoolExecutor(max_workers=self.workers) as executor, \
+                    tqdm(total=len(processed_items), desc=f"📥 Downloading [{block_name}]", unit="file") as progress:
+                futures = [executor.submit(self._process_record, record, verify_ssl) for record in processed_items]
+                for future in as_completed(futures):
+                    stats["success" if future.result() else "failed"] += 1
+                    progress.update()
+
             data[block_name] = processed_items
 
-        typer.echo(f"\n📊 Download summary: loaded={stats['success']}, skipped={stats['skipped']}, errors={stats['failed']}, total={stats['total']}")
-        return data
\ No newline at end of file
+        logger.info(f"📊 Download summary: loaded={stats['success']}, skipped={stats['skipped']}, errors={stats['failed']}, total={stats['total']}")
+        if "yandex_disk" in cache_stats():
+            logger.info(f"🗃 Yandex link cache: {cache_stats()['yandex_disk']}")
+        return data
+
+    def _prefetch_links(self, items) -> None:
+        """Разрешает ссылки Яндекс.Диска блока разом и параллельно (результаты ложатся в кэш)"""
+        urls = [
+            url for url in ((r.get("url_final") or r.get("url")) for r in items if isinstance(r, dict))
+            if is_yandex_disk_url(url)
+        ]
+        if urls:
+            resolve_yandex_links(urls, template_name=self.config.template_name)
\ No newline at end of file
@@ -1,9 +1,15 @@
-import requests
+from rostral import http_client
 from bs4 import BeautifulSoup
 from .base import PipelineStage
-import typer
+import logging
+
+logger = logging.getLogger(__name__)
 
 class EventHTMLStage(PipelineStage):
+    # page_text копируется в text, дальше нужен только самой стадии
+    produces = ("record.page_text",)
+    per_record = True
+
     def run(self, data):
         if not isinstance(data, dict):
             return data
@@ -21,8 +27,8 @@ class EventHTMLStage(PipelineStage):
                     continue  # Пропускаем, если уже есть текст
 
                 try:
-                    typer.echo(f"🌐 EventHTMLStage: loadind {url}")
-                    response = requests.get(url, headers=headers, verify=verify_ssl, timeout=10)
+                    logger.debug(f"🌐 EventHTMLStage: loading {url}")
+                    response = http_client.get(url, headers=headers, verify=verify_ssl, timeout=10)
                     response.raise_for_status()
 
                     soup = BeautifulSoup(response.text, "html.parser")
@@ -39,15 +45,15 @@ class EventHTMLStage(PipelineStage):
                     if text and len(text) > 50:
                         record["page_text"] = text
                         record["download_status"] = "html_success"
-                        typer.echo(f"✅ Extracted {len(text)} HTML symbols")
+                        logger.debug(f"✅ Extracted {len(text)} HTML symbols")
                         record["text"] = record.get("text") or record.get("page_text") or record.get("doc_text")
                     else:
                         record["download_status"] = "html_empty"
-                        typer.echo("⚠️ We've got empty or too short HTML response")
+                        logger.warning(f"⚠️ We've got empty or too short HTML response: {url}")
 
                 except Exception as e:
                     record["download_status"] = "html_error"
                     record["page_text"] = None
-                    typer.echo(f"❌ Error loading HTML: {e}")
+                    logger.error(f"❌ Error loading HTML {url}: {e}")
 
         return data
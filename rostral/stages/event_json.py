@@ -1,14 +1,17 @@
 # rostral/stages/event_json.py
 
-import requests
+from rostral import http_client
 import json
-import typer
+import logging
 from .base import PipelineStage
 from typing import Dict, Any
 
+logger = logging.getLogger(__name__)
+
 class EventJsonStage(PipelineStage):
     """Стадия для загрузки и обновления JSON-данных событий"""
-    
+    per_record = True
+
     def run(self, data: Dict[str, Any]) -> Dict[str, Any]:
         if not isinstance(data, dict):
             return data
@@ -27,8 +30,8 @@ class EventJsonStage(PipelineStage):
                     continue
 
                 try:
-                    typer.echo(f"🌐 Loading details from {url}")
-                    response = requests.get(
+                    logger.debug(f"🌐 Loading details from {url}")
+                    response = http_client.get(
                         url,
                         headers=headers,
                         verify=verify_ssl,
@@ -40,21 +43,21 @@ class EventJsonStage(PipelineStage):
                     
                     if json_data:
                         
-                        # Полностью перезаписываем поле text новыми данными
-                        record["text"] = json.dumps(json_data, ensure_ascii=False, indent=2)
+                        # Полностью перезаписываем поле text новыми данными (компактный JSON: текст сохраняется в БД)
+                        record["text"] = json.dumps(json_data, ensure_ascii=False, separators=(",", ":"))
                         record["download_status"] = "json_success"
                         
                        
-                        typer.echo(f"✅ Event text updated")
+                        logger.debug("✅ Event text updated")
                     else:
                         record["download_status"] = "json_empty"
-                        typer.echo("⚠️ Empty JSON response")
+                        logger.warning(f"⚠️ Empty JSON response: {url}")
 
                 except json.JSONDecodeError:
                     record["download_status"] = "json_invalid"
-                    typer.echo("❌ Invalid JSON answer")
+                    logger.error(f"❌ Invalid JSON answer: {url}")
                 except Exception as e:
                     record["download_status"] = "json_error"
-                    typer.echo(f"❌ JSON loading error: {e}")
+                    logger.error(f"❌ JSON loading error {url}: {e}")
 
         return data
\ No newline at end of file
@@ -1,72 +1,206 @@
-from bs4 import BeautifulSoup
-import typer
+import logging
+from typing import Iterator, Optional
 from urllib.parse import urljoin
 from .base import PipelineStage
 from rostral.models import ExtractFieldConfig
-from rostral.stages.transforms import TRANSFORM_REGISTRY
-from rostral.db import is_known_by_hash, get_event_hash
+from rostral.stages.transforms import TRANSFORM_REGISTRY, BATCH_TRANSFORM_REGISTRY
+from rostral.stages.selectors import compile_selector, element_text, select_blocks
+from rostral.stages.feeds import open_feed, iter_feed_items, local_name, find_child, node_text
+from rostral.stages.pagination import extract_pages
+from rostral.stages.incremental import BATCH_SIZE, KnownTracker
+
+logger = logging.getLogger(__name__)
 
 class ExtractStage(PipelineStage):
+    consumes = ("html", "xml", "xml_stream", "pages")
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.is_rss = config.source.type == "rss"
+        # CSS-селекторы компилируются один раз на шаблон, а не на каждый запуск
+        self.selectors = {}
+        if not self.is_rss:
+            self.selectors = {
+                block_name: compile_selector(block_cfg.selector)
+                for block_name, block_cfg in (config.extract or {}).items()
+            }
+
     def run(self, data):
-        seen_urls = set()
+        # Блоки с stop_after_known работают инкрементально: известные записи
+        # отбрасываются сразу, чтение прекращается после N известных подряд
+        tracker = KnownTracker(self.config.extract or {})
+
+        if self.is_rss and (data.get("xml_stream") or data.get("xml")):
+            return self._extract_feed(data.get("xml_stream") or data.get("xml"), tracker)
+
+        if data.get("pages") is not None:
+            # Повторы между страницами отбрасывает extract_pages: страница из одних
+            # повторов не должна выглядеть пустой и останавливать обход
+            pagination = self.config.source.pagination
+            return extract_pages(
+                data["pages"],
+                lambda page: self._extract_html(page, set()),
+                self.config.extract or {},
+                stop_when_known=bool(pagination and pagination.stop_when_known),
+                tracker=tracker,
+            )
+
         html_input = data.get("html") or data.get("xml")
-        
-        if not html_input: 
-            typer.echo("⚠️ ExtractStage: no HTML or XML found in input")
+
+        if not html_input:
+            logger.warning("⚠️ ExtractStage: no HTML or XML found in input")
             return {}
 
-        is_rss = self.config.source.type == "rss"
-        parser_type = "lxml-xml" if is_rss else "html.parser"
-        soup = BeautifulSoup(html_input, parser_type)
-        base_url = self.config.source.url
+        return self._extract_html(html_input, set(), tracker)
 
-        result = {}
+    def _extract_html(self, html_input, seen_urls: set, tracker: Optional[KnownTracker] = None) -> dict:
+        """
+        Выбирает блоки из одного HTML-документа и собирает записи.
+        С tracker записи блоков с stop_after_known собираются пачками и сверяются
+        с базой по ходу: после порога остальные элементы не обрабатываются.
+        """
+        limits = {name: cfg.limit for name, cfg in (self.config.extract or {}).items()}
+        blocks = select_blocks(html_input, self.selectors, limits)
 
+        result = {}
         for block_name, block_cfg in (self.config.extract or {}).items():
-            elements = soup.find_all(block_cfg.selector) if is_rss else soup.select(block_cfg.selector)
-            elements = elements[:block_cfg.limit] if block_cfg.limit else elements
-
-            items = []
-            for el in elements:
-                record = {}
-                for field_name, rule in block_cfg.fields.items():
-                    try:
-                        # Существующая HTML-логика
-                        if isinstance(rule, str) and rule == "self":
-                            value = el.get_text(strip=True)
-                        
-                        elif isinstance(rule, ExtractFieldConfig):
-                            if is_rss:
-                                tag = el.find(rule.attr) if rule.attr else el
-                                raw = tag.text.strip() if tag else ""
-                            else:
-                                raw = el.get(rule.attr, "").strip()
-                            
-                            value = raw
-                            if rule.transform:
-                                value = self.render_transform(rule.transform, raw)
-                            if rule.transform_type:
-                                fn = TRANSFORM_REGISTRY.get(rule.transform_type)
-                                value = fn(raw, template_name=self.config.template_name, base_url=base_url)
-                        
-                        record[field_name] = value
-
-                    except Exception as e:
-                        typer.echo(f"❌ Error extracting {field_name}: {str(e)}")
-                        record[field_name] = ""
-
-                # Существующая логика обогащения
-                full_url = urljoin(base_url, record.get("url", ""))
-                record["url_final"] = full_url
-                
-                if not record.get("title"):
-                    continue
-                if full_url in seen_urls:
-                    continue
-                    
-                seen_urls.add(full_url)
-                items.append(record)
-
-            result[block_name] = items
-        
-        return result
\ No newline at end of file
+            records = self._iter_block_records(blocks.get(block_name, []), block_cfg, seen_urls)
+            if tracker is not None:
+                records = tracker.filter_iter(block_name, records)
+            result[block_name] = list(records)
+        return result
+
+    def _iter_block_records(self, elements: list, block_cfg, seen_urls: set) -> Iterator[dict]:
+        """
+        Записи блока пачками по BATCH_SIZE: трансформации с пакетным вариантом
+        (ссылки Яндекс.Диска) выполняются для пачки разом после сборки записей
+        """
+        batch_fields = self._batch_fields(block_cfg)
+        for start in range(0, len(elements), BATCH_SIZE):
+            records = [self._build_record(el, block_cfg, deferred=batch_fields)
+                       for el in elements[start:start + BATCH_SIZE]]
+            self._apply_batch_transforms(records, batch_fields)
+            yield from (r for r in records if self._accept(r, seen_urls))
+
+    def _extract_feed(self, source, tracker: KnownTracker) -> dict:
+        """
+        Потоковое извлечение из RSS/Atom: элементы обрабатываются по мере чтения,
+        чтение прекращается, когда каждый блок набрал limit или встретил
+        stop_after_known известных записей подряд.
+        """
+        blocks = self.config.extract or {}
+        result = {name: [] for name in blocks}
+        pending = {name: [] for name in blocks}  # записи, ждущие сверки с базой одной пачкой
+        matched = {name: 0 for name in blocks}
+        done = set()
+        seen_urls = set()
+
+        def flush(block_name: str) -> None:
+            result[block_name].extend(tracker.filter(block_name, pending[block_name]))
+            pending[block_name] = []
+            if block_name in tracker.done:
+                done.add(block_name)
+
+        stream = open_feed(getattr(source, "raw", source))
+        try:
+            for el in iter_feed_items(stream, [cfg.selector for cfg in blocks.values()]):
+                tag = local_name(el.tag)
+                for block_name, block_cfg in blocks.items():
+                    if block_name in done or local_name(block_cfg.selector) != tag:
+                        continue
+
+                    matched[block_name] += 1
+                    record = self._build_record(el, block_cfg)
+                    if self._accept(record, seen_urls):
+                        if tracker.enabled(block_name):
+                            pending[block_name].append(record)
+                            if len(pending[block_name]) >= BATCH_SIZE:
+                                flush(block_name)
+                        else:
+                            result[block_name].append(record)
+
+                    if block_cfg.limit and matched[block_name] >= block_cfg.limit:
+                        done.add(block_name)
+
+                if len(done) == len(blocks):
+                    break
+            for block_name in blocks:
+                if pending[block_name] and block_name not in tracker.done:
+                    flush(block_name)
+        finally:
+            if hasattr(source, "close"):
+                source.close()
+
+        logger.info(f"📰 Feed items read: {sum(matched.values())}")
+        return result
+
+    @staticmethod
+    def _batch_fields(block_cfg) -> dict:
+        """Поля блока, чью трансформацию можно выполнить пакетно: {поле: transform_type}"""
+        return {
+            name: rule.transform_type for name, rule in block_cfg.fields.items()
+            if isinstance(rule, ExtractFieldConfig) and rule.transform_type in BATCH_TRANSFORM_REGISTRY
+        }
+
+    def _apply_batch_transforms(self, records: list, batch_fields: dict) -> None:
+        base_url = self.config.source.url
+        for field_name, transform_type in batch_fields.items():
+            try:
+                mapping = BATCH_TRANSFORM_REGISTRY[transform_type](
+                    [r.get(field_name) for r in records],
+                    template_name=self.config.template_name, base_url=base_url
+                )
+            except Exception as e:
+                logger.error(f"❌ Error in batch transform {transform_type} for {field_name}: {str(e)}")
+                continue
+            for record in records:
+                record[field_name] = mapping.get(record.get(field_name), record.get(field_name) or "")
+
+        if "url" in batch_fields:
+            for record in records:
+                record["url_final"] = urljoin(base_url, record.get("url", ""))
+
+    def _build_record(self, el, block_cfg, deferred=()) -> dict:
+        """Собирает запись по fields/attr/transform; поля из deferred остаются сырыми"""
+        base_url = self.config.source.url
+        record = {}
+
+        for field_name, rule in block_cfg.fields.items():
+            try:
+                value = ""
+                if isinstance(rule, str) and rule == "self":
+                    value = element_text(el)
+
+                elif isinstance(rule, ExtractFieldConfig):
+                    if self.is_rss:
+                        tag = find_child(el, rule.attr)
+                        raw = node_text(tag) if tag is not None else ""
+                    else:
+                        raw = (el.get(rule.attr) or "").strip() if rule.attr else ""
+
+                    value = raw
+                    if rule.transform:
+                        value = self.render_transform(rule.transform, raw)
+                    if rule.transform_type and field_name not in deferred:
+                        fn = TRANSFORM_REGISTRY.get(rule.transform_type)
+                        value = fn(raw, template_name=self.config.template_name, base_url=base_url)
+
+                record[field_name] = value
+
+            except Exception as e:
+                logger.error(f"❌ Error extracting {field_name}: {str(e)}")
+                record[field_name] = ""
+
+        # Существующая логика обогащения
+        record["url_final"] = urljoin(base_url, record.get("url", ""))
+        return record
+
+    @staticmethod
+    def _accept(record: dict, seen_urls: set) -> bool:
+        """Отбрасывает записи без заголовка и повторы по url_final"""
+        if not record.get("title"):
+            return False
+        if record["url_final"] in seen_urls:
+            return False
+        seen_urls.add(record["url_final"])
+        return True
@@ -0,0 +1,65 @@
+# rostral/stages/feeds.py
+
+"""
+Потоковый разбор RSS/Atom.
+
+Элементы ленты читаются через iterparse прямо из HTTP-потока и отдаются
+по одному; после обработки элемент и уже разобранные соседи удаляются
+из дерева, поэтому память не растёт с размером ленты. Потребитель может
+прекратить чтение в любой момент (limit, известная запись).
+"""
+
+import re
+from io import BytesIO
+from typing import Iterable, Iterator, Optional, Union
+
+from lxml import etree
+
+_XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>")
+
+
+def local_name(tag: str) -> str:
+    """'{ns}entry' или 'atom:entry' → 'entry'"""
+    return tag.rsplit("}", 1)[-1].rsplit(":", 1)[-1]
+
+
+def open_feed(source: Union[str, bytes, object]):
+    """Превращает строку/байты в файловый объект; потоки возвращаются как есть"""
+    if isinstance(source, str):
+        # Строка уже декодирована: объявление кодировки в прологе только помешает
+        return BytesIO(_XML_DECLARATION.sub("", source, count=1).encode("utf-8"))
+    if isinstance(source, bytes):
+        return BytesIO(source)
+    return source
+
+
+def iter_feed_items(stream, tags: Iterable[str]) -> Iterator:
+    """
+    Отдаёт элементы с указанными локальными именами (без учёта пространства имён)
+    по мере разбора потока. Элемент валиден только до следующей итерации.
+    """
+    wanted = [f"{{*}}{local_name(tag)}" for tag in set(tags)]
+    events = etree.iterparse(
+        stream, events=("end",), tag=wanted, recover=True, huge_tree=True, resolve_entities=False
+    )
+    for _, element in events:
+        yield element
+
+        # Освобождаем разобранное: сам элемент и всё, что было до него
+        element.clear(keep_tail=False)
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+
+def find_child(element, name: Optional[str]):
+    """Первый потомок с данным локальным именем (аналог BeautifulSoup.find)"""
+    if not name:
+        return element
+    return element.find(f".//{{*}}{local_name(name)}")
+
+
+def node_text(element) -> str:
+    """Весь текст элемента и потомков, обрезанный по краям (аналог tag.text.strip())"""
+    return "".join(element.itertext()).strip()
@@ -1,15 +1,20 @@
 # rostral/stages/fetch.py
 
-import typer
-import requests
+import logging
+from rostral import http_client
 import urllib3
 from .base import PipelineStage   
+from .pagination import PageStream
+
+logger = logging.getLogger(__name__)
 
 # опционально, чтобы не видеть InsecureRequestWarning
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
 class FetchStage(PipelineStage):
+    produces = ("html", "xml", "xml_stream", "json", "json_stream", "pages")
+
     def run(self, data):
         source = self.config.source
         url = self.render_url(source.url)
@@ -17,21 +22,51 @@ class FetchStage(PipelineStage):
         headers = source.fetch.headers or {}
         verify = getattr(source.fetch, "verify_ssl", True)
 
-        typer.echo(f"🔗 FetchStage: GET {url}  (verify_ssl={verify})")
-        response = requests.get(
+        if (source.pagination or source.endpoints) and source.type in ("html", "json"):
+            # Страницы загружаются лениво: стадия извлечения читает их по мере
+            # готовности и может остановить обход
+            logger.info(f"🔗 FetchStage: paginated GET {url}")
+            return {"pages": PageStream(url, source, self._fetch_page, render=self.render_url)}
+
+        # Ленты (и JSON при fetch.stream) не читаются целиком:
+        # стадия извлечения разбирает поток по мере загрузки
+        stream = source.type == "rss" or (source.type == "json" and source.fetch.stream)
+
+        logger.info(f"🔗 FetchStage: GET {url}  (verify_ssl={verify})")
+        response = http_client.get(
             url,
             headers=headers,
             timeout=source.fetch.timeout,
-            verify=verify
+            verify=verify,
+            stream=stream
         )
-        typer.echo(f"📥 FetchStage answer: status {response.status_code}")
+        logger.info(f"📥 FetchStage answer: status {response.status_code}")
+        if not response.ok:
+            response.close()
         response.raise_for_status()
 
         if source.type == "html":
             return {"html": response.text}
         elif source.type == "rss":
-            return {"xml": response.text}
+            response.raw.decode_content = True  # gzip/deflate распаковываются на лету
+            return {"xml_stream": response}
         elif source.type == "json":
+            if stream:
+                response.raw.decode_content = True
+                return {"json_stream": response}
             return {"json": response.json()}
         else:
             raise ValueError(f"Unsupported source type: {source.type}")
+
+    def _fetch_page(self, url: str):
+        """Загружает одну страницу: текст для html, разобранный объект для json"""
+        fetch = self.config.source.fetch
+        response = http_client.get(
+            url,
+            headers=fetch.headers or {},
+            timeout=fetch.timeout,
+            verify=getattr(fetch, "verify_ssl", True)
+        )
+        logger.debug(f"📥 Page {url}: status {response.status_code}")
+        response.raise_for_status()
+        return response.json() if self.config.source.type == "json" else response.text
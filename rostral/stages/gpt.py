@@ -1,29 +1,51 @@
 import os
 import re
+import logging
 from pathlib import Path
 from datetime import datetime
-from jinja2 import Template
-from .base import PipelineStage
+from .base import PipelineStage, compile_jinja
 from typing import Dict, Any, Optional
+from rostral.log import DEBUG_PAYLOADS
+from rostral.db import gpt_texts_for
+from rostral import http_client
 
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 TEXT_MAX_LENGTH = os.getenv("TEXT_MAX_LENGTH")
 
-try:
-    from gpt4all import GPT4All
-    gpt4all_model_path = str(Path(os.getenv("GPT4ALL_MODEL_PATH")).absolute())
-    gpt4all_model_name = os.getenv("GPT4ALL_MODEL_NAME")
-    gpt4all_model = GPT4All(model_name=gpt4all_model_name, model_path=gpt4all_model_path, allow_download=False) if gpt4all_model_name else None
-except ImportError:
-    gpt4all_model = None
+gpt4all_model_path = None
+_backends = None
+
+
+def _load_backends():
+    """
+    Лениво загружает GPT-бэкенды при первом запросе к модели.
+    Импорт gpt4all/openai и загрузка модели стоят секунды, поэтому
+    не выполняются ни при импорте модуля, ни при сборке пайплайна.
+    """
+    global _backends, gpt4all_model_path
+    if _backends is not None:
+        return _backends
+
+    try:
+        from gpt4all import GPT4All
+        gpt4all_model_path = str(Path(os.getenv("GPT4ALL_MODEL_PATH")).absolute())
+        gpt4all_model_name = os.getenv("GPT4ALL_MODEL_NAME")
+        gpt4all_model = GPT4All(model_name=gpt4all_model_name, model_path=gpt4all_model_path, allow_download=False) if gpt4all_model_name else None
+    except ImportError:
+        gpt4all_model = None
 
-try:
-    import openai
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-except ImportError:
-    openai = None
+    try:
+        import openai
+        openai.api_key = os.getenv("OPENAI_API_KEY")
+    except ImportError:
+        openai = None
+
+    _backends = (gpt4all_model, openai)
+    return _backends
 
 
 class GPTStage(PipelineStage):
@@ -31,32 +53,41 @@ class GPTStage(PipelineStage):
     GPTStage рендерит prompt и отправляет его в GPT4All (по умолчанию) или OpenAI (фолбэк).
     Ответ очищается от служебных тегов и парсится в структурированный dict.
     """
+    produces = ("gpt_responses",)
 
     def run(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        print("\n" + "="*50)
-        print("🚀 Starting GPTStage for documents array")
-        print("="*50)
-        
         if not hasattr(self.config, "gpt"):
             return data
 
         # Собираем все ответы GPT
         gpt_responses = {}
+
+        # Почти-дубликаты получают ответ оригинала: из БД или из текущего запуска
+        answers = gpt_texts_for(
+            item.get("duplicate_of") for items in data.values() if isinstance(items, list)
+            for item in items if isinstance(item, dict)
+        )
         
         # Обрабатываем все блоки-массивы
         for block_name, items in data.items():
             if not isinstance(items, list):
                 continue
                 
-            print(f"\n🔧 Processing block'{block_name}' ({len(items)} documents)")
+            logger.info(f"🔧 Processing block '{block_name}' ({len(items)} documents)")
             
             for i, item in enumerate(items):
                 if not isinstance(item, dict):
                     continue
                     
-                print(f"\n📄 Document #{i+1}: {item.get('title', 'Unnamed')}")
+                logger.debug(f"📄 Document #{i+1}: {item.get('title', 'Unnamed')}")
                 doc_id = f"{block_name}_{i}"
                 
+                original = item.get("duplicate_of")
+                if original and answers.get(original):
+                    item["gpt_text"] = answers[original]
+                    logger.debug(f"♻️ GPT answer reused from near-duplicate {original}")
+                    continue
+
                 # Получаем текст для обработки
                 text = self._get_single_text(item)
                 if not text:
@@ -69,7 +100,9 @@ class GPTStage(PipelineStage):
                 cleaned_text = self._clean_model_output(response)
                 # Также сохраняем результат в сам документ
                 item["gpt_text"] = self._parse_response(cleaned_text)
-                print(f"📝 GPT answer for save: {item['gpt_text'][:200]}... (length: {len(item['gpt_text'])})")
+                if item.get("event_id"):
+                    answers[item["event_id"]] = item["gpt_text"]
+                logger.debug(f"📝 GPT answer for save: {item['gpt_text'][:200]}... (length: {len(item['gpt_text'])})")
         
         return {
             **data,
@@ -84,7 +117,7 @@ class GPTStage(PipelineStage):
             if text and isinstance(text, str) and text.strip():
                 if len (text) > int(TEXT_MAX_LENGTH):
                     text = text [:int(TEXT_MAX_LENGTH)]
-                    print ("Text trimmered on GPT stage")
+                    logger.debug("Text trimmered on GPT stage")
                 return text.strip()
         return ""    
     
@@ -106,25 +139,34 @@ class GPTStage(PipelineStage):
             **data.get("normalized", {}),
         }
         
-        prompt = Template(prompt_template).render(**context)
-        
-        print("\n🧠 Generated prompt:\n" + "-" * 40)
-        print(prompt[:500] + "..." if len(prompt) > 500 else prompt)
-        print("-" * 40)
-        print(f"prompt length: {len(prompt)} symbols")
+        prompt = compile_jinja(prompt_template).render(**context)
         
-        self._save_debug("prompt", prompt)
+        logger.debug(f"🧠 Generated prompt ({len(prompt)} symbols):\n" + (prompt[:500] + "..." if len(prompt) > 500 else prompt))
+
+        if DEBUG_PAYLOADS:
+            self._save_debug("prompt", prompt)
         return prompt
 
     def _get_gpt_response(self, prompt: str) -> str:
-        """Получает ответ от GPT с обработкой ошибок"""
+        """Получает ответ от GPT; при активной кассете — записывает или берёт из неё по хэшу промпта"""
+        cassette = http_client.active_cassette()
+        if cassette is None:
+            return self._ask_model(prompt)
+        try:
+            return cassette.call("gpt", prompt, lambda: self._ask_model(prompt))
+        except http_client.CassetteMiss as e:
+            logger.warning(f"⚠️ {e}")
+            return ""
+
+    def _ask_model(self, prompt: str) -> str:
+        """Запрос к GPT4All или OpenAI с обработкой ошибок"""
+        gpt4all_model, openai = _load_backends()
         # GPT4All
         if gpt4all_model:
             try:
-                print(f"\n🚀 Using GPT4All: {os.path.basename(gpt4all_model_path)}")
-                response = ""
-                
-                print("📡 Full answer (raw):")
+                logger.debug(f"🚀 Using GPT4All: {os.path.basename(gpt4all_model_path)}")
+                chunks = []
+
                 for chunk in gpt4all_model.generate(
                     prompt,
                     max_tokens=1024,
@@ -133,10 +175,10 @@ class GPTStage(PipelineStage):
                     top_k=30,  
                     top_p=0.8,   
                 ):
-                    print(chunk, end="", flush=True)
-                    response += chunk
-                
-                print("\n" + "-" * 40)
+                    chunks.append(chunk)
+
+                response = "".join(chunks)
+                logger.debug("📡 Full answer (raw):\n" + response)
                 return response
                 
             except Exception as e:
@@ -145,7 +187,7 @@ class GPTStage(PipelineStage):
         # OpenAI fallback
         elif openai and os.getenv("OPENAI_API_KEY"):
             try:
-                print("\n🌐 Using OpenAI: gpt-3.5-turbo")
+                logger.debug("🌐 Using OpenAI: gpt-3.5-turbo")
                 response = openai.ChatCompletion.create(
                     model="gpt-3.5-turbo",
                     messages=[{
@@ -176,9 +218,7 @@ class GPTStage(PipelineStage):
         # Удаляем повторяющиеся переносы строк
         text = re.sub(r'\n{3,}', '\n\n', text)
         
-        print("\n🔧 Cleaned answer:\n" + "-" * 40)
-        print(text[:1000] + "..." if len(text) > 1000 else text)
-        print("-" * 40)
+        logger.debug("🔧 Cleaned answer:\n" + (text[:1000] + "..." if len(text) > 1000 else text))
         
         return text.strip()
 
@@ -213,9 +253,7 @@ class GPTStage(PipelineStage):
 
     def _log_text_source(self, data: Dict[str, Any], selected_text: str) -> None:
         """Логирует источник текста для GPT"""
-        print("\n🔍 GPT text source:")
-        print(f"  - Length: {len(selected_text)} symbols")
-        print(f"  - Example: {selected_text[:200]}...")
+        logger.debug(f"🔍 GPT text source: {len(selected_text)} symbols, example: {selected_text[:200]}...")
 
     def _detect_text_source(self, data: Dict[str, Any], text: str) -> str:
         """Определяет источник текста для метаданных"""
@@ -232,6 +270,7 @@ class GPTStage(PipelineStage):
 
     def _get_model_info(self) -> str:
         """Возвращает информацию о используемой модели"""
+        gpt4all_model, openai = _load_backends()
         if gpt4all_model:
             return f"GPT4All-{os.path.basename(gpt4all_model_path)}"
         elif openai:
@@ -247,4 +286,4 @@ class GPTStage(PipelineStage):
             with open(log_dir / f"{name}_{ts}.txt", "w", encoding="utf-8") as f:
                 f.write(content)
         except Exception as e:
-            print(f"⚠️ Error saving {name}-log: {e}")
\ No newline at end of file
+            logger.warning(f"⚠️ Error saving {name}-log: {e}")
\ No newline at end of file
@@ -0,0 +1,96 @@
+# rostral/stages/incremental.py
+
+"""
+Инкрементальный обход источника.
+
+Листинги отсортированы от новых к старым, поэтому после N подряд
+известных записей (`stop_after_known` блока) дальше читать незачем.
+KnownTracker сверяет записи с базой по мере извлечения (пачками,
+одним запросом), отбрасывает уже известные и сообщает, когда блок
+исчерпан — тогда извлечение и постраничная загрузка прекращаются.
+"""
+
+import logging
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from rostral.db import known_urls
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+
+
+def record_urls(record: dict) -> List[str]:
+    """URL, по которым запись может быть уже сохранена"""
+    return [u for u in (record.get("url"), record.get("url_final")) if u]
+
+
+def lookup_known(records: Iterable[dict]) -> Set[str]:
+    """Один запрос к базе на пачку записей"""
+    return known_urls(u for r in records for u in record_urls(r))
+
+
+def is_known(record: dict, known: Set[str]) -> bool:
+    return any(u in known for u in record_urls(record))
+
+
+class KnownTracker:
+    """Считает подряд идущие известные записи для блоков с stop_after_known"""
+
+    def __init__(self, blocks: dict):
+        self.thresholds = {name: cfg.stop_after_known for name, cfg in blocks.items() if cfg.stop_after_known}
+        self.streak = {name: 0 for name in self.thresholds}
+        self.skipped = {name: 0 for name in self.thresholds}
+        self.done = set()
+
+    def enabled(self, block_name: str) -> bool:
+        return block_name in self.thresholds
+
+    @property
+    def finished(self) -> bool:
+        """Все инкрементальные блоки исчерпаны (блоки без stop_after_known не учитываются)"""
+        return bool(self.thresholds) and self.done >= set(self.thresholds)
+
+    def filter(self, block_name: str, records: List[dict], known: Optional[Set[str]] = None) -> List[dict]:
+        """Оставляет новые записи; при достижении порога обрезает список и завершает блок"""
+        if not self.enabled(block_name):
+            return records
+        if block_name in self.done or not records:
+            return []
+        if known is None:
+            known = lookup_known(records)
+
+        kept = []
+        for record in records:
+            if not is_known(record, known):
+                self.streak[block_name] = 0
+                kept.append(record)
+                continue
+
+            self.skipped[block_name] += 1
+            self.streak[block_name] += 1
+            if self.streak[block_name] >= self.thresholds[block_name]:
+                self._finish(block_name)
+                break
+        return kept
+
+    def filter_iter(self, block_name: str, records: Iterable[dict]) -> Iterator[dict]:
+        """Ленивый вариант filter: источник читается пачками и бросается после порога"""
+        if not self.enabled(block_name):
+            yield from records
+            return
+
+        records = iter(records)
+        while block_name not in self.done:
+            batch = list(islice(records, BATCH_SIZE))
+            if not batch:
+                return
+            yield from self.filter(block_name, batch)
+
+    def _finish(self, block_name: str) -> None:
+        self.done.add(block_name)
+        logger.info(
+            f"⏹ {block_name}: {self.streak[block_name]} known items in a row, "
+            f"stop extraction ({self.skipped[block_name]} known skipped)"
+        )
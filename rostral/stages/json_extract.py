@@ -1,55 +1,150 @@
 # rostral/stages/json_extract.py
 
 import json
-import typer
+import re
+import logging
 import jmespath
-from typing import Any
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Iterable, Iterator, Optional
 from .base import PipelineStage
 from rostral.models import ExtractFieldConfig, Event
 from rostral.stages.transforms import TRANSFORM_REGISTRY
+from rostral.stages.pagination import extract_pages
+from rostral.stages.incremental import KnownTracker
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+logger = logging.getLogger(__name__)
+
+# Селекторы вида "results[*]", "data.items[*]" или "[*]" можно читать потоково
+_STREAMABLE_SELECTOR = re.compile(r"^((?:[A-Za-z_]\w*)(?:\.[A-Za-z_]\w*)*)?\[\*\]$")
+
+
+@lru_cache(maxsize=None)
+def compile_expression(rule: str):
+    """Компилирует JMESPath-выражение один раз на процесс"""
+    return jmespath.compile(rule.lstrip('$.'))
+
+
+def stream_prefix(selector: str) -> Optional[str]:
+    """Преобразует селектор в ijson-префикс ("results[*]" → "results.item") или None"""
+    match = _STREAMABLE_SELECTOR.match(selector.lstrip('$.'))
+    if not match:
+        return None
+    return f"{match.group(1)}.item" if match.group(1) else "item"
 
 
 class JsonExtractStage(PipelineStage):
     """
-    Стадия для извлечения данных из JSON с использованием JMESPath
+    Стадия для извлечения данных из JSON с использованием JMESPath.
+    Выражения компилируются один раз при создании стадии.
     """
-    
+    consumes = ("json", "json_stream", "pages")
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.selectors = {}
+        self.field_expressions = {}
+        for block_name, block_cfg in (config.extract or {}).items():
+            self.selectors[block_name] = compile_expression(block_cfg.selector)
+            for rule in block_cfg.fields.values():
+                expr = rule if isinstance(rule, str) else getattr(rule, "attr", None)
+                if expr:
+                    self.field_expressions[expr] = compile_expression(expr)
+
     def run(self, data: dict) -> dict:
-        json_data = data.get("json")
-        
+        # Блоки с stop_after_known: известные записи отбрасываются при извлечении
+        tracker = KnownTracker(self.config.extract or {})
+
+        if data.get("pages") is not None:
+            pagination = self.config.source.pagination
+            return extract_pages(
+                data["pages"],
+                self._extract_json,
+                self.config.extract or {},
+                stop_when_known=bool(pagination and pagination.stop_when_known),
+                tracker=tracker,
+            )
+
+        if data.get("json_stream") is not None:
+            return self._run_stream(data["json_stream"], tracker)
+
+        return self._extract_json(data.get("json"), tracker)
+
+    def _extract_json(self, json_data, tracker: Optional[KnownTracker] = None) -> dict:
+        """
+        Извлекает блоки из одного разобранного JSON-документа. С tracker записи
+        сверяются с базой пачками по ходу обработки элементов, и после
+        stop_after_known известных подряд остальные элементы не обрабатываются.
+        """
         if not json_data:
-            typer.echo("⚠️ JsonExtractStage: there is no JSON in the input")
+            logger.warning("⚠️ JsonExtractStage: there is no JSON in the input")
             return {}
             
-        typer.echo(f"🔍 JsonExtractStage: processing JSON (тип: {type(json_data)})")
+        logger.debug(f"🔍 JsonExtractStage: processing JSON (тип: {type(json_data)})")
         
         result = {}
         
         for block_name, block_cfg in (self.config.extract or {}).items():
             try:
-                selector = block_cfg.selector.lstrip('$.')
-                items = jmespath.search(selector, json_data) or []
+                items = self.selectors[block_name].search(json_data) or []
                 
                 if not isinstance(items, list):
                     items = [items]
-                    
-                processed_items = []
-                
-                for item in items:
-                    if not item:
-                        continue
-                        
-                    record = self._process_item(item, block_cfg)
-                    if record:
-                        processed_items.append(record)
-                
-                result[block_name] = processed_items
+
+                records = self._iter_records(items, block_cfg)
+                if tracker is not None:
+                    records = tracker.filter_iter(block_name, records)
+                result[block_name] = list(records)
                 
             except Exception as e:
-                typer.echo(f"❌ Error on block {block_name}: {str(e)}")
+                logger.error(f"❌ Error on block {block_name}: {str(e)}")
                 result[block_name] = []
         
         return result
+
+    def _run_stream(self, response, tracker: KnownTracker) -> dict:
+        """
+        Потоковый режим (source.fetch.stream): элементы массива читаются через ijson
+        и чтение прекращается по limit или stop_after_known. Если ijson не установлен,
+        блоков несколько или селектор сложнее "path[*]", документ загружается целиком.
+        """
+        blocks = self.config.extract or {}
+        raw = getattr(response, "raw", response)
+        try:
+            prefix = stream_prefix(next(iter(blocks.values())).selector) if len(blocks) == 1 else None
+            if ijson is None or prefix is None:
+                if ijson is None:
+                    logger.warning("⚠️ ijson is not installed, JSON is loaded entirely")
+                return self._extract_json(json.load(raw), tracker)
+
+            block_name, block_cfg = next(iter(blocks.items()))
+            try:
+                items = ijson.items(raw, prefix, use_float=True)
+                return {block_name: list(tracker.filter_iter(block_name, self._iter_records(items, block_cfg)))}
+            except Exception as e:
+                logger.error(f"❌ Error on block {block_name}: {str(e)}")
+                return {block_name: []}
+        finally:
+            if hasattr(response, "close"):
+                response.close()
+
+    def _iter_records(self, items: Iterable, block_cfg: Any) -> Iterator[dict]:
+        """Обрабатывает первые limit элементов; в потоковом режиме остальные не читаются"""
+        if block_cfg.limit:
+            items = islice(items, block_cfg.limit)
+
+        for item in items:
+            if not item:
+                continue
+
+            record = self._process_item(item, block_cfg)
+            if record:
+                yield record
     
     def _process_item(self, item: dict, block_cfg: Any) -> dict:
               
@@ -60,12 +155,12 @@ class JsonExtractStage(PipelineStage):
         for field_name, rule in block_cfg.fields.items():
             try:
                 if isinstance(rule, str):
-                    value = jmespath.search(rule.lstrip('$.'), item)
+                    value = self._search(rule, item)
                     record[field_name] = value if value is not None else ""
                     context[field_name] = record[field_name]
                 
                 elif isinstance(rule, ExtractFieldConfig):
-                    raw_value = jmespath.search(rule.attr.lstrip('$.'), item) if rule.attr else None
+                    raw_value = self._search(rule.attr, item) if rule.attr else None
                     
                     if rule.transform_type == 'jinja':
                         context['value'] = raw_value
@@ -77,7 +172,7 @@ class JsonExtractStage(PipelineStage):
                         context[field_name] = rendered
 
             except Exception as e:
-                typer.echo(f"❌ {field_name}: {str(e)}", err=True)
+                logger.error(f"❌ {field_name}: {str(e)}")
                 record[field_name] = ""
 
         # 2. Автоматическое формирование text если он не задан в конфиге
@@ -96,6 +191,10 @@ class JsonExtractStage(PipelineStage):
 
         # 3. Проверка обязательных полей
         if not record.get('url'):
-            typer.echo("⚠️ Warning: URL was not found in extracted data!", err=True)
+            logger.warning("⚠️ Warning: URL was not found in extracted data!")
+
+        return record
 
-        return record
\ No newline at end of file
+    def _search(self, rule: str, item: Any) -> Any:
+        expression = self.field_expressions.get(rule) or compile_expression(rule)
+        return expression.search(item)
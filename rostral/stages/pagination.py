@@ -0,0 +1,210 @@
+# rostral/stages/pagination.py
+
+"""
+Постраничная загрузка источника.
+
+PageStream отдаёт страницы (HTML-текст или разобранный JSON) по мере
+загрузки, чтобы стадия извлечения обрабатывала их сразу. Для стилей
+page/offset адреса страниц известны заранее и загружаются параллельно
+скользящим окном; cursor/next_link идут последовательно. Потребитель
+может остановить загрузку (stop()) — оставшиеся запросы отменяются.
+"""
+
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from rostral.stages.incremental import KnownTracker, is_known, lookup_known
+
+logger = logging.getLogger(__name__)
+
+def with_query_param(url: str, key: str, value: Any) -> str:
+    """Возвращает URL с заменённым (или добавленным) параметром запроса"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != key]
+    query.append((key, str(value)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class PageStream:
+    """
+    Итератор страниц источника.
+    :param url: адрес первой страницы (уже отрендеренный)
+    :param source: SourceConfig (pagination, endpoints, type)
+    :param fetch_page: функция url → payload (str для HTML, объект для JSON)
+    :param render: функция рендеринга Jinja-шаблонов адресов из endpoints
+    """
+
+    def __init__(self, url: str, source, fetch_page: Callable[[str], Any], render: Callable[[str], str] = str):
+        self.url = url
+        self.source = source
+        self.pagination = source.pagination
+        self.fetch_page = fetch_page
+        self.render = render
+        self.pages_fetched = 0
+        self._stopped = False
+
+    def stop(self) -> None:
+        """Прекращает загрузку: новые страницы не запрашиваются, ожидающие отменяются"""
+        self._stopped = True
+
+    def __iter__(self) -> Iterator[Any]:
+        extra_urls = [self.render(u).strip() for u in (self.source.endpoints or {}).values()]
+        style = self.pagination.style if self.pagination else None
+
+        if style in ("page", "offset"):
+            yield from self._iter_parallel(self._numbered_urls() + extra_urls)
+        elif style in ("cursor", "next_link"):
+            yield from self._iter_linked()
+            yield from self._iter_parallel(extra_urls)
+        else:
+            yield from self._iter_parallel([self.url] + extra_urls)
+
+    def _numbered_urls(self) -> List[str]:
+        p = self.pagination
+        step = (p.page_size or 1) if p.style == "offset" else 1
+        base = with_query_param(self.url, p.size_param, p.page_size) if p.size_param and p.page_size else self.url
+        return [with_query_param(base, p.param, p.start + i * step) for i in range(p.max_pages)]
+
+    def _iter_parallel(self, urls: List[str]) -> Iterator[Any]:
+        """Загружает страницы окном из concurrency запросов и отдаёт их по порядку"""
+        if not urls:
+            return
+        concurrency = max(1, self.pagination.concurrency if self.pagination else 1)
+        pending = deque()
+        queue = iter(urls)
+
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(urls))) as executor:
+            for url in queue:
+                pending.append((url, executor.submit(self.fetch_page, url)))
+                if len(pending) >= concurrency:
+                    break
+
+            try:
+                while pending and not self._stopped:
+                    url, future = pending.popleft()
+                    payload = self._result(url, future)
+                    if payload is None:
+                        break
+                    yield payload
+
+                    # Следующий запрос ставится после обработки страницы: решение
+                    # потребителя остановиться не тратит лишних запросов сверх окна
+                    next_url = None if self._stopped else next(queue, None)
+                    if next_url is not None:
+                        pending.append((next_url, executor.submit(self.fetch_page, next_url)))
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def _iter_linked(self) -> Iterator[Any]:
+        """Последовательный обход по курсору или ссылке на следующую страницу"""
+        p = self.pagination
+        url = self.url
+        visited = set()
+
+        while url and url not in visited and len(visited) < p.max_pages and not self._stopped:
+            visited.add(url)
+            try:
+                payload = self.fetch_page(url)
+            except Exception as e:
+                if self.pages_fetched == 0:
+                    raise
+                logger.warning(f"⚠️ Page {url} failed, pagination stopped: {e}")
+                return
+            self.pages_fetched += 1
+            next_value = self._next_value(payload)
+            yield payload
+
+            if not next_value:
+                return
+            if p.style == "cursor":
+                url = with_query_param(self.url, p.param, next_value)
+            else:
+                url = urljoin(url, str(next_value))
+
+    def _next_value(self, payload: Any) -> Optional[str]:
+        """Извлекает курсор или ссылку на следующую страницу по выражению pagination.next"""
+        expression = self.pagination.next
+        if not expression:
+            return None
+        if isinstance(payload, str):
+            from lxml import etree
+            from rostral.stages.selectors import compile_selector
+            root = etree.fromstring(payload.encode("utf-8"), etree.HTMLParser(encoding="utf-8"))
+            links = compile_selector(expression).select(root) if root is not None else []
+            return links[0].get("href") if links else None
+
+        from rostral.stages.json_extract import compile_expression
+        value = compile_expression(expression).search(payload)
+        return str(value) if value not in (None, "") else None
+
+    def _result(self, url: str, future) -> Any:
+        """Первая страница обязана загрузиться; ошибка на следующих просто завершает обход"""
+        try:
+            payload = future.result()
+        except Exception as e:
+            if self.pages_fetched == 0:
+                raise
+            logger.warning(f"⚠️ Page {url} failed, pagination stopped: {e}")
+            return None
+        self.pages_fetched += 1
+        return payload
+
+
+def _repeated(record: dict, seen_urls: set) -> bool:
+    """Запись уже взята с одной из прежних страниц (по url_final, если он есть)"""
+    url = record.get("url_final")
+    if not url:
+        return False
+    if url in seen_urls:
+        return True
+    seen_urls.add(url)
+    return False
+
+
+def extract_pages(pages, extract_page: Callable[[Any], Dict[str, list]], blocks: dict,
+                  stop_when_known: bool = True, tracker: Optional[KnownTracker] = None) -> Dict[str, list]:
+    """
+    Прогоняет страницы через extract_page и склеивает блоки.
+    Повторы записей между страницами (по url_final) отбрасываются здесь.
+    Загрузка останавливается, когда блоки с limit заполнены, страница пуста,
+    (stop_when_known) все записи страницы уже есть в базе или инкрементальные
+    блоки (tracker) встретили stop_after_known известных записей подряд.
+    """
+    tracker = tracker or KnownTracker({})
+    result = {name: [] for name in blocks}
+    seen_urls = set()
+    page_number = 0
+
+    for payload in pages:
+        page_number += 1
+        page_result = extract_page(payload)
+        # Пустота страницы решается до сквозной дедупликации: страница, которая лишь
+        # повторяет прежние записи, не пуста — на следующих могут быть новые
+        page_records = [r for name in blocks for r in page_result.get(name, [])]
+        known = lookup_known(page_records) if page_records and (stop_when_known or tracker.thresholds) else set()
+
+        for name, cfg in blocks.items():
+            fresh = [r for r in page_result.get(name, []) if not _repeated(r, seen_urls)]
+            result[name].extend(tracker.filter(name, fresh, known))
+            if cfg.limit:
+                result[name] = result[name][:cfg.limit]
+
+        if not page_records:
+            logger.info(f"⏹ Page {page_number} is empty, pagination stopped")
+            pages.stop()
+        elif blocks and all(cfg.limit and len(result[name]) >= cfg.limit for name, cfg in blocks.items()):
+            logger.info(f"⏹ Limits reached on page {page_number}, pagination stopped")
+            pages.stop()
+        elif tracker.finished:
+            logger.info(f"⏹ Known items reached on page {page_number}, pagination stopped")
+            pages.stop()
+        elif stop_when_known and all(is_known(r, known) for r in page_records):
+            logger.info(f"⏹ Page {page_number} contains only known items, pagination stopped")
+            pages.stop()
+
+    logger.info(f"📄 Pages processed: {page_number}")
+    return result
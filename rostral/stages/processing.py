@@ -1,14 +1,15 @@
 import os
 import re
-import fitz  # PyMuPDF
-import pytesseract
-from PIL import Image
+import logging
 from io import BytesIO
 from datetime import datetime
 from typing import Dict, Any, List
-import typer
 from .base import PipelineStage
-from rostral.db import get_event_hash, is_known_by_hash
+from rostral.db import get_event_hash, save_event
+from rostral.neardup import NearDuplicateIndex, minhash
+from rostral.log import DEBUG_PAYLOADS
+
+logger = logging.getLogger(__name__)
 
 MAX_FRAGMENT_LENGTH = int(os.getenv("GPT_FRAGMENT_MAX_LENGTH", 200))
 TEXT_MAX_LENGTH = int(os.getenv("GPT_TEXT_MAX_LENGTH", 2000))
@@ -20,40 +21,36 @@ from typing import List, Dict, Any
 
 def extract_text_fragments(text: str, regex_patterns: List[str]) -> str:
     """
-    Улучшенная версия с подробным логированием работы regex
+    Вырезает фрагменты текста после совпадений regex.
+    Подробная трассировка совпадений пишется только при ROSTRAL_DEBUG_PAYLOADS=1.
     """
-    print("✅ extract_text_fragments function called")
-    print(f"📝 Text length: {len(text)} symbols")
-    print(f"🔎 Patterns: {regex_patterns}")
     if not text:
         return "⚠ There is no text to process"
     
     if not regex_patterns:
         return "⚠ There are no regex patterns to apply"
 
+    trace = DEBUG_PAYLOADS and logger.isEnabledFor(logging.DEBUG)
     fragments = []
     debug_info = []  # Для отладочной информации
     
     for pattern in regex_patterns:
         try:
-            debug_info.append(f"\n🔍 Pattern analys: '{pattern}'")
             matches = list(re.finditer(pattern, text, re.DOTALL | re.IGNORECASE))
-            
-            if not matches:
-                debug_info.append("   ➤ No mathes found")
-                continue
-                
-            debug_info.append(f"   ➤ Matches found: {len(matches)}")
+            if trace:
+                debug_info.append(f"\n🔍 Pattern analys: '{pattern}'")
+                debug_info.append(f"   ➤ Matches found: {len(matches)}")
             
             for i, match in enumerate(matches, 1):
                 start = match.end()
                 end = min(len(text), start + 200)
                 fragment = text[start:end].strip()
                 
-                debug_info.append(f"\n   🔹 Match #{i}:")
-                debug_info.append(f"      Position: {match.start()}-{match.end()}")
-                debug_info.append(f"      Matched text: '{match.group()}'")
-                debug_info.append(f"      Context (200 symbols after):\n      '{fragment}'")
+                if trace:
+                    debug_info.append(f"\n   🔹 Match #{i}:")
+                    debug_info.append(f"      Position: {match.start()}-{match.end()}")
+                    debug_info.append(f"      Matched text: '{match.group()}'")
+                    debug_info.append(f"      Context (200 symbols after):\n      '{fragment}'")
                 
                 if fragment:
                     label = {
@@ -67,14 +64,28 @@ def extract_text_fragments(text: str, regex_patterns: List[str]) -> str:
                     fragments.append(f"{label}:\n{fragment}\n{'━'*40}")
 
         except re.error as e:
-            debug_info.append(f"   ❌ Pattern error: {str(e)}")
+            logger.warning(f"❌ Pattern error '{pattern}': {str(e)}")
             continue
 
-    # Вывод отладочной информации в консоль
-    print("\n".join(debug_info))
+    if trace:
+        logger.debug(f"📝 Text length: {len(text)} symbols" + "\n".join(debug_info))
     
     return "\n\n".join(fragments) if fragments else "No relevant text found"
 class ProcessingStage(PipelineStage):
+    consumes = ("record.file_content",)
+    per_record = True
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.reset()
+
+    def reset(self) -> None:
+        # Индекс почти-дубликатов общий для всех пачек запуска
+        policy = getattr(self.config.processing, "near_duplicates", "off")
+        self.near_duplicates = None if policy == "off" else NearDuplicateIndex(
+            getattr(self.config.processing, "near_duplicate_threshold", 0.75)
+        )
+
     def run(self, data: Dict[str, Any]) -> Dict[str, Any]:
         processing_meta = {
             "timestamp": datetime.now().isoformat(),
@@ -82,50 +93,46 @@ class ProcessingStage(PipelineStage):
             "errors": []
         }
 
-        typer.echo(f"⚙️ ProcessingStage input data: {type(data)}")
-        typer.echo(f"📐 ENV limits: fragment={MAX_FRAGMENT_LENGTH}, gpt_text={TEXT_MAX_LENGTH}, head={CHUNK_HEAD}, tail={CHUNK_TAIL}")
+        logger.debug(f"📐 ENV limits: fragment={MAX_FRAGMENT_LENGTH}, gpt_text={TEXT_MAX_LENGTH}, head={CHUNK_HEAD}, tail={CHUNK_TAIL}")
 
         if not isinstance(data, dict):
-            typer.echo("ℹ️ Input data is not a dictionary, skipping processing")
+            logger.info("ℹ️ Input data is not a dictionary, skipping processing")
             return data
 
+        policy = getattr(self.config.processing, "near_duplicates", "off")
+        processing_meta["near_duplicates"] = 0
+
         for block_name, items in data.items():
             if not isinstance(items, list):
-                typer.echo(f"🔸 Skipping block '{block_name}' (not a list)")
+                logger.debug(f"🔸 Skipping block '{block_name}' (not a list)")
                 continue
 
-            typer.echo(f"🔧 Processing block '{block_name}' with {len(items)} items")
+            logger.info(f"🔧 Processing block '{block_name}' with {len(items)} items")
             data[block_name] = [r for r in items if self._process_record(r, processing_meta)]
 
         data["__processing__"] = processing_meta
-        typer.echo(f"✅ Processed {processing_meta['processed_files']} PDF files")
+        logger.info(f"✅ Processed {processing_meta['processed_files']} PDF files")
+        if processing_meta["near_duplicates"]:
+            logger.info(f"🪞 Near-duplicates found: {processing_meta['near_duplicates']} ({policy})")
 
-        if "events" in data:
-            for i, event in enumerate(data["events"]):
-                typer.echo(f"📄 Document #{i+1}: {event.get('title', 'No title')}")
-                
-        else:
-            typer.echo("❌ 'events' block not found in data")
+        if "events" not in data:
+            logger.warning("❌ 'events' block not found in data")
 
         return data
 
     def _process_record(self, record: Dict[str, Any], meta: Dict[str, Any]) -> bool:
         if not record.get("file_content") or ".pdf" not in record.get("url", "").lower():
-            typer.echo("❌ Файл is not PDF, skipping")
+            logger.debug(f"❌ File is not PDF, skipping → {record.get('url')}")
             return False
 
         try:
             text = self._extract_pdf_text(record["file_content"])
             record["text"] = text
-            record["event_id"] = get_event_hash(record)
-
-            if is_known_by_hash(record):
-                typer.echo(f"⏭️ Skipping: already seen → {record['url']}")
-                return False
+            record["event_id"] = get_event_hash(record)  # известные записи уже отброшены DedupStage
 
             del record["file_content"]
             meta["processed_files"] += 1
-            typer.echo(f"📝 Extracted text from PDF ({len(text)} chars)")
+            logger.debug(f"📝 Extracted text from PDF ({len(text)} chars)")
         except Exception as e:
             error_msg = f"Failed to process PDF: {str(e)}"
             record["text"] = f"[ERROR: {error_msg}]"
@@ -134,30 +141,57 @@ class ProcessingStage(PipelineStage):
                 "url": record.get("url", "unknown"),
                 "error": error_msg
             })
-            typer.echo(f"❌ {error_msg}")
+            logger.error(f"❌ {error_msg}")
+            return False
+
+        if getattr(self, "near_duplicates", None) is not None and not self._check_near_duplicate(record, meta):
             return False
 
         regex_patterns = getattr(self.config.processing, "extract_regex", [])
-        print ('ПАТТЕРНЫ', len(regex_patterns), regex_patterns)
         if regex_patterns:
             excerpt = extract_text_fragments(text, regex_patterns)
-            print(f"⚙️ Used regex-patterns: {regex_patterns}")
             record["excerpt"] = excerpt
             if not excerpt.strip():
-                typer.echo(f"⚠️ Keywords were not found in the text → {record.get('url')}")
+                logger.warning(f"⚠️ Keywords were not found in the text → {record.get('url')}")
             
-            typer.echo(f"🔍 excerpt by regex_patterns → {len(excerpt)} chars")
+            logger.debug(f"🔍 excerpt by regex_patterns → {len(excerpt)} chars")
             
         else:
             if len(text) > TEXT_MAX_LENGTH:
                 record["excerpt"] = f"{text[:CHUNK_HEAD]} ... {text[-CHUNK_TAIL:]}"
-                typer.echo(f"✂️ gpt_text trimmed from full text to {len(record['excerpt'])} chars")
+                logger.debug(f"✂️ gpt_text trimmed from full text to {len(record['excerpt'])} chars")
             else:
                 record["excerpt"] = text
 
         return True
 
+    def _check_near_duplicate(self, record: Dict[str, Any], meta: Dict[str, Any]) -> bool:
+        """
+        Сверяет MinHash-подпись текста с индексом. Почти-дубликат связывается с оригиналом
+        (duplicate_of, GPT переиспользует ответ) или, при near_duplicates: skip,
+        сохраняется со статусом duplicate и дальше по конвейеру не идёт.
+        """
+        signature = minhash(record.get("text", ""))
+        if signature is None:
+            return True
+        record["minhash"] = signature
+
+        original = self.near_duplicates.find(signature)
+        if original and original != record["event_id"]:
+            meta["near_duplicates"] += 1
+            record["duplicate_of"] = original
+            logger.debug(f"🪞 Near-duplicate of {original} → {record.get('url')}")
+            if self.config.processing.near_duplicates == "skip":
+                # Сохраняем, чтобы следующий запуск не скачивал документ снова (кроме dry-run)
+                if not self.dry_run:
+                    save_event({**record, "status": "duplicate", "template_name": self.config.template_name})
+                return False
+
+        self.near_duplicates.add(signature, record.get("duplicate_of") or record["event_id"])
+        return True
+
     def _extract_pdf_text(self, pdf_content: bytes, max_pages: int = 10) -> str:
+        import fitz  # PyMuPDF, импортируем только когда есть что разбирать
         text_parts = []
         doc = fitz.open(stream=BytesIO(pdf_content), filetype="pdf")
         for page_num in range(min(len(doc), max_pages)):
@@ -172,6 +206,8 @@ class ProcessingStage(PipelineStage):
         if text:
             return text
         try:
+            import pytesseract
+            from PIL import Image
             pix = page.get_pixmap(dpi=300)
             img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
             return pytesseract.image_to_string(img, lang="rus+eng").strip()
@@ -0,0 +1,157 @@
+# rostral/stages/selectors.py
+
+"""
+Быстрый движок выборки HTML-элементов на lxml.
+
+CSS-селекторы шаблона компилируются в XPath один раз (и кэшируются
+между запусками). Если у всех блоков задан `limit`, документ разбирается
+потоково через iterparse и разбор прекращается, как только найдено
+нужное число элементов, — полное дерево для больших страниц не строится.
+"""
+
+import re
+from functools import lru_cache
+from io import BytesIO
+from typing import Dict, List, Optional, Union
+
+from cssselect import parse
+from cssselect.parser import CombinedSelector
+from lxml import etree
+from lxml.cssselect import LxmlHTMLTranslator
+
+# Псевдоклассы, которым нужно содержимое или следующие соседи элемента:
+# на событии "start" их проверить нельзя, такие селекторы разбираются целиком
+_LOOKAHEAD_PSEUDO = re.compile(
+    r":(?:last-child|last-of-type|only-child|only-of-type|nth-last-child|nth-last-of-type|empty|contains|has)",
+    re.IGNORECASE,
+)
+
+# Содержимое этих тегов BeautifulSoup.get_text() не возвращает
+_SKIP_TEXT_TAGS = {"script", "style", "template"}
+
+# Комбинатор "левая часть — правая часть" глазами правой части (субъекта)
+_REVERSE_AXES = {
+    " ": "ancestor::{}",
+    ">": "parent::{}",
+    "+": "preceding-sibling::*[1][self::{}]",
+    "~": "preceding-sibling::{}",
+}
+
+
+def _subject_step(translator, tree) -> str:
+    """
+    XPath-шаг для субъекта селектора (последнего составного селектора):
+    комбинаторы превращаются в условия на предков и предыдущих соседей —
+    то, что на событии "start" уже разобрано.
+    """
+    if not isinstance(tree, CombinedSelector):
+        return str(translator.xpath(tree))
+    left = _subject_step(translator, tree.selector)
+    return f"{_subject_step(translator, tree.subselector)}[{_REVERSE_AXES[tree.combinator].format(left)}]"
+
+
+def _match_xpath(translator, css: str) -> str:
+    steps = [_subject_step(translator, selector.parsed_tree) for selector in parse(css)]
+    if len(steps) == 1:
+        return f"self::{steps[0]}"
+    return "self::*[" + " or ".join(f"self::{step}" for step in steps) + "]"
+
+
+class CompiledSelector:
+    """CSS-селектор, скомпилированный в XPath для выборки и для проверки отдельного элемента"""
+
+    def __init__(self, css: str):
+        translator = LxmlHTMLTranslator()
+        self.css = css
+        self._select = etree.XPath(translator.css_to_xpath(css))
+        self._match = etree.XPath(_match_xpath(translator, css))
+        self.streamable = not _LOOKAHEAD_PSEUDO.search(css)
+
+    def select(self, root) -> list:
+        """Все подходящие элементы поддерева в порядке документа"""
+        return self._select(root)
+
+    def matches(self, element) -> bool:
+        """Подходит ли сам элемент под селектор"""
+        return bool(self._match(element))
+
+
+@lru_cache(maxsize=None)
+def compile_selector(css: str) -> CompiledSelector:
+    """Компилирует селектор один раз на процесс; ошибки синтаксиса всплывают сразу"""
+    return CompiledSelector(css)
+
+
+def element_text(element) -> str:
+    """Аналог BeautifulSoup.get_text(strip=True): склеивает обрезанные строки без разделителя"""
+    parts = []
+
+    def walk(node):
+        if node.tag not in _SKIP_TEXT_TAGS and node.text:
+            parts.append(node.text)
+        for child in node:
+            if isinstance(child.tag, str):  # комментарии и инструкции пропускаем
+                walk(child)
+            if child.tail:
+                parts.append(child.tail)
+
+    walk(element)
+    return "".join(part.strip() for part in parts)
+
+
+def _to_bytes(html: Union[str, bytes]) -> bytes:
+    return html.encode("utf-8") if isinstance(html, str) else html
+
+
+def select_blocks(
+    html: Union[str, bytes],
+    selectors: Dict[str, CompiledSelector],
+    limits: Dict[str, Optional[int]],
+) -> Dict[str, List]:
+    """
+    Возвращает {блок: [элементы]} для каждого селектора, с учётом limit.
+    Потоковый разбор используется, когда у всех блоков есть limit и
+    селекторы не требуют заглядывания вперёд; иначе строится полное дерево.
+    """
+    data = _to_bytes(html)
+    if not data.strip():
+        return {name: [] for name in selectors}
+
+    if selectors and all(limits.get(name) for name in selectors) and all(s.streamable for s in selectors.values()):
+        return _stream_select(data, selectors, limits)
+
+    root = etree.fromstring(data, etree.HTMLParser(encoding="utf-8", huge_tree=True))
+    if root is None:
+        return {name: [] for name in selectors}
+
+    result = {}
+    for name, selector in selectors.items():
+        elements = selector.select(root)
+        limit = limits.get(name)
+        result[name] = elements[:limit] if limit else elements
+    return result
+
+
+def _stream_select(data: bytes, selectors: Dict[str, CompiledSelector], limits: Dict[str, int]) -> Dict[str, List]:
+    """
+    Потоковая выборка: совпадения проверяются на событии "start" (порядок документа,
+    предки и предыдущие соседи уже разобраны), поля читаются после "end" элемента.
+    Разбор останавливается, когда все блоки набрали limit и все найденные элементы закрыты.
+    """
+    result = {name: [] for name in selectors}
+    open_matches = set()
+
+    events = etree.iterparse(BytesIO(data), events=("start", "end"), html=True, encoding="utf-8", huge_tree=True)
+    for event, element in events:
+        if event == "start":
+            for name, selector in selectors.items():
+                if len(result[name]) < limits[name] and selector.matches(element):
+                    result[name].append(element)
+                    open_matches.add(element)
+            continue
+
+        open_matches.discard(element)
+        if not open_matches and all(len(result[name]) >= limits[name] for name in selectors):
+            break
+
+    return result
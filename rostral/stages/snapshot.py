@@ -0,0 +1,82 @@
+# rostral/stages/snapshot.py
+
+import logging
+from typing import Any, Dict
+
+from .base import PipelineStage
+from rostral.db import get_event_hash
+from rostral.snapshots import digest, load_digests, load_values, save_snapshots, typed_values
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotStage(PipelineStage):
+    """
+    Обнаружение изменений для шаблонов с track: — заменяет DedupStage.
+    Сразу после извлечения сравнивает хэш отслеживаемых значений каждой
+    записи с сохранённым снимком; дальше идут только новые и изменившиеся
+    записи, с полями change ("new" | "changed"), previous (прежние значения)
+    и changes ({поле: {"old", "new"}}) для шаблона алерта. Новые снимки
+    записывает AlertStage после рендеринга алертов (без alert — сразу;
+    если алерт не отрендерился, снимки не пишутся),
+    в dry-run они не сохраняются.
+    """
+    produces = ("snapshot_updates",)
+
+    def run(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(data, dict):
+            return data
+
+        track = self.config.track
+        template = self.config.template_name
+        current = {}
+        stats = {"new": 0, "changed": 0, "unchanged": 0, "no_key": 0, "duplicates": 0}
+        for record in data.get(track.field) or []:
+            key = record.get(track.key) if isinstance(record, dict) else None
+            if not key:
+                stats["no_key"] += 1
+                continue
+            if key in current:
+                stats["duplicates"] += 1
+                continue
+            if record.get("url"):
+                record["event_id"] = get_event_hash(record)
+            values = typed_values(record, track.values)
+            current[str(key)] = (record, values, digest(values))
+
+        stored = load_digests(template, current)
+        previous = load_values(template, [k for k, (_, _, d) in current.items() if stored.get(k, d) != d])
+
+        kept = []
+        updates = {}
+        for key, (record, values, value_digest) in current.items():
+            old_digest = stored.get(key)
+            if old_digest == value_digest:
+                stats["unchanged"] += 1
+                continue
+            updates[key] = (value_digest, values)
+            if old_digest is None:
+                stats["new"] += 1
+                record.update(change="new", previous={}, changes={})
+                if not track.notify_new:
+                    continue
+            else:
+                stats["changed"] += 1
+                old = previous.get(key, {})
+                record.update(change="changed", previous=old, changes={
+                    field: {"old": old.get(field), "new": value}
+                    for field, value in values.items() if old.get(field) != value
+                })
+            kept.append(record)
+
+        data[track.field] = kept
+        logger.info(
+            f"📸 Snapshot: changed={stats['changed']}, new={stats['new']}, unchanged={stats['unchanged']}, "
+            f"without key={stats['no_key']}, duplicates={stats['duplicates']}"
+        )
+
+        if self.config.alert:
+            data["snapshot_updates"] = updates
+        elif not self.dry_run:
+            save_snapshots(template, updates)
+        return data
@@ -1,11 +1,22 @@
 # rostral/stages/transforms.py
 
-from typing import Optional
-import requests
+from typing import Dict, Iterable, Optional
+import logging
+import os
+from rostral import http_client
 import urllib.parse
-import time
-from jinja2 import Template  # Добавляем импорт Jinja2
 from rostral.cache import cached_transform
+from rostral.ratelimit import get_bucket
+
+logger = logging.getLogger(__name__)
+
+# Ссылки на скачивание с Яндекс.Диска подписаны и живут недолго
+YANDEX_LINK_TTL = int(os.getenv("ROSTRAL_YANDEX_LINK_TTL", 1800))
+# Общий лимит запросов к cloud-api.yandex.net на процесс и число параллельных запросов
+YANDEX_API_RATE = float(os.getenv("ROSTRAL_YANDEX_API_RATE", 4))
+YANDEX_API_BURST = float(os.getenv("ROSTRAL_YANDEX_API_BURST", 4))
+YANDEX_CONCURRENCY = int(os.getenv("ROSTRAL_YANDEX_CONCURRENCY", 4))
+
 
 def transform_smart_url(url: str, *, template_name: Optional[str] = None, base_url: Optional[str] = None) -> str:
     """Универсальный трансформатор URL с поддержкой относительных путей и Яндекс.Диска"""
@@ -17,18 +28,35 @@ def transform_smart_url(url: str, *, template_name: Optional[str] = None, base_u
         return urllib.parse.urljoin(base_url, url)
     
     # Обработка Яндекс.Диска
-    if "yandex.ru" in url.lower() or "yadi.sk" in url.lower():
-        return transform_yandex_disk(url)
+    if is_yandex_disk_url(url):
+        return transform_yandex_disk(url, template_name=template_name)
     
     return url
 
-@cached_transform("yandex_disk")
-def transform_yandex_disk(url: str) -> str:
+
+def transform_yandex_disk(url: str, *, template_name: Optional[str] = None, **kwargs) -> str:
     """Простое и надёжное преобразование ссылок Яндекс.Диска"""
-    try:
-        if "downloader.disk.yandex.ru" in url:
-            return url
+    if "downloader.disk.yandex.ru" in url:
+        return url
+    if not template_name:
+        # Без имени шаблона ключ кэша не построить — разрешаем ссылку напрямую
+        return resolve_yandex_disk.__wrapped__(url) or url
+    return resolve_yandex_disk(url, template_name=template_name) or url
+
+
+def is_yandex_disk_url(url: str) -> bool:
+    """Публичная ссылка Яндекс.Диска, которую нужно разрешить через API"""
+    lowered = (url or "").lower()
+    return ("yandex.ru" in lowered or "yadi.sk" in lowered) and "downloader.disk.yandex.ru" not in lowered
 
+
+@cached_transform("yandex_disk", ttl=YANDEX_LINK_TTL, max_workers=YANDEX_CONCURRENCY)
+def resolve_yandex_disk(url: str) -> str:
+    """
+    Прямая ссылка на скачивание по публичной ссылке Яндекс.Диска.
+    Возвращает "" при ошибке — пустой результат не кэшируется.
+    """
+    try:
         if "public_key=" in url:
             public_key = url.split("public_key=")[1].split("&")[0]
         elif "/d/" in url:
@@ -40,25 +68,48 @@ def transform_yandex_disk(url: str) -> str:
 
         api_url = f"https://cloud-api.yandex.net/v1/disk/public/resources/download?public_key=https://disk.yandex.ru/d/{public_key}"
 
-        response = requests.get(
+        get_bucket("yandex_disk_api", YANDEX_API_RATE, YANDEX_API_BURST).acquire()
+        response = http_client.get(
             api_url,
             timeout=10,
             headers={"User-Agent": "Mozilla/5.0"}
         )
         
         response.raise_for_status()
-        download_url = response.json().get("href", "")
-        time.sleep(1)
-        return download_url if download_url else url
+        return response.json().get("href", "")
     
     except Exception as e:
-        print(f"⚠️ Yandex Disk link transformation error {url}: {str(e)}")
-        return url
+        logger.warning(f"⚠️ Yandex Disk link transformation error {url}: {str(e)}")
+        return ""
+
+
+def resolve_yandex_links(urls: Iterable[str], *, template_name: Optional[str] = None, **kwargs) -> Dict[str, str]:
+    """
+    Пакетное разрешение ссылок Яндекс.Диска: кэш читается одним запросом,
+    промахи разрешаются параллельно под общим ограничителем частоты API.
+    Возвращает {исходная ссылка: прямая ссылка или исходная при ошибке}.
+    """
+    urls = list(dict.fromkeys(u for u in urls if u))
+    pending = [u for u in urls if is_yandex_disk_url(u)]
+    resolved = {}
+    if pending and template_name:
+        resolved = resolve_yandex_disk.many(pending, template_name=template_name)
+    elif pending:
+        resolved = {u: transform_yandex_disk(u) for u in pending}
+    return {u: resolved.get(u) or u for u in urls}
+
+
+def resolve_smart_urls(urls: Iterable[str], *, template_name: Optional[str] = None,
+                       base_url: Optional[str] = None, **kwargs) -> Dict[str, str]:
+    """Пакетный вариант transform_smart_url: ссылки Яндекс.Диска разрешаются разом"""
+    urls = list(dict.fromkeys(u for u in urls if u))
+    yandex = resolve_yandex_links([u for u in urls if is_yandex_disk_url(u)], template_name=template_name)
+    return {u: yandex.get(u) or transform_smart_url(u, template_name=template_name, base_url=base_url) for u in urls}
 
 
 
 def transform_jinja(template_str: str, context: dict) -> str:
-    from jinja2 import Template
+    from rostral.stages.base import compile_jinja
     try:
         if not template_str:
             return ""
@@ -67,13 +118,20 @@ def transform_jinja(template_str: str, context: dict) -> str:
         if not any(c in template_str for c in ['{', '%']):
             return str(context.get(template_str, ""))
             
-        return Template(template_str).render(**context)
+        return compile_jinja(template_str).render(**context)
     except Exception as e:
-        print(f"Jinja2 error: {str(e)}")
+        logger.error(f"Jinja2 error: {str(e)}")
         return "[RENDER_ERROR]"
 
 TRANSFORM_REGISTRY = {
     "yandex_disk": transform_yandex_disk,
     "smart_url": transform_smart_url,
     "jinja": transform_jinja,  # Добавляем Jinja в реестр
+}
+
+# Пакетные варианты трансформаций: список значений блока → {значение: результат}.
+# Стадии используют их, чтобы обработать все ссылки блока разом, а не по одной.
+BATCH_TRANSFORM_REGISTRY = {
+    "yandex_disk": resolve_yandex_links,
+    "smart_url": resolve_smart_urls,
 }
\ No newline at end of file
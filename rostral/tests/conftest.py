@@ -1,6 +1,11 @@
+import os
+
 import pytest
 from unittest.mock import MagicMock
 
+# Веб-приложение в тестах не настраивает логирование и не пишет rostral.log
+os.environ.setdefault("ROSTRAL_APP_LOGGING", "0")
+
 @pytest.fixture
 def alert_config():
     config = MagicMock()
@@ -39,4 +44,37 @@ def test_data():
                 "адрес": "Адрес 1"
             }
         }
-    }
\ No newline at end of file
+    }
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Пустая SQLite-база во временной папке и чистый кэш трансформаций"""
+    import rostral.db as db
+    from rostral.cache import reset_cache
+
+    monkeypatch.setattr(db, "DB_URL", f"sqlite:///{tmp_path / 'cache.db'}")
+    monkeypatch.setattr(db, "_engine", None)
+    monkeypatch.setattr(db, "_session_factory", None)
+    reset_cache()
+    yield
+    reset_cache()
+
+
+@pytest.fixture
+def make_config():
+    """
+    Сборщик Config для тестов: html-источник с ежедневным запуском плюс
+    переданные секции шаблона. source= дополняет источник по умолчанию.
+    """
+    from rostral.models import Config
+
+    def build(template_name="test", source=None, **sections):
+        return Config.model_validate({
+            "version": 1,
+            "meta": {},
+            "template_name": template_name,
+            "source": {"type": "html", "url": "https://example.org/", "frequency": "daily",
+                       "fetch": {"retry_policy": {}}, **(source or {})},
+            **sections,
+        })
+
+    return build
@@ -0,0 +1,104 @@
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+from rostral import cache
+from rostral.cache import cache_stats, cached_transform, get_many, put_many, reset_cache
+
+
+pytestmark = pytest.mark.usefixtures("temp_db")
+
+
+def test_memory_tier_serves_repeated_lookups():
+    calls = []
+
+    @cached_transform("upper")
+    def upper(value: str) -> str:
+        calls.append(value)
+        return value.upper()
+
+    assert upper("a", template_name="t", base_url="ignored") == "A"
+    assert upper("a", template_name="t") == "A"
+
+    assert calls == ["a"]
+    assert cache_stats()["upper"]["memory_hits"] == 1
+
+    # после очистки памяти значение поднимается из БД
+    reset_cache()
+    assert upper("a", template_name="t") == "A"
+    assert calls == ["a"]
+    assert cache_stats()["upper"]["db_hits"] == 1
+
+
+def test_ttl_expires_entries(monkeypatch):
+    calls = []
+
+    @cached_transform("link", ttl=60)
+    def link(value: str) -> str:
+        calls.append(value)
+        return f"https://cdn/{value}?sig={len(calls)}"
+
+    first = link("x", template_name="t")
+    now = time.time()
+    monkeypatch.setattr(cache.time, "time", lambda: now + 61)
+
+    assert link("x", template_name="t") != first
+    assert len(calls) == 2
+
+
+def test_falsy_results_are_not_cached_by_default():
+    calls = []
+
+    @cached_transform("flaky")
+    def flaky(value: str) -> str:
+        calls.append(value)
+        return ""
+
+    @cached_transform("empty_ok", cache_falsy=True)
+    def empty_ok(value: str) -> str:
+        calls.append(value)
+        return ""
+
+    flaky("a", template_name="t")
+    flaky("a", template_name="t")
+    empty_ok("b", template_name="t")
+    empty_ok("b", template_name="t")
+
+    assert calls == ["a", "a", "b"]
+
+
+def test_bulk_get_and_put_use_one_round_trip():
+    put_many("t", "bulk", {f"in{i}": f"out{i}" for i in range(700)})
+    reset_cache()
+
+    found = get_many("t", "bulk", [f"in{i}" for i in range(700)] + ["unknown"])
+
+    assert len(found) == 700 and found["in5"] == "out5"
+    assert cache_stats()["bulk"]["db_hits"] == 700
+    assert cache_stats()["bulk"]["misses"] == 1
+
+
+def test_many_computes_only_misses():
+    calls = []
+
+    @cached_transform("double")
+    def double(value: str) -> str:
+        calls.append(value)
+        return value * 2
+
+    double("a", template_name="t")
+    assert double.many(["a", "b", "c"], template_name="t") == {"a": "aa", "b": "bb", "c": "cc"}
+    assert calls == ["a", "b", "c"]
+
+
+def test_template_name_is_required():
+    @cached_transform("noop")
+    def noop(value: str) -> str:
+        return value
+
+    with pytest.raises(ValueError):
+        noop("a")
@@ -0,0 +1,115 @@
+import gzip
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import requests
+import rostral.db as db
+import rostral.http_client as http_client
+from rostral.http_client import REPLAY, RECORD, CassetteMiss, use_cassette
+from rostral.models import Event
+from rostral.runner import PipelineRunner
+
+LISTING = """<html><body>
+<a class="doc" href="/files/1.pdf">Заключение 1</a>
+<a class="doc" href="/files/2.pdf">Заключение 2</a>
+<a href="/about">О сайте</a>
+</body></html>"""
+
+
+class Site(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        Site.requests.append(self.path)
+        if self.path == "/list.html":
+            body = gzip.compress(LISTING.encode("utf-8"))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Encoding", "gzip")
+        elif self.path.startswith("/files/"):
+            body = b"%PDF-1.4 " + self.path.encode() * 100
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+        else:
+            body = b"not found"
+            self.send_response(404)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    Site.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Site)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+pytestmark = pytest.mark.usefixtures("temp_db")
+
+
+@pytest.fixture
+def site_config(site, make_config):
+    """Шаблон фейкового сайта: список, загрузка PDF и алерт со статусами"""
+    return lambda: make_config(
+        "cassette_test", source={"url": f"{site}/list.html"},
+        extract={"events": {"selector": "a.doc", "type": "list", "fields": {"title": "self", "url": {"attr": "href"}}}},
+        download={"extensions": [".pdf"], "min_interval": 0.2, "workers": 1},
+        alert={"templates": {"main": "{% for e in events %}{{ e.title }} {{ e.download_status }}\n{% endfor %}"}},
+    )
+
+
+def test_replay_serves_recorded_run_offline(tmp_path, site, site_config, monkeypatch):
+    cassette = tmp_path / "run.zip"
+    with use_cassette(cassette, RECORD) as tape:
+        recorded = PipelineRunner(site_config()).run(dry_run=True)
+    assert sorted(Site.requests) == ["/files/1.pdf", "/files/2.pdf", "/list.html", "/robots.txt"]
+    assert len(tape._entries) == 4
+    assert "Заключение 1 success" in recorded["alert"]["main"]
+
+    def offline(*args, **kwargs):
+        raise AssertionError("network request during replay")
+
+    monkeypatch.setattr(http_client.requests, "get", offline)
+    with use_cassette(cassette, REPLAY) as tape:
+        replayed = PipelineRunner(site_config()).run(dry_run=True)
+
+    assert replayed["alert"] == recorded["alert"]
+    assert [e["final_url"] for e in replayed["events"]] == [e["final_url"] for e in recorded["events"]]
+    assert tape.hits == 3 and tape.misses == 0  # robots.txt при воспроизведении не нужен
+
+    # dry-run ничего не сохраняет: повторный запуск видит те же события
+    session = db.Session()
+    assert session.query(Event).count() == 0
+    session.close()
+
+
+def test_replay_miss_is_a_connection_error(tmp_path, site):
+    cassette = tmp_path / "run.zip"
+    with use_cassette(cassette, RECORD):
+        http_client.get(f"{site}/list.html", timeout=5)
+        with pytest.raises(requests.ConnectionError):
+            http_client.get("http://127.0.0.1:9/closed", timeout=1)
+
+    with use_cassette(cassette, REPLAY):
+        response = http_client.get(f"{site}/list.html", timeout=5)
+        assert response.ok and response.text == LISTING and "Content-Encoding" not in response.headers
+        stream = http_client.get(f"{site}/list.html", stream=True)  # повтор отдаётся той же записью
+        assert stream.raw.read() == LISTING.encode("utf-8")
+        with pytest.raises(requests.ConnectionError):
+            http_client.get("http://127.0.0.1:9/closed")  # ошибка записана и воспроизводится
+        with pytest.raises(CassetteMiss):
+            http_client.get(f"{site}/other.html")
@@ -0,0 +1,106 @@
+import os
+import sys
+import threading
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import rostral.db as db
+from rostral.cache import get_many, put_many, reset_cache
+from rostral.db import database_url, engine_options, known_urls, save_event
+from rostral.models import Base, Event, EventText
+from sqlalchemy import text
+
+# PostgreSQL проверяется, если задан URL тестовой базы (она очищается!), например
+# ROSTRAL_TEST_POSTGRES_URL=postgresql://postgres@localhost:5432/rostral_test
+POSTGRES_URL = os.getenv("ROSTRAL_TEST_POSTGRES_URL")
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def backend(request, tmp_path, monkeypatch):
+    if request.param == "postgresql":
+        if not POSTGRES_URL:
+            pytest.skip("ROSTRAL_TEST_POSTGRES_URL is not set")
+        monkeypatch.setenv("ROSTRAL_DB_URL", POSTGRES_URL)
+        url = database_url()
+    else:
+        url = f"sqlite:///{tmp_path / 'cache.db'}"
+    monkeypatch.setattr(db, "DB_URL", url)
+    monkeypatch.setattr(db, "_engine", None)
+    monkeypatch.setattr(db, "_session_factory", None)
+    reset_cache()
+    engine = db.get_engine()
+    if request.param == "postgresql":
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+    yield request.param
+    reset_cache()
+    engine.dispose()
+
+
+def test_url_and_pool_from_environment(monkeypatch):
+    for name in ("ROSTRAL_DB_URL", "DATABASE_URL", "DB_ENGINE"):
+        monkeypatch.delenv(name, raising=False)
+    assert database_url() == "sqlite:///rostral_cache.db"
+
+    monkeypatch.setenv("DB_ENGINE", "postgres")
+    monkeypatch.setenv("POSTGRES_HOST", "db")
+    monkeypatch.setenv("POSTGRES_PASSWORD", "secret")
+    assert database_url() == "postgresql+psycopg2://rostral:secret@db:5432/rostral"
+
+    monkeypatch.setenv("DATABASE_URL", "postgres://u:p@host/name")
+    assert database_url() == "postgresql+psycopg2://u:p@host/name"
+
+    options = engine_options("postgresql://u:p@host/name")
+    assert options["pool_pre_ping"] is True
+    assert options["pool_size"] == db.POOL_SIZE and options["pool_recycle"] == db.POOL_RECYCLE
+    assert "pool_size" not in engine_options("sqlite:///x.db")
+
+
+def test_save_event_skips_conflicts(backend):
+    record = {"url": "https://example.org/a.pdf", "title": "A", "text": "текст " * 100, "excerpt": "текст",
+              "template_name": "t", "minhash": list(range(64))}
+    assert save_event(record)
+    assert not save_event(record)
+    assert not save_event({**record, "title": "A, другой заголовок"})  # тот же url
+    assert known_urls(["https://example.org/a.pdf"]) == {"https://example.org/a.pdf"}
+
+    session = db.Session()
+    try:
+        event = session.query(Event).one()
+        assert event.text == "текст " * 100 and event.excerpt == "текст"
+        assert session.query(EventText).count() == 2
+    finally:
+        session.close()
+
+
+def test_concurrent_writers_store_one_event(backend):
+    barrier = threading.Barrier(8)
+    results = []
+
+    def write(n):
+        barrier.wait()
+        results.append(save_event({"url": "https://example.org/same.pdf", "title": "Same", "text": f"writer {n}"}))
+        put_many("t", "upper", {"a": f"A{n}"})
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results.count(True) == 1
+    with db.get_engine().connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM events")).scalar() == 1
+        assert conn.execute(text("SELECT count(*) FROM event_texts")).scalar() == 1
+    reset_cache()
+    assert get_many("t", "upper", ["a"])["a"].startswith("A")
+
+
+def test_sqlite_uses_wal(backend):
+    if backend != "sqlite":
+        pytest.skip("SQLite only")
+    with db.get_engine().connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
@@ -0,0 +1,115 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import rostral.stages.dedup as dedup
+import rostral.stages.gpt as gpt
+from rostral.db import get_event_hash
+from rostral.runner import PipelineRunner
+from rostral.stages.base import PipelineStage
+from rostral.stages.dedup import DedupStage
+from rostral.stages.download import DownloadStage
+from rostral.stages.gpt import GPTStage
+from rostral.stages.processing import ProcessingStage
+
+
+EVENTS = {"events": {"selector": "a", "type": "list", "fields": {"title": "self", "url": {"attr": "href"}}}}
+
+
+@pytest.fixture
+def listing(make_config):
+    """Шаблон списка документов; тип источника и секции (normalize, processing) можно задать"""
+    return lambda source_type="html", **sections: make_config(
+        "test_dedup", source={"type": source_type}, extract=EVENTS, download={"allow_json": True}, **sections,
+    )
+
+
+def record(i, title=None):
+    return {"url": f"https://example.org/{i}.pdf", "title": title or f"Doc {i}"}
+
+
+def test_dedup_stage_follows_extraction_for_every_source_type(listing):
+    assert PipelineRunner._stage_names(listing("html"))[:3] == ["fetch", "extract", "dedup"]
+    assert PipelineRunner._stage_names(listing("json"))[:4] == ["fetch", "json_extract", "dedup", "event_json"]
+
+
+def test_known_and_repeated_records_are_dropped_with_bulk_lookups(listing, monkeypatch):
+    lookups = []
+    known_hash = get_event_hash(record(2))
+
+    def fake_urls(urls):
+        lookups.append("url")
+        return {"https://example.org/1.pdf"} & set(urls)
+
+    def fake_hashes(hashes):
+        lookups.append("hash")
+        return {known_hash} & set(hashes)
+
+    monkeypatch.setattr(dedup, "known_urls", fake_urls)
+    monkeypatch.setattr(dedup, "known_hashes", fake_hashes)
+    data = {"events": [record(1), record(2), record(3), record(3, "Doc 3 again"), {"title": "no url"}, record(4)],
+            "meta": "not a block"}
+
+    result = DedupStage(listing()).run(data)
+
+    assert [r["url"] for r in result["events"]] == ["https://example.org/3.pdf", "https://example.org/4.pdf"]
+    assert result["events"][0]["event_id"] == get_event_hash(record(3))
+    assert result["meta"] == "not a block"
+    assert sorted(lookups) == ["hash", "url"]
+
+
+def test_limit_is_enforced_before_downloads(listing, monkeypatch):
+    monkeypatch.setattr(dedup, "known_urls", lambda urls: set())
+    monkeypatch.setattr(dedup, "known_hashes", lambda hashes: set())
+    monkeypatch.setattr(dedup, "MAX_EVENTS_PER_TEMPLATE", 3)
+    data = {"events": [record(i) for i in range(10)]}
+
+    assert len(DedupStage(listing()).run(data)["events"]) == 3
+
+    # фильтры normalize отбрасывают записи позже — лимит тогда применяет AlertStage
+    normalize = {"rules": [{"field": "events", "filters": [{"filter": "documents", "condition": "x"}]}]}
+    data = {"events": [record(i) for i in range(10)]}
+    assert len(DedupStage(listing(normalize=normalize)).run(data)["events"]) == 10
+
+    # ProcessingStage тоже отбрасывает записи (не PDF, ошибка разбора) — лимит считается после неё
+    data = {"events": [record(i) for i in range(10)]}
+    assert len(DedupStage(listing(processing={})).run(data)["events"]) == 10
+
+
+class FakeListing(PipelineStage):
+    """Вместо fetch + extract: 20 новых PDF"""
+
+    def run(self, data):
+        return {"events": [record(i) for i in range(20)]}
+
+
+def test_downloads_and_gpt_stop_once_the_limit_is_filled(listing, monkeypatch):
+    monkeypatch.setattr(dedup, "known_urls", lambda urls: set())
+    monkeypatch.setattr(dedup, "known_hashes", lambda hashes: set())
+    monkeypatch.setattr(dedup, "MAX_EVENTS_PER_TEMPLATE", 3)
+    monkeypatch.setattr(gpt, "gpt_texts_for", lambda ids: {})
+    monkeypatch.setattr(gpt, "TEXT_MAX_LENGTH", "2000")
+    downloads, prompts = [], []
+    monkeypatch.setattr(DownloadStage, "_download_file", lambda self, url, verify: downloads.append(url) or url.encode())
+
+    def parse(self, content):
+        if b"/0.pdf" in content or b"/1.pdf" in content:
+            raise ValueError("broken PDF")
+        return f"Текст {content.decode()}"
+
+    monkeypatch.setattr(ProcessingStage, "_extract_pdf_text", parse)
+    monkeypatch.setattr(GPTStage, "_get_gpt_response", lambda self, prompt: prompts.append(prompt) or "Объект: x")
+    normalize = {"rules": [{"field": "events", "filters": [{"filter": 'not matches(url, "/3[.]pdf")'}]}]}
+    pipeline = PipelineRunner(listing(processing={}, normalize=normalize, gpt={"prompt": "{{ text }}"}))
+    pipeline.stages = [FakeListing(pipeline.config)] + pipeline.stages[2:]
+    pipeline.releases = PipelineRunner._releases(pipeline.stages)
+
+    context = pipeline.run(dry_run=True)
+
+    # Пачки: 0–2 (0 и 1 не разбираются), 3–4 (3 отсеивает normalize), 5 — лимит набран
+    assert [r["url"] for r in context["events"]] == [f"https://example.org/{i}.pdf" for i in (2, 4, 5)]
+    assert len(downloads) == 6  # остальные 14 записей не скачиваются и остаются новыми
+    assert len(prompts) == 3
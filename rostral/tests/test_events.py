@@ -0,0 +1,88 @@
+import json
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import rostral.db as db
+import rostral.events as events
+from rostral.db import save_event
+from rostral.events import EventBroker, sse_stream
+from rostral.models import Event
+
+
+pytestmark = pytest.mark.usefixtures("temp_db")
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = EventBroker(poll_interval=60)
+    monkeypatch.setattr(broker, "_poll_loop", lambda: None)  # опрос БД вызываем в тестах явно
+    monkeypatch.setattr(events, "_broker", broker)
+    return broker
+
+
+def read_event(stream):
+    for message in stream:
+        if message.startswith("id:"):
+            return json.loads(message.split("data: ", 1)[1])
+
+
+def test_saved_event_is_pushed_to_stream(broker):
+    stream = sse_stream(broker, heartbeat=0.05)
+    assert next(stream).startswith("retry:")
+    assert next(stream) == ": ping\n\n"  # простой поток — только пинги
+
+    save_event({"url": "https://example.org/a.pdf", "title": "A", "template_name": "t"})
+
+    payload = read_event(stream)
+    assert payload["url"] == "https://example.org/a.pdf"
+    assert payload["template_name"] == "t"
+    stream.close()
+    assert broker.subscribers == 0
+
+
+def test_reconnect_replays_missed_events_and_poll_finds_foreign_rows(broker):
+    save_event({"url": "https://example.org/a.pdf", "title": "A"})
+    assert broker.poll_once() == 0  # первый опрос только запоминает позицию
+
+    # Событие, сохранённое другим процессом (без publish)
+    session = db.Session()
+    session.add(Event(event_id="foreign", url="https://example.org/b.pdf", title="B"))
+    session.commit()
+    session.close()
+
+    replay = sse_stream(broker, last_event_id=1, heartbeat=0.05)
+    next(replay)
+    assert read_event(replay)["url"] == "https://example.org/b.pdf"
+
+    live = sse_stream(broker, heartbeat=0.05)
+    next(live)
+    assert broker.poll_once() == 1
+    assert read_event(live)["event_id"] == "foreign"
+    assert broker.poll_once() == 0
+    replay.close()
+    live.close()
+
+
+def test_feed_answers_304_until_new_event(broker, monkeypatch):
+    import app as web
+
+    monkeypatch.chdir(project_root)
+    client = web.app.test_client()
+    save_event({"url": "https://example.org/a.pdf", "title": "A"})
+
+    first = client.get("/")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.headers["Last-Modified"]
+
+    cached = client.get("/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+    assert client.get("/", headers={"If-Modified-Since": first.headers["Last-Modified"]}).status_code == 304
+
+    save_event({"url": "https://example.org/b.pdf", "title": "B"})
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 200
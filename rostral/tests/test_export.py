@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import rostral.db as db
+from rostral.export import export_events, iter_events
+from rostral.models import Event
+
+
+@pytest.fixture(autouse=True)
+def events(temp_db):
+    session = db.Session()
+    session.add_all([
+        Event(event_id=f"e{i}", url=f"https://example.org/{i}.pdf", title=f"Документ {i}", text="x" * 100,
+              status="duplicate" if i % 5 == 0 else "pending", template_name="kgiop" if i % 2 else "who",
+              timestamp=datetime(2024, 1, 1 + i % 28, 12))
+        for i in range(60)
+    ])
+    session.commit()
+    session.close()
+
+
+def test_filters_by_template_status_and_dates():
+    rows = list(iter_events(template=["kgiop"], status=["pending"],
+                            since=datetime(2024, 1, 10), until=datetime(2024, 1, 20)))
+
+    assert rows
+    assert all(r["template_name"] == "kgiop" and r["status"] == "pending" for r in rows)
+    assert all(datetime(2024, 1, 10) <= r["timestamp"] < datetime(2024, 1, 20) for r in rows)
+    assert [r["id"] for r in rows] == sorted(r["id"] for r in rows)
+    assert "text" not in rows[0]
+
+
+def test_ndjson_and_csv_formats():
+    lines = "".join(export_events("ndjson", template=["who"], until="2024-01-05", with_text=True)).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert records and all(r["template_name"] == "who" and r["text"] == "x" * 100 for r in records)
+    assert max(r["timestamp"] for r in records) <= "2024-01-05T12:00:00"  # until включает весь день
+
+    table = list(csv.DictReader(io.StringIO("".join(export_events("csv", status=["duplicate"])))))
+    assert len(table) == 12
+    assert table[0]["title"] == "Документ 0"
+
+    with pytest.raises(ValueError):
+        export_events("xml")
+    with pytest.raises(ValueError):
+        export_events("csv", since="yesterday")
+
+
+def test_export_is_streamed_in_chunks(monkeypatch):
+    import rostral.export as export
+
+    monkeypatch.setattr(export, "CHUNK_BYTES", 200)
+    chunks = export.export_events("ndjson")
+    first = next(chunks)
+
+    assert 200 <= len(first) < 1000
+    assert len(list(chunks)) > 5
+
+
+def test_api_and_cli_export(tmp_path, monkeypatch):
+    import app as web
+    from typer.testing import CliRunner
+    from cli import app as cli_app
+
+    monkeypatch.chdir(project_root)
+    response = web.app.test_client().get("/api/export?format=csv&template=kgiop,who&status=pending")
+    assert response.is_streamed
+    assert response.mimetype == "text/csv"
+    assert len(list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))) == 48
+    assert web.app.test_client().get("/api/export?format=xml").status_code == 400
+
+    out = tmp_path / "events.ndjson"
+    result = CliRunner().invoke(cli_app, ["export", "-o", str(out), "--template", "kgiop", "--since", "2024-01-20"])
+    assert result.exit_code == 0, result.output
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert records and all(r["template_name"] == "kgiop" and r["timestamp"] >= "2024-01-20" for r in records)
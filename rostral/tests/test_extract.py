@@ -0,0 +1,186 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+from bs4 import BeautifulSoup
+from rostral.stages.extract import ExtractStage
+from rostral.stages.incremental import BATCH_SIZE
+from rostral.stages.selectors import compile_selector, element_text, select_blocks
+
+LISTING = """
+<html><body>
+<div class="nav"><a href="/about">About</a></div>
+<ul class="docs">
+  <li><a href="/media/uploads/userfiles/1.pdf"> Заключение <b>№1</b> <!-- draft --></a></li>
+  <li><a href="/media/uploads/userfiles/2.pdf">Заключение №2<script>var x = 1;</script></a></li>
+  <li><a href="https://disk.yandex.ru/d/abc">Экспертиза на Яндекс.Диске</a></li>
+  <li><a href="/media/uploads/userfiles/1.pdf">Заключение №1 (дубль)</a></li>
+  <li><a href="/media/uploads/userfiles/empty.pdf"></a></li>
+</ul>
+</body></html>
+"""
+
+SELECTOR = "a[href*='/media/uploads/userfiles/'], a[href*='disk.yandex.ru']"
+
+
+EVENTS = {"events": {"selector": SELECTOR, "type": "list", "fields": {"title": "self", "url": {"attr": "href"}}}}
+
+
+@pytest.fixture
+def listing(make_config):
+    """HTML-шаблон списка заключений (LISTING)"""
+    return make_config("test_listing", source={"url": "https://example.org/list/"}, extract=EVENTS)
+
+
+def test_compiled_selector_matches_soupsieve_order_and_text():
+    soup = BeautifulSoup(LISTING, "html.parser")
+    expected = [(el.get("href"), el.get_text(strip=True)) for el in soup.select(SELECTOR)]
+
+    elements = select_blocks(LISTING, {"events": compile_selector(SELECTOR)}, {"events": None})["events"]
+    actual = [(el.get("href"), element_text(el)) for el in elements]
+
+    assert actual == expected
+
+
+def test_streaming_parse_respects_limit():
+    limited = select_blocks(LISTING, {"events": compile_selector(SELECTOR)}, {"events": 2})["events"]
+    full = select_blocks(LISTING, {"events": compile_selector(SELECTOR)}, {"events": None})["events"]
+
+    assert [el.get("href") for el in limited] == [el.get("href") for el in full[:2]]
+
+
+NESTED = """
+<html><body>
+<div class="list">
+  <div class="item"><a href="/1">Один</a></div>
+  <div class="item"><a href="/2">Два</a><span><a href="/3">Три</a></span></div>
+  <div class="item"><a href="/4">Четыре</a></div>
+  <p><a href="/5">Пять</a></p>
+</div>
+<ul><li>a</li><li class="x">b</li><li>c</li></ul>
+</body></html>
+"""
+
+
+def test_streaming_selectors_with_combinators_match_full_parse():
+    soup = BeautifulSoup(NESTED, "html.parser")
+    for css in ["div.item a", "div.list > div.item + div.item a", "div.item > a", "li.x ~ li",
+                "li + li", "p a, div.item > a", "div.list a:first-child"]:
+        selector = compile_selector(css)
+        assert selector.streamable
+        expected = [element_text(el) for el in select_blocks(NESTED, {"b": selector}, {"b": None})["b"]]
+        assert expected == [el.get_text(strip=True) for el in soup.select(css)], css
+        for limit in (1, 2, 10):
+            limited = select_blocks(NESTED, {"b": selector}, {"b": limit})["b"]
+            assert [element_text(el) for el in limited] == expected[:limit], (css, limit)
+
+    assert not compile_selector("div.item:has(span)").streamable
+
+
+def test_extract_stage_records(listing):
+    result = ExtractStage(listing).run({"html": LISTING})
+
+    assert [r["title"] for r in result["events"]] == [
+        "Заключение№1",
+        "Заключение №2",
+        "Экспертиза на Яндекс.Диске",
+    ]
+    assert result["events"][0]["url_final"] == "https://example.org/media/uploads/userfiles/1.pdf"
+
+
+RSS_ITEM = """<item><title>WHO alert {i}</title><link>https://who.int/news/{i}</link>
+<description><![CDATA[<p>Outbreak {i}</p>]]></description><pubDate>Mon, 0{d} Jan 2024</pubDate></item>"""
+
+
+class CountingStream:
+    """Файловый объект, который считает прочитанные байты"""
+
+    def __init__(self, data: bytes):
+        self.data, self.pos = data, 0
+
+    def read(self, size=-1):
+        size = len(self.data) - self.pos if size is None or size < 0 else size
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += len(chunk)
+        return chunk
+
+
+@pytest.fixture
+def feed_config(make_config):
+    """RSS-шаблон ленты ВОЗ; limit, stop_after_known, selector и поля можно задать"""
+    def build(limit=None, stop_after_known=None, selector="item", fields=None):
+        fields = fields or {"title": {"attr": "title"}, "url": {"attr": "link"}, "description": {"attr": "description"}}
+        return make_config(
+            "test_feed", source={"type": "rss", "url": "https://who.int/rss.xml", "frequency": "hourly"},
+            extract={"events": {"selector": selector, "type": "list", "limit": limit,
+                                "stop_after_known": stop_after_known, "fields": fields}},
+        )
+    return build
+
+
+def make_feed(count: int) -> bytes:
+    items = "".join(RSS_ITEM.format(i=i, d=i % 9 + 1) for i in range(count))
+    return f'<?xml version="1.0" encoding="utf-8"?><rss><channel><title>WHO</title>{items}</channel></rss>'.encode()
+
+
+def test_feed_stream_stops_reading_at_limit(feed_config):
+    stream = CountingStream(make_feed(5000))
+    result = ExtractStage(feed_config(limit=3)).run({"xml_stream": stream})
+
+    assert [r["url"] for r in result["events"]] == [f"https://who.int/news/{i}" for i in range(3)]
+    assert result["events"][0]["description"] == "<p>Outbreak 0</p>"
+    assert stream.pos < len(stream.data) // 10
+
+
+def test_feed_matches_beautifulsoup_fields(feed_config):
+    feed = make_feed(4)
+    soup = BeautifulSoup(feed, "lxml-xml")
+    expected = [(el.find("title").text.strip(), el.find("link").text.strip()) for el in soup.find_all("item")]
+
+    result = ExtractStage(feed_config()).run({"xml": feed.decode()})
+
+    assert [(r["title"], r["url"]) for r in result["events"]] == expected
+
+
+def test_atom_entries_are_matched_without_namespace_prefix(feed_config):
+    atom = b"""<feed xmlns="http://www.w3.org/2005/Atom">
+      <entry><title>First</title><link href="https://e.org/1"/><id>https://e.org/1</id></entry>
+      <entry><title>Second</title><id>https://e.org/2</id></entry></feed>"""
+    config = feed_config(selector="entry", fields={"title": {"attr": "title"}, "url": {"attr": "id"}})
+
+    result = ExtractStage(config).run({"xml_stream": CountingStream(atom)})
+
+    assert [r["url"] for r in result["events"]] == ["https://e.org/1", "https://e.org/2"]
+
+
+def test_feed_stops_after_known_items(feed_config, monkeypatch):
+    known = {f"https://who.int/news/{i}" for i in range(2, 1000)}
+    lookups = []
+    monkeypatch.setattr("rostral.stages.incremental.known_urls", lambda urls: lookups.append(1) or known & set(urls))
+    stream = CountingStream(make_feed(1000))
+
+    result = ExtractStage(feed_config(stop_after_known=2)).run({"xml_stream": stream})
+
+    # известные записи отбрасываются сразу, чтение прекращается на второй подряд
+    assert [r["url"] for r in result["events"]] == [f"https://who.int/news/{i}" for i in range(2)]
+    assert len(lookups) == 1  # записи сверяются с базой пачкой, а не по одной
+    assert stream.pos < len(stream.data) // 5
+
+
+def test_html_stops_building_records_after_known_items(listing, monkeypatch):
+    links = "".join(f'<li><a href="/media/uploads/userfiles/{i}.pdf">Заключение {i}</a></li>' for i in range(1000))
+    known = {f"https://example.org/media/uploads/userfiles/{i}.pdf" for i in range(2, 1000)}
+    monkeypatch.setattr("rostral.stages.incremental.known_urls", lambda urls: known & set(urls))
+    listing.extract["events"].stop_after_known = 3
+    stage = ExtractStage(listing)
+    built = []
+    build = stage._build_record
+    monkeypatch.setattr(stage, "_build_record", lambda el, cfg, **kw: built.append(1) or build(el, cfg, **kw))
+
+    result = stage.run({"html": f"<html><body><ul>{links}</ul></body></html>"})
+
+    assert [r["title"] for r in result["events"]] == ["Заключение 0", "Заключение 1"]
+    assert len(built) <= BATCH_SIZE  # после порога остальные элементы не обрабатываются
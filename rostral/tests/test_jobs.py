@@ -0,0 +1,112 @@
+import sys
+import threading
+from types import SimpleNamespace
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import rostral.jobs as jobs
+from rostral.jobs import JobManager
+
+
+class FakeRunner:
+    """Конвейер из двух стадий; вторая ждёт сигнала, чтобы задачу можно было застать в работе"""
+
+    release = None
+    runs = 0
+
+    def __init__(self, config):
+        self.config = config
+
+    def run(self, dry_run=False, on_stage=None):
+        FakeRunner.runs += 1
+        on_stage("FetchStage", "running", 0, 2, None)
+        on_stage("FetchStage", "done", 0, 2, None)
+        on_stage("ExtractStage", "running", 1, 2, None)
+        FakeRunner.release.wait(5)
+        if self.config == "broken":
+            raise RuntimeError("boom")
+        on_stage("ExtractStage", "done", 1, 2, 3)
+        return {"events": [{}, {}, {}], "alert": {"main": "..."}}
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    FakeRunner.release = threading.Event()
+    FakeRunner.runs = 0
+    monkeypatch.setattr(jobs, "PipelineRunner", FakeRunner)
+    registry = SimpleNamespace(get=lambda path: "broken" if "broken" in path else path)
+    monkeypatch.setattr(jobs, "get_registry", lambda: registry)
+    manager = JobManager(max_workers=2)
+    yield manager
+    FakeRunner.release.set()
+    manager.shutdown()
+
+
+def test_identical_runs_are_deduplicated_while_in_flight(manager):
+    first = manager.submit("templates/a.yaml")
+    second = manager.submit("templates/./a.yaml")
+    other = manager.submit("templates/b.yaml")
+
+    assert second is first
+    assert other is not first
+
+    FakeRunner.release.set()
+    assert first.done.wait(5) and other.done.wait(5)
+    assert FakeRunner.runs == 2
+
+    # После завершения шаблон можно запустить снова
+    again = manager.submit("templates/a.yaml")
+    assert again is not first
+    assert again.done.wait(5)
+
+
+def test_job_reports_stage_progress_and_result(manager):
+    job = manager.submit("templates/a.yaml")
+    for _ in range(100):
+        if job.to_dict()["current_stage"] == "ExtractStage":
+            break
+        threading.Event().wait(0.01)
+
+    status = job.to_dict()
+    assert status["status"] == "running"
+    assert status["progress"] == 0.5
+    assert [s["status"] for s in status["stages"]] == ["done", "running"]
+
+    FakeRunner.release.set()
+    job.done.wait(5)
+    status = manager.get(job.id).to_dict()
+    assert status["status"] == "succeeded"
+    assert status["progress"] == 1.0
+    assert status["result"] == {"events": 3, "alerts": ["main"]}
+    assert status["stages"][-1]["items"] == 3
+
+
+def test_failed_job_keeps_error(manager):
+    FakeRunner.release.set()
+    job = manager.submit("templates/broken.yaml")
+    job.done.wait(5)
+
+    assert job.to_dict()["status"] == "failed"
+    assert job.to_dict()["error"] == "boom"
+
+
+def test_web_run_returns_immediately(manager, monkeypatch):
+    import app as web
+
+    monkeypatch.setattr(web, "get_job_manager", lambda: manager)
+    client = web.app.test_client()
+    template = next(p for p in sorted((project_root / "templates").rglob("*.yaml")))
+    relative = template.relative_to(project_root / "templates").as_posix()
+    monkeypatch.chdir(project_root)
+
+    response = client.post("/monitor", json={"template": relative})
+    assert response.status_code == 202
+    job_id = response.get_json()["id"]
+    assert response.headers["Location"].endswith(f"/jobs/{job_id}")
+
+    assert client.get(f"/jobs/{job_id}").get_json()["status"] in ("queued", "running")
+    assert client.get("/jobs/unknown").status_code == 404
+    assert client.post("/monitor", json={"template": "missing.yaml"}).status_code == 404
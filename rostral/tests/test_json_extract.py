@@ -0,0 +1,126 @@
+import sys
+import json
+from io import BytesIO
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+from rostral.stages.incremental import BATCH_SIZE
+from rostral.stages.json_extract import JsonExtractStage, stream_prefix
+
+
+@pytest.fixture
+def orders(make_config):
+    """JSON-шаблон указов с потоковым чтением; selector, limit и stop_after_known можно задать"""
+    def build(selector="results[*]", limit=None, stop_after_known=None):
+        return make_config(
+            "federal_register_orders",
+            source={"type": "json", "url": "https://example.gov/api.json", "fetch": {"retry_policy": {}, "stream": True}},
+            extract={"events": {
+                "selector": selector, "type": "object", "limit": limit, "stop_after_known": stop_after_known,
+                "fields": {"title": "title", "url": "pdf_url", "order_number": "executive_order_number"},
+            }},
+        )
+    return build
+
+
+def make_document(count: int) -> dict:
+    return {
+        "count": count,
+        "results": [
+            {"title": f"Order {i}", "pdf_url": f"https://example.gov/{i}.pdf", "executive_order_number": 14000 + i}
+            for i in range(count)
+        ],
+    }
+
+
+class CountingStream(BytesIO):
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.size = len(data)
+        self.read_bytes = None
+
+    def close(self):
+        self.read_bytes = self.tell()
+        super().close()
+
+
+def test_fields_are_extracted_with_compiled_expressions(orders):
+    result = JsonExtractStage(orders()).run({"json": make_document(3)})
+
+    assert [r["url"] for r in result["events"]] == [f"https://example.gov/{i}.pdf" for i in range(3)]
+    assert result["events"][0]["order_number"] == 14000
+    assert "title: Order 0" in result["events"][0]["text"]
+
+
+def test_limit_is_honored(orders):
+    result = JsonExtractStage(orders(limit=2)).run({"json": make_document(20)})
+
+    assert len(result["events"]) == 2
+
+
+@pytest.mark.parametrize("selector, prefix", [
+    ("results[*]", "results.item"),
+    ("$.data.items[*]", "data.items.item"),
+    ("[*]", "item"),
+    ("results[?type=='PRESDOCU']", None),
+])
+def test_stream_prefix(selector, prefix):
+    assert stream_prefix(selector) == prefix
+
+
+def test_streaming_mode_stops_reading_at_limit(orders):
+    pytest.importorskip("ijson")
+    stream = CountingStream(json.dumps(make_document(20000)).encode())
+
+    streamed = JsonExtractStage(orders(limit=5)).run({"json_stream": stream})
+    loaded = JsonExtractStage(orders(limit=5)).run({"json": make_document(20000)})
+
+    assert streamed == loaded
+    assert stream.read_bytes < stream.size // 10
+
+
+def test_streaming_mode_falls_back_for_complex_selectors(orders):
+    document = make_document(3)
+    stream = CountingStream(json.dumps(document).encode())
+    selector = "results[?executive_order_number > `14000`]"
+
+    result = JsonExtractStage(orders(selector=selector)).run({"json_stream": stream})
+
+    assert [r["order_number"] for r in result["events"]] == [14001, 14002]
+
+
+def test_streaming_mode_stops_after_known_items(orders, monkeypatch):
+    pytest.importorskip("ijson")
+    known = {f"https://example.gov/{i}.pdf" for i in range(3, 20000)}
+    lookups = []
+
+    def fake_known_urls(urls):
+        urls = set(urls)
+        lookups.append(len(urls))
+        return known & urls
+
+    monkeypatch.setattr("rostral.stages.incremental.known_urls", fake_known_urls)
+    stream = CountingStream(json.dumps(make_document(20000)).encode())
+
+    result = JsonExtractStage(orders(stop_after_known=10)).run({"json_stream": stream})
+
+    assert [r["url"] for r in result["events"]] == [f"https://example.gov/{i}.pdf" for i in range(3)]
+    assert len(lookups) == 1  # одна пачка — один запрос к базе
+    assert stream.read_bytes < stream.size // 10
+
+
+def test_loaded_document_stops_after_known_items(orders, monkeypatch):
+    known = {f"https://example.gov/{i}.pdf" for i in range(3, 5000)}
+    monkeypatch.setattr("rostral.stages.incremental.known_urls", lambda urls: known & set(urls))
+    stage = JsonExtractStage(orders(stop_after_known=10))
+    processed = []
+    process = stage._process_item
+    monkeypatch.setattr(stage, "_process_item", lambda item, cfg: processed.append(1) or process(item, cfg))
+
+    result = stage.run({"json": make_document(5000)})
+
+    assert [r["url"] for r in result["events"]] == [f"https://example.gov/{i}.pdf" for i in range(3)]
+    assert len(processed) <= 2 * BATCH_SIZE
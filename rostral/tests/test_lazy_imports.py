@@ -0,0 +1,58 @@
+import sys
+import subprocess
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from rostral.models import Config
+
+HEAVY_MODULES = ["fitz", "pytesseract", "PIL", "gpt4all", "openai", "bs4", "tqdm"]
+
+
+def _loaded_modules(code: str, cwd: Path) -> set:
+    script = (
+        "import sys; "
+        f"sys.path.insert(0, {str(project_root)!r}); "
+        f"{code}; "
+        "print('\\n'.join(sys.modules))"
+    )
+    proc = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=cwd, check=True)
+    return set(proc.stdout.split())
+
+
+def test_cli_import_is_lightweight(tmp_path):
+    """Импорт CLI не тянет тяжёлые зависимости и не создаёт базу"""
+    loaded = _loaded_modules("import cli", tmp_path)
+
+    assert not [m for m in HEAVY_MODULES if m in loaded]
+    assert "jmespath" not in loaded
+    assert not list(tmp_path.glob("*.db"))
+
+
+def test_json_pipeline_loads_only_needed_stages(tmp_path):
+    """JSON-шаблон без PDF не импортирует стадии OCR/GPT и их зависимости"""
+    config = {
+        "version": 1,
+        "meta": {},
+        "template_name": "json_only",
+        "source": {
+            "type": "json",
+            "url": "https://example.com/api.json",
+            "frequency": "daily",
+            "fetch": {"retry_policy": {}},
+        },
+        "extract": {"events": {"selector": "results[*]", "type": "object", "fields": {"url": "url"}}},
+    }
+    Config.model_validate(config)
+
+    loaded = _loaded_modules(
+        "from rostral.models import Config; from rostral.runner import PipelineRunner; "
+        f"PipelineRunner(Config.model_validate({config!r}))",
+        tmp_path,
+    )
+
+    assert "rostral.stages.json_extract" in loaded
+    assert "rostral.stages.processing" not in loaded
+    assert "rostral.stages.gpt" not in loaded
+    assert not [m for m in ["fitz", "pytesseract", "PIL", "gpt4all", "openai", "bs4"] if m in loaded]
@@ -0,0 +1,97 @@
+import sys
+import tracemalloc
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import rostral.runner as runner
+from rostral.runner import PipelineRunner
+from rostral.stages.base import PipelineStage
+
+MB = 1024 * 1024
+
+
+EVENTS = {"events": {"selector": "a", "type": "list", "fields": {"url": {"attr": "href"}}}}
+
+
+def test_fields_are_released_after_last_consumer(make_config):
+    config = make_config("lifecycle", extract=EVENTS, download={"allow_html": True}, processing={},
+                         gpt={"prompt": "{{ text }}"}, alert={"templates": {"main": "ok"}})
+    pipeline = PipelineRunner(config)
+    names = [s.__class__.__name__ for s in pipeline.stages]
+    released = {field: names[index] for index, fields in pipeline.releases.items() for field in fields}
+
+    assert released["html"] == released["pages"] == released["xml_stream"] == "ExtractStage"
+    assert released["record.page_text"] == "EventHTMLStage"
+    assert released["record.file_content"] == "ProcessingStage"
+    assert released["gpt_responses"] == "AlertStage"
+
+    # Без обработки PDF содержимое файлов не нужно никому после загрузки
+    pipeline = PipelineRunner(make_config("lifecycle", extract=EVENTS))
+    download = [s.__class__.__name__ for s in pipeline.stages].index("DownloadStage")
+    assert pipeline.releases[download] == ["record.file_content"]
+
+
+class FakeFetch(PipelineStage):
+    produces = ("html",)
+
+    def run(self, data):
+        return {"html": "x" * MB}
+
+
+class FakeExtract(PipelineStage):
+    consumes = ("html",)
+
+    def run(self, data):
+        assert len(data["html"]) == MB
+        return {"events": [{"url": f"https://example.org/{i}.pdf"} for i in range(20)]}
+
+
+class FakeDownload(PipelineStage):
+    produces = ("record.file_content",)
+
+    def run(self, data):
+        for record in data["events"]:
+            record["file_content"] = bytes(MB)
+        return data
+
+
+class FakeProcessing(PipelineStage):
+    consumes = ("record.file_content",)
+
+    def run(self, data):
+        for record in data["events"]:
+            record["text"] = f"{len(record['file_content'])} bytes"
+        return data
+
+
+class FakeAlert(PipelineStage):
+    def run(self, data):
+        assert "html" not in data
+        assert all("file_content" not in record for record in data["events"])
+        self.heap = tracemalloc.get_traced_memory()[0]
+        return {"alert": {"main": str(len(data["events"]))}}
+
+
+def test_runner_drops_payloads_and_reports_memory(make_config, monkeypatch):
+    monkeypatch.setattr(runner, "TRACE_MEMORY", True)
+    pipeline = PipelineRunner(make_config("lifecycle", extract=EVENTS))
+    stages = [cls(pipeline.config) for cls in (FakeFetch, FakeExtract, FakeDownload, FakeProcessing, FakeAlert)]
+    pipeline.stages = stages
+    pipeline.releases = PipelineRunner._releases(stages)
+
+    context = pipeline.run()
+
+    assert "html" not in context
+    assert context["alert"] == {"main": "20"}
+    assert [e["text"] for e in context["events"]] == [f"{MB} bytes"] * 20
+    assert stages[-1].heap < 5 * MB  # 20 МБ файлов и 1 МБ страницы уже освобождены
+
+    stats = {s["stage"]: s for s in pipeline.stage_stats}
+    assert list(stats) == ["FakeFetch", "FakeExtract", "FakeDownload", "FakeProcessing", "FakeAlert"]
+    assert stats["FakeExtract"]["released_bytes"] == MB
+    assert stats["FakeProcessing"]["released_bytes"] == 20 * MB
+    assert stats["FakeDownload"]["heap_peak"] >= 20 * MB
+    assert all(s["rss"] is None or s["rss"] > 0 for s in pipeline.stage_stats)
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,86 @@
+import sys
+import json
+import logging
+import subprocess
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from rostral.log import BufferedRotatingFileHandler, setup_logging, shutdown_logging
+
+
+def test_queue_logging_writes_batched_file(tmp_path):
+    log_file = tmp_path / "rostral.log"
+    setup_logging(level="INFO", log_file=str(log_file))
+
+    logger = logging.getLogger("rostral.stages.test")
+    for i in range(100):
+        logger.info(f"item {i}")
+    logger.debug("hidden")
+    shutdown_logging()
+
+    lines = log_file.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 100
+    assert "rostral.stages.test: item 99" in lines[-1]
+
+
+def test_json_format_keeps_extra_fields(tmp_path):
+    log_file = tmp_path / "rostral.log"
+    setup_logging(level="INFO", log_file=str(log_file), fmt="json")
+
+    logging.getLogger("rostral.runner").info("stage done", extra={"stage": "FetchStage"})
+    shutdown_logging()
+
+    record = json.loads(log_file.read_text(encoding="utf-8").splitlines()[0])
+    assert record["message"] == "stage done"
+    assert record["stage"] == "FetchStage"
+    assert record["logger"] == "rostral.runner"
+
+
+def test_log_file_is_appended_not_truncated(tmp_path):
+    log_file = tmp_path / "rostral.log"
+    log_file.write_text("previous run\n", encoding="utf-8")
+
+    setup_logging(level="INFO", log_file=str(log_file))
+    logging.getLogger("rostral").warning("new run")
+    shutdown_logging()
+
+    content = log_file.read_text(encoding="utf-8")
+    assert content.startswith("previous run\n")
+    assert "new run" in content
+
+
+def test_rotation_counts_encoded_bytes(tmp_path):
+    log_file = tmp_path / "rostral.log"
+    handler = BufferedRotatingFileHandler(str(log_file), maxBytes=2000, backupCount=20, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    for i in range(100):
+        handler.emit(logging.LogRecord("rostral", logging.INFO, "", 0, f"📄 Заключение ГИКЭ №{i}", None, None))
+    handler.close()
+
+    files = sorted(tmp_path.glob("rostral.log*"))
+    assert len(files) > 1
+    assert all(f.stat().st_size <= 2000 for f in files)
+
+
+def test_importing_app_does_not_configure_logging(tmp_path):
+    code = f"import sys; sys.path.insert(0, {str(project_root)!r}); import app"
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, check=True, capture_output=True)
+
+    assert not (tmp_path / "rostral.log").exists()
+
+
+def test_app_configures_logging_once_on_first_request(monkeypatch):
+    import app as web
+
+    calls = []
+    monkeypatch.setattr(web, "APP_LOGGING", True)
+    monkeypatch.setattr(web, "_logging_ready", False)
+    monkeypatch.setattr(web, "setup_logging", lambda: calls.append(1))
+
+    client = web.app.test_client()
+    client.get("/jobs")
+    client.get("/jobs")
+
+    assert calls == [1]  # flask run / WSGI: __main__ не выполняется, логи всё равно пишутся
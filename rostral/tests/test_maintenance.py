@@ -0,0 +1,134 @@
+import gzip
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import rostral.db as db
+from rostral.cache import _ttls, cached_transform, evict_stale, get_many, put_many, reset_cache
+from rostral.db import known_urls, save_event
+from rostral.maintenance import optimize_database, run_maintenance
+from rostral.models import Event, EventText, TransformCache
+from sqlalchemy import text
+
+TEMPLATE = """
+version: 1
+template_name: {name}
+meta: {{name: {name}}}
+source: {{type: html, url: "https://example.org/", frequency: daily, fetch: {{retry_policy: {{attempts: 1, backoff: 0}}}}}}
+retention: {retention}
+"""
+
+
+pytestmark = pytest.mark.usefixtures("temp_db")
+
+
+@pytest.fixture
+def templates(tmp_path):
+    folder = tmp_path / "templates"
+    folder.mkdir()
+    (folder / "old.yaml").write_text(TEMPLATE.format(name="old", retention="{keep_days: 30}"), encoding="utf-8")
+    (folder / "few.yaml").write_text(TEMPLATE.format(name="few", retention="{keep_events: 3, archive: false}"),
+                                     encoding="utf-8")
+    return folder
+
+
+def _save(template: str, n: int, day: int) -> None:
+    assert save_event({"url": f"https://example.org/{template}/{n}.pdf", "title": f"{template} {n}",
+                       "text": "текст " * 100, "excerpt": "текст", "template_name": template})
+    session = db.Session()
+    session.query(Event).filter_by(url=f"https://example.org/{template}/{n}.pdf").update(
+        {"timestamp": datetime(2024, 1, day)})
+    session.commit()
+    session.close()
+
+
+def test_retention_archives_and_keeps_dedup_keys(tmp_path, templates):
+    for i in range(4):
+        _save("old", i, day=1 + i * 10)  # 1, 11, 21, 31 января
+        _save("few", i, day=1)
+    _save("other", 0, day=1)  # без политики — не трогается
+
+    report = run_maintenance(templates_dir=templates, archive_dir=tmp_path / "archive",
+                             now=datetime(2024, 2, 15))
+
+    assert report["templates"]["old"] == {"expired": 2, "archived": 2, "file": report["templates"]["old"]["file"]}
+    with gzip.open(report["templates"]["old"]["file"], "rt", encoding="utf-8") as f:
+        archived = [json.loads(line) for line in f]
+    assert [r["title"] for r in archived] == ["old 0", "old 1"]
+    assert archived[0]["text"] == "текст " * 100 and archived[0]["excerpt"] == "текст"
+    assert report["templates"]["few"]["expired"] == 1 and report["templates"]["few"]["file"] is None
+
+    session = db.Session()
+    try:
+        left = sorted(e.title for e in session.query(Event))
+        assert left == ["few 1", "few 2", "few 3", "old 2", "old 3", "other 0"]
+        assert session.query(EventText).count() == 2 * len(left)
+    finally:
+        session.close()
+
+    # Архивированный документ не считается новым
+    assert known_urls(["https://example.org/old/0.pdf", "https://example.org/new.pdf"]) == {"https://example.org/old/0.pdf"}
+    assert not save_event({"url": "https://example.org/few/0.pdf", "title": "few 0"})
+
+
+def test_dry_run_changes_nothing(tmp_path, templates):
+    for i in range(5):
+        _save("few", i, day=1)
+
+    report = run_maintenance(templates_dir=templates, archive_dir=tmp_path / "archive", dry_run=True)
+
+    assert report["templates"]["few"]["expired"] == 2
+    assert not (tmp_path / "archive").exists()
+    session = db.Session()
+    assert session.query(Event).count() == 5
+    session.close()
+
+
+def test_evicts_stale_cache_rows():
+    @cached_transform("short_lived", ttl=60)
+    def short_lived(value):
+        return value
+
+    put_many("t", "short_lived", {"a": "1"})
+    put_many("t", "forever", {"b": "2"})
+    session = db.Session()
+    session.query(TransformCache).update({"updated_at": time.time() - 3600})
+    session.commit()
+    session.close()
+    put_many("t", "short_lived", {"fresh": "3"})
+
+    assert evict_stale(max_age_days=30) == {"short_lived": 1}
+    assert evict_stale(max_age_days=1 / 48) == {"forever": 1}  # старше получаса
+    reset_cache()
+    assert get_many("t", "short_lived", ["a", "fresh"]) == {"fresh": "3"}
+    _ttls.pop("short_lived")
+
+
+def test_switches_sqlite_to_incremental_vacuum():
+    engine = db.get_engine()
+    with engine.begin() as conn:
+        conn.execute(text("PRAGMA auto_vacuum = NONE"))
+        conn.execute(text("VACUUM"))
+        assert conn.execute(text("PRAGMA auto_vacuum")).scalar() == 0
+
+    assert optimize_database()["vacuum"] == "full"
+
+    with engine.begin() as conn:
+        assert conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2
+        conn.execute(Event.__table__.insert(), [
+            {"event_id": f"e{i}", "url": f"https://example.org/{i}", "title": "x" * 400} for i in range(2000)
+        ])
+    with engine.begin() as conn:
+        conn.execute(Event.__table__.delete())
+
+    report = optimize_database()
+    assert report["vacuum"] == "incremental" and report["freed_bytes"] > 0
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA freelist_count")).scalar() == 0
+        assert conn.execute(text("SELECT count(*) FROM sqlite_stat1")).scalar() >= 0
@@ -0,0 +1,128 @@
+import random
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import rostral.db as db
+import rostral.stages.gpt as gpt
+from rostral.db import save_event
+from rostral.models import Event, EventFingerprint
+from rostral.neardup import NearDuplicateIndex, minhash, pack, similarity, unpack
+from rostral.stages.gpt import GPTStage
+from rostral.stages.processing import ProcessingStage
+
+
+pytestmark = pytest.mark.usefixtures("temp_db")
+
+
+WORDS = ("решение объект культурного наследия здание улица дом проект экспертиза "
+         "реставрация приспособление фасад кровля охрана территория заключение акт").split()
+
+
+def document(seed: int, length: int = 300) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) + str(rng.randrange(50)) for _ in range(length))
+
+
+def edited(text: str, every: int = 60) -> str:
+    words = text.split()
+    for i in range(0, len(words), every):
+        words[i] = "исправлено"
+    return " ".join(words)
+
+
+def near_duplicates(policy="link") -> dict:
+    return {"processing": {"near_duplicates": policy}, "gpt": {"prompt": "{{ text }}"}}
+
+
+def test_signature_separates_edits_from_other_documents():
+    original = minhash(document(1))
+
+    assert similarity(original, minhash(edited(document(1)))) >= 0.75
+    assert similarity(original, minhash(document(2))) < 0.3
+    assert minhash("слишком короткий текст") is None
+
+
+def test_signature_blob_has_fixed_byte_order():
+    signature = minhash(document(3))
+    assert unpack(pack(signature)) == signature
+    # БД общая для машин с разным порядком байт — формат задан явно
+    assert pack([1, 0x01020304]) == b"\x01\x00\x00\x00\x04\x03\x02\x01"
+
+
+def test_saved_fingerprint_is_found_and_duplicates_map_to_original():
+    text = document(1)
+    save_event({"url": "https://example.org/a.pdf", "title": "A", "text": text, "minhash": minhash(text)})
+    original_id = db.get_event_hash({"url": "https://example.org/a.pdf", "title": "A"})
+    copy = edited(text)
+    save_event({"url": "https://example.org/b.pdf", "title": "B", "text": copy,
+                "minhash": minhash(copy), "duplicate_of": original_id})
+
+    index = NearDuplicateIndex()
+    assert index.find(minhash(edited(text, every=45))) == original_id
+    assert index.find(minhash(document(3))) is None
+
+
+def test_processing_links_and_skips_near_duplicates(make_config):
+    stage = ProcessingStage(make_config("test_neardup", **near_duplicates("link")))
+    stage.near_duplicates = NearDuplicateIndex()
+    meta = {"near_duplicates": 0}
+    first = {"event_id": "first", "url": "https://example.org/1.pdf", "text": document(1)}
+    second = {"event_id": "second", "url": "https://example.org/2.pdf", "text": edited(document(1))}
+
+    assert stage._check_near_duplicate(first, meta)
+    assert stage._check_near_duplicate(second, meta)
+    assert second["duplicate_of"] == "first"
+    assert "duplicate_of" not in first
+
+    stage = ProcessingStage(make_config("test_neardup", **near_duplicates("skip")))
+    stage.near_duplicates = NearDuplicateIndex()
+    third = {"event_id": "third", "url": "https://example.org/3.pdf", "title": "3", "text": edited(document(1), 40)}
+    assert stage._check_near_duplicate(dict(first), meta)
+    assert not stage._check_near_duplicate(third, meta)
+    assert meta["near_duplicates"] == 2
+
+    session = db.Session()
+    try:
+        assert session.query(Event.status).filter(Event.url == third["url"]).scalar() == "duplicate"
+    finally:
+        session.close()
+
+
+def test_dry_run_skip_saves_nothing(make_config):
+    stage = ProcessingStage(make_config("test_neardup", **near_duplicates("skip")))
+    stage.dry_run = True
+    stage.near_duplicates = NearDuplicateIndex()
+    meta = {"near_duplicates": 0}
+    original = {"event_id": "first", "url": "https://example.org/1.pdf", "text": document(1)}
+    copy = {"event_id": "copy", "url": "https://example.org/2.pdf", "title": "2", "text": edited(document(1))}
+
+    assert stage._check_near_duplicate(original, meta)
+    assert not stage._check_near_duplicate(copy, meta)
+    assert meta["near_duplicates"] == 1
+
+    session = db.Session()
+    try:
+        assert session.query(Event).count() == 0
+        assert session.query(EventFingerprint).count() == 0
+    finally:
+        session.close()
+
+
+def test_gpt_reuses_answer_of_original(make_config, monkeypatch):
+    prompts = []
+    monkeypatch.setattr(gpt, "gpt_texts_for", lambda ids: {"stored": "Объект: из базы"})
+    monkeypatch.setattr(GPTStage, "_get_gpt_response", lambda self, prompt: prompts.append(prompt) or "Объект: новый")
+    events = [
+        {"event_id": "fresh", "text": document(1)},
+        {"event_id": "copy", "text": edited(document(1)), "duplicate_of": "fresh"},
+        {"event_id": "old-copy", "text": document(2), "duplicate_of": "stored"},
+    ]
+
+    result = GPTStage(make_config("test_neardup", **near_duplicates())).run({"events": events})
+
+    assert len(prompts) == 1
+    assert [e["gpt_text"] for e in result["events"]] == ["Объект: новый", "Объект: новый", "Объект: из базы"]
@@ -0,0 +1,159 @@
+import sys
+import threading
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+from rostral.stages.json_extract import JsonExtractStage
+from rostral.stages.extract import ExtractStage
+from rostral.stages.pagination import PageStream, with_query_param
+
+
+RESULTS = {"events": {"selector": "results[*]", "type": "object", "fields": {"url": "url", "title": "title"}}}
+
+
+@pytest.fixture
+def paged(make_config):
+    """Шаблон с пагинацией; по умолчанию извлекает results[*] из JSON"""
+    def build(source_type, pagination_cfg=None, endpoints=None, extract=RESULTS):
+        source = {"type": source_type, "url": "https://example.org/api?q=x",
+                  "pagination": pagination_cfg, "endpoints": endpoints}
+        return make_config("test_pages", source=source, extract=extract)
+    return build
+
+
+def json_site(pages):
+    """Фейковый API: ?page=N → N-я страница результатов; записывает запрошенные URL"""
+    requested = []
+    lock = threading.Lock()
+
+    def fetch(url):
+        with lock:
+            requested.append(url)
+        page = int(parse_qs(urlsplit(url).query).get("page", ["1"])[0])
+        items = pages[page - 1] if page <= len(pages) else []
+        return {"results": [{"url": f"https://example.org/{i}", "title": f"Item {i}"} for i in items]}
+
+    return fetch, requested
+
+
+def test_with_query_param_replaces_value():
+    assert with_query_param("https://x.org/a?page=1&q=y", "page", 3) == "https://x.org/a?q=y&page=3"
+
+
+def test_page_style_streams_pages_in_order_and_stops_on_empty(paged, monkeypatch):
+    monkeypatch.setattr("rostral.stages.incremental.known_urls", lambda urls: set())
+    config = paged("json", {"style": "page", "max_pages": 10, "concurrency": 3})
+    fetch, requested = json_site([[1, 2], [3, 4], [5]])
+
+    result = JsonExtractStage(config).run({"pages": PageStream(config.source.url, config.source, fetch)})
+
+    assert [r["url"] for r in result["events"]] == [f"https://example.org/{i}" for i in range(1, 6)]
+    # пустая 4-я страница останавливает обход: запрошено не больше окна сверх неё
+    assert len(requested) <= 4 + 3
+
+
+def test_pagination_stops_on_page_of_known_items(paged, monkeypatch):
+    known = {"https://example.org/3", "https://example.org/4"}
+    monkeypatch.setattr("rostral.stages.incremental.known_urls", lambda urls: known & set(urls))
+    config = paged("json", {"style": "page", "max_pages": 10, "concurrency": 1})
+    fetch, requested = json_site([[1, 2], [3, 4], [5, 6], [7, 8]])
+
+    result = JsonExtractStage(config).run({"pages": PageStream(config.source.url, config.source, fetch)})
+
+    assert [r["url"] for r in result["events"]][-1] == "https://example.org/4"
+    assert len(requested) <= 3
+
+
+def test_limit_spans_pages(paged, monkeypatch):
+    monkeypatch.setattr("rostral.stages.incremental.known_urls", lambda urls: set())
+    config = paged("json", {"style": "offset", "param": "offset", "start": 0, "page_size": 2,
+                            "size_param": "per_page", "max_pages": 5, "concurrency": 1},
+                   extract={"events": {"selector": "results[*]", "type": "object", "limit": 3,
+                                       "fields": {"url": "url", "title": "title"}}})
+    requested = []
+
+    def fetch(url):
+        requested.append(url)
+        offset = int(parse_qs(urlsplit(url).query)["offset"][0])
+        assert parse_qs(urlsplit(url).query)["per_page"] == ["2"]
+        return {"results": [{"url": f"https://example.org/{i}", "title": "t"} for i in (offset, offset + 1)]}
+
+    result = JsonExtractStage(config).run({"pages": PageStream(config.source.url, config.source, fetch)})
+
+    assert [r["url"] for r in result["events"]] == [f"https://example.org/{i}" for i in range(3)]
+    assert len(requested) == 2
+
+
+def test_cursor_style_follows_next_cursor(paged, monkeypatch):
+    monkeypatch.setattr("rostral.stages.incremental.known_urls", lambda urls: set())
+    config = paged("json", {"style": "cursor", "param": "cursor", "next": "meta.next"})
+    chain = {None: ("a", [1]), "a": ("b", [2]), "b": (None, [3])}
+
+    def fetch(url):
+        cursor = parse_qs(urlsplit(url).query).get("cursor", [None])[0]
+        next_cursor, items = chain[cursor]
+        return {"meta": {"next": next_cursor},
+                "results": [{"url": f"https://example.org/{i}", "title": "t"} for i in items]}
+
+    result = JsonExtractStage(config).run({"pages": PageStream(config.source.url, config.source, fetch)})
+
+    assert [r["url"] for r in result["events"]] == [f"https://example.org/{i}" for i in (1, 2, 3)]
+
+
+def test_html_next_link_and_endpoints(paged, monkeypatch):
+    monkeypatch.setattr("rostral.stages.incremental.known_urls", lambda urls: set())
+    site = {
+        "https://example.org/api?q=x": '<a class="doc" href="/d/1">One</a><a rel="next" href="/list/2">next</a>',
+        "https://example.org/list/2": '<a class="doc" href="/d/2">Two</a><a class="doc" href="/d/1">One</a>',
+        "https://example.org/archive": '<a class="doc" href="/d/3">Three</a>',
+    }
+    config = paged(
+        "html", {"style": "next_link", "next": "a[rel=next]"},
+        endpoints={"archive": "https://example.org/archive"},
+        extract={"events": {"selector": "a.doc", "type": "list",
+                            "fields": {"title": "self", "url": {"attr": "href"}}}},
+    )
+
+    result = ExtractStage(config).run({"pages": PageStream(config.source.url, config.source, site.__getitem__)})
+
+    assert [r["url_final"] for r in result["events"]] == [
+        "https://example.org/d/1", "https://example.org/d/2", "https://example.org/d/3"
+    ]
+
+
+def test_page_of_repeated_items_does_not_stop_pagination(paged, monkeypatch):
+    monkeypatch.setattr("rostral.stages.incremental.known_urls", lambda urls: set())
+    pages = ['<a class="doc" href="/d/1">One</a><a class="doc" href="/d/2">Two</a>',
+             '<a class="doc" href="/d/2">Two</a><a class="doc" href="/d/1">One</a>',  # только повторы
+             '<a class="doc" href="/d/3">Three</a>',
+             '']
+    config = paged(
+        "html", {"style": "page", "max_pages": 10, "concurrency": 1},
+        extract={"events": {"selector": "a.doc", "type": "list", "fields": {"title": "self", "url": {"attr": "href"}}}},
+    )
+
+    def fetch(url):
+        page = int(parse_qs(urlsplit(url).query).get("page", ["1"])[0])
+        return pages[page - 1] if page <= len(pages) else ""
+
+    result = ExtractStage(config).run({"pages": PageStream(config.source.url, config.source, fetch)})
+
+    assert [r["url"] for r in result["events"]] == ["/d/1", "/d/2", "/d/3"]
+
+
+def test_incremental_blocks_stop_pagination(paged, monkeypatch):
+    known = {f"https://example.org/{i}" for i in range(3, 100)}
+    monkeypatch.setattr("rostral.stages.incremental.known_urls", lambda urls: known & set(urls))
+    config = paged("json", {"style": "page", "max_pages": 10, "concurrency": 1, "stop_when_known": False},
+                   extract={"events": {"selector": "results[*]", "type": "object", "stop_after_known": 3,
+                                       "fields": {"url": "url", "title": "title"}}})
+    fetch, requested = json_site([[1, 2], [3, 4], [5, 6], [7, 8]])
+
+    result = JsonExtractStage(config).run({"pages": PageStream(config.source.url, config.source, fetch)})
+
+    assert [r["url"] for r in result["events"]] == ["https://example.org/1", "https://example.org/2"]
+    assert len(requested) == 3
@@ -0,0 +1,124 @@
+import sys
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import rostral.http_client as http_client
+import rostral.politeness as politeness
+import rostral.stages.download as download
+from rostral.politeness import HostScheduler, parse_retry_after
+from rostral.stages.download import DownloadStage
+
+
+def run_in_threads(scheduler, urls):
+    starts = {}
+    lock = threading.Lock()
+
+    def request(url):
+        with scheduler.slot(url):
+            with lock:
+                starts.setdefault(politeness.host_of(url), []).append(time.monotonic())
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=request, args=(url,)) for url in urls]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return starts
+
+
+def test_same_host_is_spaced_and_hosts_run_in_parallel():
+    scheduler = HostScheduler(min_interval=0.2, max_concurrency=1, respect_robots=False)
+    urls = [f"https://a.example/{i}.pdf" for i in range(3)] + [f"https://b.example/{i}.pdf" for i in range(3)]
+
+    started = time.monotonic()
+    starts = run_in_threads(scheduler, urls)
+    elapsed = time.monotonic() - started
+
+    for host_starts in starts.values():
+        gaps = [b - a for a, b in zip(sorted(host_starts), sorted(host_starts)[1:])]
+        assert all(gap >= 0.19 for gap in gaps)
+    assert elapsed < 6 * 0.2  # хосты не ждут друг друга
+
+
+def test_host_overrides_and_crawl_delay(monkeypatch):
+    class Robots:
+        ok = True
+        text = "User-agent: *\nCrawl-delay: 3\n"
+
+    monkeypatch.setattr(http_client.requests, "get", lambda *args, **kwargs: Robots())
+    scheduler = HostScheduler(min_interval=0.5, hosts={"fast.example": {"min_interval": 0.1, "max_concurrency": 4}})
+
+    assert scheduler._state("https://slow.example/doc.pdf").min_interval == 3
+    assert scheduler._state("https://fast.example/doc.pdf").min_interval == 3  # robots сильнее настройки
+
+
+def test_defer_postpones_next_request():
+    scheduler = HostScheduler(min_interval=0, respect_robots=False)
+    scheduler.defer("https://a.example/x", 0.2)
+
+    start = time.monotonic()
+    with scheduler.slot("https://a.example/y"):
+        pass
+    with scheduler.slot("https://other.example/y"):
+        pass
+
+    assert 0.19 <= time.monotonic() - start < 0.4
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after(None) is None
+    future = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < parse_retry_after(future) <= 30
+
+
+class FakeDownload:
+    def __init__(self, status=200, headers=None, body=b"%PDF-1.4"):
+        self.status_code = status
+        self.headers = headers or {}
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise download.requests.HTTPError(f"{self.status_code}")
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+
+def test_download_stage_honors_retry_after_and_downloads_all(make_config, monkeypatch):
+    attempts = {}
+    lock = threading.Lock()
+
+    def fake_get(url, **kwargs):
+        with lock:
+            attempts[url] = attempts.get(url, 0) + 1
+            first = attempts[url] == 1
+        if url.endswith("busy.pdf") and first:
+            return FakeDownload(429, {"Retry-After": "0"})
+        return FakeDownload()
+
+    monkeypatch.setattr(download.requests, "get", fake_get)
+    config = make_config("test_download", download={"min_interval": 0, "respect_robots": False, "workers": 4})
+    stage = DownloadStage(config)
+    stage.retry_delay = 0
+    records = [{"url": f"https://h{i % 2}.example/{i}.pdf", "title": str(i)} for i in range(4)]
+    records.append({"url": "https://h0.example/busy.pdf", "title": "busy"})
+
+    result = stage.run({"events": records})
+
+    assert [r["download_status"] for r in result["events"]] == ["success"] * 5
+    assert attempts["https://h0.example/busy.pdf"] == 2
@@ -0,0 +1,100 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+from rostral.predicates import PredicateError, compile_predicate
+from rostral.registry import TemplateError, compile_config
+from rostral.stages.normalize import NormalizeStage
+
+
+def days_before(days: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+
+def test_expression_language():
+    item = {
+        "title": "Акт ГИКЭ по ул. Садовой", "price": "1 990 ₽", "status": "new", "text": "",
+        "published": days_before(2), "pubDate": "Mon, 01 Jan 2018 10:00:00 GMT",
+        "meta": {"region": "spb"}, "tags": ["pdf", "gike"],
+    }
+    cases = {
+        'price < 2000 and price >= 1990': True,
+        'number(price) == 1990': True,
+        'status in ["new", "updated"]': True,
+        'status not in {"new"}': False,
+        '"gike" in tags and "садовой" in title': True,
+        'matches(title, "акт\\\\s+гикэ")': True,
+        'date(published) >= days_ago(7)': True,
+        'days_ago(30) <= pubDate <= now()': False,
+        'meta.region == "spb" and meta.missing == None': True,
+        'not text or len(text) > 100': True,
+        'missing > 5': False,  # отсутствующее поле не ломает сравнение
+        'documents': False,    # именованный фильтр: нужен текст без ошибки
+    }
+    assert {expr: compile_predicate(expr)(item) for expr in cases} == cases
+    assert compile_predicate("documents")({"text": "…", "error": None})
+    assert compile_predicate("price < 2000") is compile_predicate("price < 2000")  # компилируется один раз
+
+    for bad in ("__import__('os').system('id')", "title.upper()", "x +", "matches(title, '(')", "price ** 2"):
+        with pytest.raises(PredicateError):
+            compile_predicate(bad)
+
+
+EVENTS = {"events": {"selector": "a", "type": "list", "fields": {"url": {"attr": "href"}}}}
+
+
+def filtering(filters) -> dict:
+    return {"extract": EVENTS, "normalize": {"rules": [{"field": "events", "filters": filters}]}}
+
+
+def test_normalize_runs_all_filters_in_one_pass_with_stats(make_config):
+    events = [
+        {"event_id": 1, "text": "Заключение WHO", "price": "500"},
+        {"event_id": 1, "text": "Заключение WHO", "price": "500"},     # дубль
+        {"event_id": 2, "text": "[ERROR: broken]", "error": "broken"},  # не документ
+        {"event_id": 3, "text": "other", "price": "700"},               # не проходит condition
+        {"event_id": 4, "text": "who report", "price": "5 000"},        # дорого
+        {"event_id": 5, "text": "WHO", "price": "300"},
+    ]
+    stage = NormalizeStage(make_config("predicates", **filtering([
+        {"unique": "event_id"},
+        {"filter": "documents", "condition": "(WHO)"},
+        {"filter": "price < 1000"},
+    ])))
+
+    get_calls = []
+
+    class CountingDict(dict):
+        def get(self, *args):
+            get_calls.append(args[0])
+            return super().get(*args)
+
+    result = stage.run({"events": [CountingDict(e) for e in events]})
+
+    assert [e["event_id"] for e in result["events"]] == [1, 5]
+    stats = result["__normalize_meta__"]["filter_stats"]["events"]
+    assert (stats["initial"], stats["final"]) == (6, 2)
+    assert [(f["filter"], f["removed"]) for f in stats["filters"]] == [
+        ("unique: event_id", 1), ("filter: documents", 1), ("condition: (WHO)", 1), ("filter: price < 1000", 1),
+    ]
+    # один проход: запись отсеивается первой не прошедшей проверкой и больше не читается
+    assert get_calls.count("event_id") == 6 and get_calls.count("price") == 3
+
+    # пачки одного запуска делят множество unique; новый запуск (reset) начинает с чистого
+    assert stage.run({"events": [dict(events[5])]})["events"] == []
+    stage.reset()
+    again = stage.run({"events": events[:2]})
+    assert len(again["events"]) == 1
+    assert again["__normalize_meta__"]["filter_stats"]["events"]["filters"][0]["removed"] == 1
+
+
+def test_bad_filter_is_reported_by_registry(make_config):
+    with pytest.raises(TemplateError) as error:
+        compile_config(make_config("predicates", **filtering([{"filter": "price <"}, {"condition": "(WHO"}])))
+    assert [p.split(":")[0] for p in error.value.problems] == [
+        "normalize.rules.0.filters.0.filter", "normalize.rules.0.filters.1.condition",
+    ]
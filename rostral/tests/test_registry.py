@@ -0,0 +1,155 @@
+import os
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import requests
+from rostral.models import GPTConfig
+from rostral.registry import TemplateError, TemplateRegistry
+from rostral.runner import PipelineRunner
+
+TEMPLATE = """
+version: 1
+template_name: {name}
+meta: {{}}
+source:
+  type: {type}
+  url: "https://example.org/{{{{ now().year }}}}/"
+  frequency: daily
+  fetch: {{retry_policy: {{attempts: 1, backoff: 0}}}}
+extract:
+  events:
+    selector: "{selector}"
+    type: list
+    fields:
+      title: "self"
+      url: {{attr: href, transform_type: {transform}}}
+processing:
+  extract_regex: ["{regex}"]
+alert:
+  templates:
+    main: "{alert}"
+"""
+
+GOOD = dict(type="html", selector="a.doc", transform="smart_url", regex="адрес[:\\\\s]+(.+)",
+            alert="{{ events|length }} new")
+
+
+def _write(path: Path, name: str = "sample", **overrides) -> Path:
+    path.write_text(TEMPLATE.format(name=name, **{**GOOD, **overrides}), encoding="utf-8")
+    return path
+
+
+def _touch(path: Path, step: int = 1) -> None:
+    # Гарантированно другой mtime, даже на ФС с грубым разрешением времени
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + step * 1_000_000_000))
+
+
+def test_repository_templates_compile():
+    registry = TemplateRegistry(project_root / "templates")
+    report = registry.validate()
+
+    assert report, "no templates found"
+    assert {str(p): e for p, e in report.items() if e} == {}
+
+
+def test_broken_template_lists_all_problems_before_network(tmp_path, monkeypatch):
+    def no_network(*args, **kwargs):
+        raise AssertionError("network I/O for a broken template")
+
+    monkeypatch.setattr(requests, "get", no_network)
+    monkeypatch.setattr(requests.Session, "request", no_network)
+    path = _write(tmp_path / "broken.yaml", selector="a[href", transform="no_such", regex="(unclosed",
+                  alert="{% for e in events %}")
+
+    with pytest.raises(TemplateError) as error:
+        TemplateRegistry(tmp_path).get(path)
+
+    problems = error.value.problems
+    assert [p.split(":")[0] for p in problems] == [
+        "extract.events.selector",
+        "extract.events.fields.url.transform_type",
+        "processing.extract_regex.0",
+        "alert.templates.main",
+    ]
+    assert "CSS selector" in problems[0] and "smart_url" in problems[1]
+
+    # Конфиг, собранный в коде, проверяется при создании конвейера
+    config = TemplateRegistry(tmp_path).get(_write(tmp_path / "ok.yaml")).config.model_copy(deep=True)
+    config.gpt = GPTConfig(prompt="{{ text")
+    with pytest.raises(TemplateError, match="gpt.prompt"):
+        PipelineRunner(config)
+
+
+def test_runner_does_not_recompile_templates_from_registry(tmp_path, monkeypatch):
+    import rostral.runner as runner
+
+    compiled = TemplateRegistry(tmp_path).get(_write(tmp_path / "ok.yaml"))
+    monkeypatch.setattr(runner, "compile_config", lambda config: pytest.fail("template compiled again"))
+
+    pipeline = PipelineRunner(compiled)
+
+    # конвейер работает с копией: стадии меняют конфиг, кэш реестра остаётся прежним
+    assert pipeline.config == compiled.config and pipeline.config is not compiled.config
+
+
+def test_schema_errors_are_reported_per_field(tmp_path):
+    path = tmp_path / "schema.yaml"
+    path.write_text("version: one\nmeta: {}\nsource: {type: json}\n", encoding="utf-8")
+
+    with pytest.raises(TemplateError) as error:
+        TemplateRegistry(tmp_path).get(path)
+
+    assert {p.split(":")[0] for p in error.value.problems} >= {
+        "version", "template_name", "source.url", "source.frequency", "source.fetch",
+    }
+
+
+def test_cache_by_mtime_and_hot_reload(tmp_path, monkeypatch):
+    registry = TemplateRegistry(tmp_path)
+    path = _write(tmp_path / "a.yaml", name="first")
+    compiled = registry.get(path)
+
+    reads = []
+    original = Path.read_text
+    monkeypatch.setattr(Path, "read_text", lambda self, *a, **kw: reads.append(self) or original(self, *a, **kw))
+
+    assert registry.get(path) is compiled
+    assert registry.get(str(path)) is compiled
+    assert reads == []
+
+    _write(path, name="second")
+    _touch(path)
+    assert registry.get(path).name == "second"
+    assert len(reads) == 1
+
+    # Сломанная версия кэшируется как ошибка; исправленная снова подхватывается
+    _write(path, name="second", selector="a[")
+    _touch(path, 2)
+    for _ in range(2):
+        with pytest.raises(TemplateError):
+            registry.get(path)
+    assert len(reads) == 2
+    _write(path, name="third")
+    _touch(path, 3)
+    assert registry.get(path).name == "third"
+
+
+def test_listing_follows_new_files_and_load_returns_copies(tmp_path):
+    registry = TemplateRegistry(tmp_path)
+    _write(tmp_path / "b.yaml", name="b")
+    assert [p.name for p in registry.paths()] == ["b.yaml"]
+
+    (tmp_path / "nested").mkdir()
+    _write(tmp_path / "nested" / "a.yml", name="a")
+    _write(tmp_path / "a.yaml", name="a2", selector="a[")
+    assert [p.name for p in registry.paths()] == ["a.yaml", "b.yaml", "a.yml"]
+    assert [t.name for t in registry.templates()] == ["b", "a"]
+
+    config = registry.load(tmp_path / "b.yaml")
+    config.source.url = "https://example.org/rendered"
+    assert registry.load(tmp_path / "b.yaml").source.url != config.source.url
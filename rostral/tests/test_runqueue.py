@@ -0,0 +1,121 @@
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import rostral.db as db
+import rostral.runqueue as runqueue
+from rostral.db import database_url
+from rostral.models import Base, QueuedRun
+from rostral.runqueue import Worker, claim, enqueue, fail, heartbeat, requeue_expired, schedule_due
+
+POSTGRES_URL = os.getenv("ROSTRAL_TEST_POSTGRES_URL")
+
+TEMPLATE = """
+version: 1
+template_name: {name}
+meta: {{name: {name}}}
+source: {{type: html, url: "https://example.org/", frequency: {frequency}, fetch: {{retry_policy: {{attempts: 1, backoff: 0}}}}}}
+"""
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def backend(request, tmp_path, monkeypatch):
+    if request.param == "postgresql":
+        if not POSTGRES_URL:
+            pytest.skip("ROSTRAL_TEST_POSTGRES_URL is not set")
+        monkeypatch.setenv("ROSTRAL_DB_URL", POSTGRES_URL)
+        url = database_url()
+    else:
+        url = f"sqlite:///{tmp_path / 'cache.db'}"
+    monkeypatch.setattr(db, "DB_URL", url)
+    monkeypatch.setattr(db, "_engine", None)
+    monkeypatch.setattr(db, "_session_factory", None)
+    engine = db.get_engine()
+    if request.param == "postgresql":
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+    yield request.param
+    engine.dispose()
+
+
+def _runs():
+    session = db.Session()
+    try:
+        return {r.template_name: r for r in session.query(QueuedRun).order_by(QueuedRun.id)}
+    finally:
+        session.close()
+
+
+def test_scheduler_enqueues_due_templates_once(backend, tmp_path):
+    folder = tmp_path / "templates"
+    folder.mkdir()
+    (folder / "a.yaml").write_text(TEMPLATE.format(name="a", frequency="hourly"), encoding="utf-8")
+    (folder / "b.yaml").write_text(TEMPLATE.format(name="b", frequency="30m"), encoding="utf-8")
+    now = runqueue._now()
+
+    assert schedule_due(folder, now=now) == ["a", "b"]
+    assert schedule_due(folder, now=now + timedelta(hours=2)) == []  # ещё в очереди
+
+    worker = Worker(execute=lambda path: {"events": 0})
+    assert worker.run_once() == "succeeded" and worker.run_once() == "succeeded"
+    assert worker.run_once() is None
+    assert schedule_due(folder, now=now + timedelta(minutes=45)) == ["b"]
+    assert _runs()["a"].status == "succeeded"
+
+
+def test_claims_are_exclusive(backend):
+    for i in range(20):
+        assert enqueue(f"templates/t{i}.yaml", f"t{i}")
+    assert not enqueue("templates/t0.yaml", "t0")
+
+    claimed, lock = [], threading.Lock()
+
+    def work(n):
+        while True:
+            run = claim(f"worker-{n}")
+            if run is None:
+                return
+            with lock:
+                claimed.append(run["template_name"])
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(claimed) == sorted(f"t{i}" for i in range(20))
+
+
+def test_failures_retry_with_backoff_then_fail(backend, monkeypatch):
+    monkeypatch.setattr(runqueue, "RETRY_BACKOFF", 0)
+    enqueue("templates/broken.yaml", "broken", max_attempts=2)
+
+    def explode(path):
+        raise RuntimeError("site is down")
+
+    worker = Worker(execute=explode)
+    assert worker.run_once() == "queued"
+    assert worker.run_once() == "failed"
+    run = _runs()["broken"]
+    assert run.attempts == 2 and run.error == "site is down" and run.lease_owner is None
+    assert enqueue("templates/broken.yaml", "broken")  # после завершения можно ставить снова
+
+
+def test_expired_lease_is_requeued(backend):
+    enqueue("templates/slow.yaml", "slow")
+    run = claim("crashed-worker", lease_seconds=60)
+    assert claim("other") is None
+    assert heartbeat(run["id"], "crashed-worker", lease_seconds=60)
+
+    assert requeue_expired(now=runqueue._now() + timedelta(minutes=5)) == 1
+    assert not heartbeat(run["id"], "crashed-worker")  # аренда потеряна
+    assert fail(run["id"], "crashed-worker", "late") == "lost"
+    again = claim("other")
+    assert again["id"] == run["id"] and again["attempts"] == 2
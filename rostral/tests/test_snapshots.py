@@ -0,0 +1,97 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import rostral.stages.snapshot as snapshot
+from rostral.registry import TemplateError, compile_config
+from rostral.runner import PipelineRunner
+from rostral.stages.alert import AlertStage
+from rostral.stages.snapshot import SnapshotStage
+
+
+pytestmark = pytest.mark.usefixtures("temp_db")
+
+
+ALERT = ("{% for p in products %}{{ p.change }} {{ p.title }}"
+         "{% for f, d in p.changes.items() %} {{ f }}:{{ d.old }}→{{ d.new }}{% endfor %};{% endfor %}")
+
+
+PRODUCTS = {"products": {"selector": "a", "type": "list",
+                         "fields": {"title": "self", "price": {"attr": "data-price"}, "url": {"attr": "href"}}}}
+TRACK = {"field": "products", "values": {"price": "number", "available": "bool"}}
+
+
+@pytest.fixture
+def prices(make_config):
+    """Шаблон отслеживания цен; track и alert можно заменить"""
+    return lambda track=TRACK, alert=ALERT: make_config(
+        "prices", source={"url": "https://shop.example/"}, extract=PRODUCTS, track=track,
+        alert={"templates": {"main": alert}} if alert else None,
+    )
+
+
+def product(i, price, available="да"):
+    return {"url": f"https://shop.example/p/{i}", "title": f"Товар {i}", "price": price, "available": available}
+
+
+def run_once(config, products, dry_run=False):
+    stages = [SnapshotStage(config), AlertStage(config)]
+    data = {"products": products}
+    for stage in stages:
+        stage.dry_run = dry_run
+        data = {**data, **stage.run(data)}
+    return data
+
+
+def test_tracked_template_uses_snapshots_instead_of_dedup(prices):
+    names = PipelineRunner._stage_names(prices())
+    assert "snapshot" in names and "dedup" not in names
+    assert names.index("snapshot") == names.index("extract") + 1
+
+    with pytest.raises(TemplateError, match="track.field"):
+        compile_config(prices(track={"field": "items", "values": {"price": "number"}}))
+
+
+def test_only_changed_records_reach_the_alert_with_old_values(prices, monkeypatch):
+    config = prices()
+    first = run_once(config, [product(1, "1 990 ₽"), product(2, "500 ₽"), product(3, "700 ₽", "нет")])
+    assert first["alert"]["main"] == "new Товар 1;new Товар 2;new Товар 3;"
+
+    loaded = []
+    load_values = snapshot.load_values
+    monkeypatch.setattr(snapshot, "load_values", lambda t, keys: loaded.append(list(keys)) or load_values(t, keys))
+
+    # Форматирование цены не считается изменением; значения читаются только для изменившихся
+    second = run_once(config, [product(1, "1990 ₽"), product(2, "450 ₽"), product(3, "700 ₽", "да")])
+    assert second["alert"]["main"] == "changed Товар 2 price:500→450;changed Товар 3 available:False→True;"
+    assert loaded == [["https://shop.example/p/2", "https://shop.example/p/3"]]
+    assert second["products"][0]["previous"] == {"price": 500, "available": True}
+
+    third = run_once(config, [product(1, "1990 ₽"), product(2, "450 ₽"), product(3, "700 ₽", "да")])
+    assert third["products"] == [] and third["alert"]["main"] == ""
+
+
+def test_dry_run_and_notify_new(prices):
+    config = prices()
+    run_once(config, [product(1, "100")], dry_run=True)
+    # dry-run не сохраняет снимок: запись всё ещё новая
+    assert run_once(config, [product(1, "100")])["products"][0]["change"] == "new"
+
+    quiet = prices(track={"field": "products", "values": {"price": "number"}, "notify_new": False}, alert=None)
+    stage = SnapshotStage(quiet)
+    stage.dry_run = False
+    assert stage.run({"products": [product(5, "10")]})["products"] == []  # без alert снимок пишется сразу
+    changed = stage.run({"products": [product(5, "12")]})["products"]
+    assert changed[0]["changes"] == {"price": {"old": 10, "new": 12}}
+
+
+def test_snapshots_are_kept_when_the_alert_fails(prices):
+    broken = prices(alert="{% for p in products %}{{ p.title.missing() }}{% endfor %}")
+    failed = run_once(broken, [product(1, "100")])
+    assert failed["alert"]["main"].startswith("Rendering error")
+
+    # снимок не сохранён: исправленный алерт всё ещё сообщает о записи
+    assert run_once(prices(), [product(1, "100")])["alert"]["main"] == "new Товар 1;"
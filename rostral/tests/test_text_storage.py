@@ -0,0 +1,92 @@
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import rostral.db as db
+from rostral.compression import compress, decompress
+from rostral.db import migrate_event_texts, save_event
+from rostral.export import iter_events
+from rostral.models import Event, EventText
+from sqlalchemy import event as sa_event, text
+
+
+pytestmark = pytest.mark.usefixtures("temp_db")
+
+
+LONG = "Объект культурного наследия, адрес: Санкт-Петербург. " * 200
+
+
+def test_codecs_roundtrip():
+    assert compress("короткий") == ("raw", "короткий".encode())
+    codec, data = compress(LONG)
+    assert codec == "zlib" and len(data) < len(LONG.encode()) / 5
+    assert decompress(codec, data) == LONG
+
+
+def test_texts_are_compressed_and_loaded_only_on_access():
+    save_event({"url": "https://example.org/a.pdf", "title": "A", "text": LONG, "excerpt": "адрес: Санкт-Петербург"})
+    save_event({"url": "https://example.org/b.pdf", "title": "B", "text": "short", "excerpt": "short"})
+
+    statements = []
+    engine = db.get_engine()
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    sa_event.listen(engine, "before_cursor_execute", listener)
+    session = db.Session()
+    try:
+        events = session.query(Event).order_by(Event.id).all()
+        assert [e.title for e in events] == ["A", "B"]
+        assert not any("event_texts" in s for s in statements)
+        assert not any("events.text" in s for s in statements)  # legacy-колонки отложены
+
+        assert events[0].text == LONG
+        assert events[0].excerpt == "адрес: Санкт-Петербург"
+        assert events[1].excerpt == "short"
+        stored = {(t.event_id, t.field): t.codec for t in session.query(EventText)}
+        assert stored[(events[0].event_id, "text")] == "zlib"
+        assert stored[(events[1].event_id, "excerpt")] == "ref"  # выдержка = текст, копия не хранится
+    finally:
+        session.close()
+        sa_event.remove(engine, "before_cursor_execute", listener)
+
+
+def test_excerpt_reference_survives_text_changes():
+    event = Event(event_id="e1", url="https://example.org/e1.pdf")
+    event.text = "Заключение 📄"
+    event.excerpt = "Заключение 📄"
+    assert event.texts["excerpt"].codec == "ref"
+    assert event.texts["excerpt"].size == len("Заключение 📄".encode("utf-8"))
+
+    event.text = "rewritten"
+    assert event.excerpt == "Заключение 📄" and event.texts["excerpt"].codec != "ref"
+
+    event.excerpt = "rewritten"
+    event.text = None
+    assert event.text is None and event.excerpt == "rewritten"
+
+
+def test_migration_moves_legacy_columns():
+    engine = db.get_engine()
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO events (event_id, url, title, text, excerpt, status) VALUES "
+            "('old1', 'https://example.org/1.pdf', 'Old', :body, :body, 'pending'), "
+            "('old2', 'https://example.org/2.pdf', 'Old 2', NULL, 'only excerpt', 'pending')"
+        ), {"body": LONG})
+
+    session = db.Session()
+    assert session.query(Event).filter_by(event_id="old1").one().text == LONG  # до миграции читается по-старому
+    session.close()
+
+    report = migrate_event_texts(batch_size=1)
+
+    assert report["events"] == 2
+    assert report["compression_ratio"] > 5
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM events WHERE text IS NOT NULL OR excerpt IS NOT NULL")).scalar() == 0
+    rows = {r["event_id"]: r for r in iter_events(with_text=True)}
+    assert rows["old1"]["text"] == rows["old1"]["excerpt"] == LONG
+    assert rows["old2"]["text"] is None and rows["old2"]["excerpt"] == "only excerpt"
+    assert migrate_event_texts()["events"] == 0
@@ -0,0 +1,100 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+import rostral.http_client as http_client
+import rostral.stages.transforms as transforms
+from rostral.ratelimit import TokenBucket
+from rostral.stages.extract import ExtractStage
+
+
+pytestmark = pytest.mark.usefixtures("temp_db")
+
+
+class FakeYandexApi:
+    """Заглушка cloud-api: отвечает с задержкой и считает одновременные запросы"""
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        key = url.rsplit("/d/", 1)[-1]
+        return FakeResponse({"href": f"https://downloader.disk.yandex.ru/disk/{key}?sig=1"})
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+
+    assert time.monotonic() - start >= 0.18
+
+
+def test_links_are_resolved_concurrently_and_cached(monkeypatch):
+    api = FakeYandexApi(delay=0.1)
+    monkeypatch.setattr(http_client.requests, "get", api.get)
+    bucket = TokenBucket(rate=1000)
+    monkeypatch.setattr(transforms, "get_bucket", lambda *args, **kwargs: bucket)
+    links = [f"https://disk.yandex.ru/d/doc{i}" for i in range(8)] + ["https://example.org/a.pdf"]
+
+    start = time.monotonic()
+    resolved = transforms.resolve_yandex_links(links, template_name="kgiop")
+    elapsed = time.monotonic() - start
+
+    assert resolved["https://disk.yandex.ru/d/doc3"] == "https://downloader.disk.yandex.ru/disk/doc3?sig=1"
+    assert resolved["https://example.org/a.pdf"] == "https://example.org/a.pdf"
+    assert api.max_active > 1
+    assert elapsed < 8 * 0.1
+
+    # повторный запуск берёт ссылки из кэша
+    transforms.resolve_yandex_links(links, template_name="kgiop")
+    assert api.calls == 8
+
+
+def test_extract_stage_resolves_block_links_in_one_batch(make_config, monkeypatch):
+    batches = []
+
+    def fake_batch(urls, **kwargs):
+        urls = list(urls)
+        batches.append(urls)
+        return {u: f"https://downloader.disk.yandex.ru/{u.rsplit('/', 1)[-1]}" if "disk.yandex" in u else u for u in urls}
+
+    monkeypatch.setitem(transforms.BATCH_TRANSFORM_REGISTRY, "smart_url", fake_batch)
+    config = make_config("kgiop", extract={"events": {"selector": "a", "type": "list", "fields": {
+        "title": "self", "url": {"attr": "href", "transform_type": "smart_url"}}}})
+    html = '<a href="https://disk.yandex.ru/d/one">One</a><a href="https://disk.yandex.ru/d/two">Two</a>'
+
+    result = ExtractStage(config).run({"html": html})
+
+    assert len(batches) == 1
+    assert [r["url_final"] for r in result["events"]] == [
+        "https://downloader.disk.yandex.ru/one", "https://downloader.disk.yandex.ru/two"
+    ]
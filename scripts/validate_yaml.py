@@ -1,39 +1,46 @@
-import os, sys, yaml
+"""
+Проверка шаблонов без запуска: схема (pydantic), CSS-селекторы, JMESPath,
+регулярки и Jinja-шаблоны компилируются так же, как перед запуском конвейера.
 
-REQUIRED_TOP_LEVEL = ['version', 'meta', 'source', 'extract', 'alert']
+Usage:
+    python scripts/validate_yaml.py [templates/] [other.yaml ...]
+"""
 
-def validate_file(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        try:
-            data = yaml.safe_load(f)
-        except yaml.YAMLError as e:
-            print(f"❌ YAML syntax error in {path}:\n{e}")
-            return False
+import os
+import sys
+from pathlib import Path
 
-    if not isinstance(data, dict):
-        print(f"❌ {path} does not contain a top-level dictionary")
-        return False
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rostral.registry import TemplateError, TemplateRegistry, get_registry
 
-    for key in REQUIRED_TOP_LEVEL:
-        if key not in data:
-            print(f"❌ Missing required section `{key}` in {path}")
-            return False
 
-    print(f"✅ {path} is valid")
+def validate_file(path, registry=None):
+    try:
+        template = (registry or get_registry()).get(path)
+    except TemplateError as e:
+        print(f"❌ {path}:")
+        for problem in e.problems:
+            print(f"   - {problem}")
+        return False
+
+    print(f"✅ {path} is valid ({template.name})")
     return True
 
+
 def walk_templates(root_dir):
+    registry = TemplateRegistry(root_dir)
     all_ok = True
-    for dirpath, _, filenames in os.walk(root_dir):
-        for file in filenames:
-            if file.endswith('.yaml'):
-                full_path = os.path.join(dirpath, file)
-                ok = validate_file(full_path)
-                if not ok:
-                    all_ok = False
+    for path in registry.paths():
+        if not validate_file(path, registry):
+            all_ok = False
     return all_ok
 
+
 if __name__ == "__main__":
-    root = sys.argv[1] if len(sys.argv) > 1 else "templates"
-    success = walk_templates(root)
+    import logging
+    logging.disable(logging.CRITICAL)  # ошибки печатаются списком, лог реестра не нужен
+
+    targets = sys.argv[1:] or ["templates"]
+    success = all([walk_templates(t) if Path(t).is_dir() else validate_file(t) for t in targets])
     sys.exit(0 if success else 1)